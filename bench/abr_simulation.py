@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Adaptive bitrate against a simulated bottleneck link.
+
+Runs ``RateController`` in a loop with a fluid model of one bottleneck: the
+encoder pushes ``bitrate`` into a drop-tail queue drained at the link
+capacity, and queueing delay plus a fixed base delay is the frame latency
+the pult would measure. Receiver reports go to the controller once a second,
+exactly as ``StreamReceiver`` sends them to drone_video's /feedback.
+
+The default scenario drops the capacity from 3 to 0.8 Mbit/s and then back
+up to 2 Mbit/s. The run fails (exit status 1) if latency stays above the
+target for longer than ``--settle`` seconds after a capacity change. The
+same link is also simulated without rate control for comparison.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.latency_stats import Histogram
+from video.rate_control import RateController, ReceiverReport
+
+DT = 0.05  # simulation step, s
+REPORT_INTERVAL = 1.0
+BASE_DELAY_MS = 40.0
+BUFFER_MS = 1000.0  # drop-tail queue size, in ms at the current capacity
+SCENARIO = ((0.0, 3000), (10.0, 800), (40.0, 2000))  # (time s, capacity kbit/s)
+DURATION = 70.0
+
+
+def capacity_at(t: float) -> float:
+    capacity = SCENARIO[0][1]
+    for start, kbps in SCENARIO:
+        if t >= start:
+            capacity = kbps
+    return capacity
+
+
+def simulate(rate, bitrate: int, fps: int, target_ms: float, verbose: bool):
+    queue_kbit = 0.0
+    sent = lost = delivered = 0.0
+    window = Histogram()
+    overall = Histogram()
+    over_target_since = None
+    worst_violation = 0.0
+    t = 0.0
+    next_report = REPORT_INTERVAL
+
+    while t < DURATION:
+        capacity = capacity_at(t)
+        produced = bitrate * DT
+        room = capacity * BUFFER_MS / 1000.0 - queue_kbit
+        dropped = max(0.0, produced - room)
+        backlog = queue_kbit + produced - dropped
+        queue_kbit = max(0.0, backlog - capacity * DT)
+        sent += produced
+        lost += dropped
+        delivered += backlog - queue_kbit
+
+        latency = BASE_DELAY_MS + queue_kbit / capacity * 1000.0 + 500.0 / fps
+        window.record(latency)
+        overall.record(latency)
+        t += DT
+
+        if t >= next_report:
+            next_report += REPORT_INTERVAL
+            report = ReceiverReport(
+                latency_ms=window.percentile(95),
+                loss=lost / sent if sent else 0.0,
+                fps=fps,
+                received_kbps=delivered / REPORT_INTERVAL,
+            )
+            window = Histogram()
+            sent = lost = delivered = 0.0
+
+            if report.latency_ms > target_ms:
+                if over_target_since is None:
+                    over_target_since = t
+                worst_violation = max(worst_violation, t - over_target_since)
+            else:
+                over_target_since = None
+
+            changes = rate.update(report) if rate is not None else None
+            if changes:
+                bitrate = changes.get("bitrate", bitrate)
+                fps = changes.get("fps", fps)
+            if verbose:
+                print(
+                    f"t={t:5.1f}s capacity={capacity:5.0f} bitrate={bitrate:5d} "
+                    f"fps={fps:2d} p95={report.latency_ms:7.1f} ms "
+                    f"loss={report.loss:5.1%}"
+                )
+
+    return overall, worst_violation
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bitrate", type=int, default=2500)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--target", type=float, default=150.0, help="ms")
+    parser.add_argument("--settle", type=float, default=8.0, help="s")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    rate = RateController(
+        args.bitrate, args.fps, max_bitrate=4000, target_latency_ms=args.target
+    )
+    controlled, violation = simulate(
+        rate, args.bitrate, args.fps, args.target, not args.quiet
+    )
+    fixed, fixed_violation = simulate(None, args.bitrate, args.fps, args.target, False)
+
+    for name, hist, worst in (
+        ("adaptive", controlled, violation),
+        ("fixed", fixed, fixed_violation),
+    ):
+        snap = hist.snapshot()
+        print(
+            f"{name:>8}: p50={snap['p50']:.0f} p95={snap['p95']:.0f} "
+            f"p99={snap['p99']:.0f} max={snap['max']:.0f} ms, "
+            f"longest time over target {worst:.1f} s"
+        )
+
+    if violation > args.settle:
+        print(f"FAIL: latency above {args.target} ms for {violation:.1f} s")
+        return 1
+    print("PASS")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""How long the pult's video lags live after a stall, per catch-up mode.
+
+Starts MockJanus in a subprocess and watches its synthetic stream with a
+``StreamReceiver`` for each mode in turn: catch-up off, ``newest`` and
+``keyframe`` (``video.catch_up``), with a ``--budget`` ms lag budget. After
+``--warmup`` s, the pult's event loop is blocked for ``--stall`` ms, like a
+CPU spike; the stream keeps coming and piles up. For the frames the
+display pipeline converts for showing over the next ``--after`` s (frames
+it drops are never seen) it reports:
+
+* ``max lag``: the largest lag behind live (arrival minus pts, relative to
+  the best frame seen) of a frame shown after the stall;
+* ``settle``: ms from the end of the stall to the last frame shown over
+  budget, after which the display stayed within it;
+* ``over``: frames shown over budget after the stall;
+* jumps and frames skipped by the catch-up.
+
+Exits 1 if ``newest`` shows more than ``--max-over`` frames over budget, or
+no fewer than with catch-up off.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.load_generator import report, start_mock
+from common.janus_client import JanusClient
+from common.janus_supervisor import JanusSupervisor
+from video.catch_up import DEFAULT_BUDGET_MS, KEYFRAME, NEWEST
+from video.controller_video import StreamReceiver, stream_setup
+from video.mountpoint import ensure_mountpoint
+
+URL = "ws://127.0.0.1:8188"
+STREAM_ID = 7001
+MODES = (None, NEWEST, KEYFRAME)
+
+
+async def stall_case(mode, args, record_dir) -> dict:
+    stream = StreamReceiver(
+        STREAM_ID,
+        os.path.join(record_dir, f"{mode}.mp4"),
+        stats_interval=3600,
+        prefix="",
+        catch_up=mode,
+        lag_budget_ms=args.budget,
+    )
+    shown = []  # (time, pts seconds) of frames converted for display
+    convert = stream.pipeline.convert.handler
+
+    def record_convert(frame):
+        shown.append((time.time(), float(frame.pts * frame.time_base)))
+        return convert(frame)
+
+    stream.pipeline.convert.handler = record_convert
+    supervisor = JanusSupervisor(URL, stream_setup([stream]), emit=lambda line: None)
+    stream.on_failed = supervisor.fail
+    stream.start()
+    task = asyncio.create_task(supervisor.run())
+    try:
+        await asyncio.wait_for(supervisor.ready.wait(), 20)
+        await asyncio.sleep(args.warmup)
+        time.sleep(args.stall / 1000)  # blocks the loop, as a CPU spike would
+        resumed = time.time()
+        await asyncio.sleep(args.after)
+    finally:
+        task.cancel()
+        await supervisor.close()
+        await stream.close()
+    best = min(arrival - pts for arrival, pts in shown)
+    after = [
+        (arrival, (arrival - pts - best) * 1000)
+        for arrival, pts in shown
+        if arrival >= resumed
+    ]
+    late = [arrival for arrival, lag in after if lag > args.budget]
+    catch_up = stream.catch_up
+    return {
+        "mode": mode or "off",
+        "max": max((lag for _, lag in after), default=0.0),
+        "settle": (late[-1] - resumed) * 1000 if late else 0.0,
+        "over": sum(lag > args.budget for _, lag in after),
+        "shown": len(after),
+        "jumps": catch_up.catch_ups if catch_up else 0,
+        "skipped": catch_up.skipped if catch_up else 0,
+    }
+
+
+async def main(args) -> int:
+    janus = await start_mock(URL)
+    record_dir = tempfile.mkdtemp(prefix="catch_up_")
+    results = {}
+    try:
+        async with JanusClient(URL) as client:
+            await ensure_mountpoint(client, STREAM_ID, 8006, 8007)
+        report(f"stall {args.stall:g} ms, budget {args.budget:g} ms")
+        report(
+            f"{'mode':>8} {'max lag':>8} {'settle':>8} {'over':>5} {'shown':>5} "
+            f"{'jumps':>5} {'skipped':>7}"
+        )
+        for mode in MODES:
+            r = results[mode] = await stall_case(mode, args, record_dir)
+            report(
+                f"{r['mode']:>8} {r['max']:8.0f} {r['settle']:8.0f} {r['over']:5d} "
+                f"{r['shown']:5d} {r['jumps']:5d} {r['skipped']:7d}"
+            )
+    finally:
+        janus.terminate()
+        await janus.wait()
+        shutil.rmtree(record_dir, ignore_errors=True)
+    off, newest = results[None], results[NEWEST]
+    failed = newest["over"] > args.max_over
+    failed |= off["over"] > 0 and newest["over"] >= off["over"]
+    report("FAIL" if failed else "PASS")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stall", type=float, default=1500.0, help="ms")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_MS, help="ms")
+    parser.add_argument("--warmup", type=float, default=3.0, help="s")
+    parser.add_argument("--after", type=float, default=4.0, help="s")
+    parser.add_argument("--max-over", type=int, default=6)
+    args = parser.parse_args()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        sys.exit(asyncio.run(main(args)))
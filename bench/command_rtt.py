@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Command channel delivery under loss, and the drone's receive-handler cost.
+
+Connects a ``CommandSender`` and a ``CommandReceiver`` (``text.command_channel``)
+in-process through a link that delays each message text by ``--delay`` ms
+and drops it, in either direction, with probability ``loss``. Sends
+``--commands`` commands every ``--interval`` ms per loss rate and reports:
+
+* commands acked and given up, retransmits, and duplicates the drone
+  acknowledged without delivering them again;
+* rtt p50/p99 (attempt to ack), completion p99 (first attempt to ack) and
+  delivery p99 on the drone.
+
+Then times the drone's handler for one TextRoom message: the previous one
+(pretty-printed JSON, hand-fixed ``date`` parsing) against the current one
+(``CommandReceiver.receive``), both printing to /dev/null. Exits 1 if a
+command is delivered twice, an acked command was never delivered, or a
+lossless run needs a retransmit.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text.command_channel import CommandReceiver, CommandSender
+
+LOSSES = (0.0, 0.05, 0.2)
+
+
+async def loss_case(loss: float, args) -> dict:
+    loop = asyncio.get_running_loop()
+    delivered = []
+
+    def link(deliver):
+        def send(text):
+            if random.random() >= loss:
+                loop.call_later(args.delay / 1000, deliver, text)
+
+        return send
+
+    sender = CommandSender(None, timeout_ms=args.timeout, max_attempts=args.attempts)
+    receiver = CommandReceiver(
+        lambda sender_name, text: to_pult(text),
+        lambda sender_name, command, delivery_ms: delivered.append(command),
+    )
+    to_pult = link(sender.receive)
+    sender.send = link(lambda text: receiver.receive("pult", text))
+    task = asyncio.create_task(sender.run())
+    for i in range(args.commands):
+        sender.submit(f"cmd{i}")
+        await asyncio.sleep(args.interval / 1000)
+    while sender.pending:
+        await asyncio.sleep(0.05)
+    task.cancel()
+    rtt, done = sender.rtt.snapshot(), sender.completion.snapshot()
+    return {
+        "loss": loss,
+        "acked": sender.acked,
+        "failed": sender.failed,
+        "retransmits": sender.retransmits,
+        "duplicates": receiver.duplicates,
+        "twice": len(delivered) - len(set(delivered)),
+        "undelivered": max(0, sender.acked - len(set(delivered))),
+        "rtt_p50": rtt["p50"],
+        "rtt_p99": rtt["p99"],
+        "done_p99": done["p99"],
+        "delivery_p99": receiver.delivery.snapshot()["p99"],
+    }
+
+
+def old_handler(raw_msg) -> None:
+    """The drone's message handler before the command channel."""
+    data = json.loads(raw_msg)
+    pretty = json.dumps(data, ensure_ascii=False, indent=3)
+    print("[DRONE] Received via DataChannel:", pretty)
+    if data.get("textroom") == "message":
+        date_str = data.get("date")
+        if date_str[-5] in ["+", "-"] and ":" not in date_str[-5:]:
+            date_str = date_str[:-5] + date_str[-5:-2] + ":" + date_str[-2:]
+        sent_ms = datetime.fromisoformat(date_str).timestamp() * 1000
+        latency_ms = time.time() * 1000 - sent_ms
+        print(
+            f"[DRONE] Message from [{data.get('from')}]: {data.get('text')}"
+            f"  | latency {latency_ms:.2f} ms"
+        )
+
+
+def handler_costs(number: int = 20000) -> dict:
+    sender = CommandSender(lambda text: None)
+    receiver = CommandReceiver(
+        lambda sender_name, text: None,
+        lambda sender_name, command, delivery_ms: print(
+            f"[DRONE] Command from [{sender_name}]: {command}  | {delivery_ms:.1f} ms"
+        ),
+    )
+    messages = []
+    sender.send = lambda text: messages.append(
+        json.dumps(
+            {
+                "textroom": "message",
+                "room": 1234,
+                "from": "pult",
+                "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "text": text,
+            }
+        )
+    )
+    for i in range(number):
+        sender.submit(f"goto 50.4501 30.5234 alt {i % 120}")
+
+    def new_handler(raw_msg) -> None:
+        data = json.loads(raw_msg)
+        if data.get("textroom") == "message":
+            receiver.receive(data.get("from"), data.get("text", ""))
+
+    costs = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name, handler in (("old", old_handler), ("new", new_handler)):
+            it = iter(messages)
+            costs[name] = timeit.timeit(lambda: handler(next(it)), number=number)
+    return {name: t / number * 1e6 for name, t in costs.items()}
+
+
+async def main(args) -> int:
+    failed = False
+    print(
+        f"{args.commands} commands every {args.interval:g} ms, link delay "
+        f"{args.delay:g} ms, timeout {args.timeout:g} ms x {args.attempts}"
+    )
+    print(
+        f"{'loss':>5} {'acked':>5} {'failed':>6} {'retx':>5} {'dups':>5} "
+        f"{'rtt p50':>7} {'p99':>7} {'done p99':>8} {'deliv p99':>9}"
+    )
+    for loss in args.losses:
+        r = await loss_case(loss, args)
+        print(
+            f"{r['loss'] * 100:4.0f}% {r['acked']:5d} {r['failed']:6d} "
+            f"{r['retransmits']:5d} {r['duplicates']:5d} {r['rtt_p50']:7.1f} "
+            f"{r['rtt_p99']:7.1f} {r['done_p99']:8.1f} {r['delivery_p99']:9.1f}"
+        )
+        failed |= r["twice"] > 0 or r["undelivered"] > 0
+        failed |= loss == 0 and (r["retransmits"] > 0 or r["failed"] > 0)
+    costs = handler_costs()
+    print(
+        f"drone handler: {costs['old']:.1f} us before, {costs['new']:.1f} us "
+        f"with the command channel"
+    )
+    print("FAIL" if failed else "PASS")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=10.0, help="ms")
+    parser.add_argument("--delay", type=float, default=20.0, help="ms each way")
+    parser.add_argument("--timeout", type=float, default=100.0, help="ms")
+    parser.add_argument("--attempts", type=int, default=5)
+    parser.add_argument(
+        "--losses",
+        type=lambda v: [float(s) for s in v.split(",")],
+        default=list(LOSSES),
+        help="drop probabilities, comma-separated",
+    )
+    sys.exit(asyncio.run(main(parser.parse_args())))
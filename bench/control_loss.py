@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Age of the pult's newest RC frame under packet loss, per control mode.
+
+Connects two aiortc peer connections back to back in-process, opens the
+control channels of each mode (``crsf_commands.control_channel``), and
+streams RC packets at ``--rate`` from one to the other while every DTLS
+record, data and SACKs alike, is dropped with probability ``loss``. Every
+``SAMPLE`` seconds the receiver notes the age of the newest frame it has
+accepted. A ``reliable`` channel holds frames back behind a
+retransmission; an ``unreliable`` one only loses the frames themselves,
+and ``redundancy`` brings most of those back from the next packet.
+
+Reports, per mode and loss rate: age p50/p99/max, the share of sent frames
+the receiver ended up with (directly or recovered), and packets lost on the
+way. Janus is not in the path; see the caveat in control_channel.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiortc import RTCPeerConnection
+from aiortc.rtcdtlstransport import RTCDtlsTransport
+
+from common.latency_stats import Histogram
+from crsf_commands.control_channel import create_channels
+from crsf_commands.rc_encoder import RcEncoder, rc_frames
+from crsf_commands.rtp_receiver import RtpReceiver
+
+MODES = (("reliable", 1), ("unreliable", 1), ("unreliable", 3))
+LOSSES = (0.0, 0.02, 0.05, 0.1)
+SAMPLE = 0.005  # s between age samples
+WARMUP = 1.0  # s of streaming before loss starts and sampling begins
+
+loss = {"p": 0.0}
+_send_data = RTCDtlsTransport._send_data
+
+
+async def _lossy_send_data(self, data: bytes) -> None:
+    if loss["p"] and random.random() < loss["p"]:
+        return
+    await _send_data(self, data)
+
+
+RTCDtlsTransport._send_data = _lossy_send_data
+
+
+def now_ms() -> float:
+    return time.time() * 1000
+
+
+async def connect(mode: str):
+    sender, receiver = RTCPeerConnection(), RTCPeerConnection()
+    _, tx = create_channels(sender, mode)
+    opened = asyncio.get_running_loop().create_future()
+    rx_channels = []
+
+    @receiver.on("datachannel")
+    def on_datachannel(channel):
+        rx_channels.append(channel)
+
+    @tx.on("open")
+    def on_open():
+        opened.set_result(None)
+
+    await sender.setLocalDescription(await sender.createOffer())
+    await receiver.setRemoteDescription(sender.localDescription)
+    await receiver.setLocalDescription(await receiver.createAnswer())
+    await sender.setRemoteDescription(receiver.localDescription)
+    await asyncio.wait_for(opened, 10)
+    return sender, receiver, tx, rx_channels
+
+
+async def measure(mode: str, redundancy: int, p: float, args) -> dict:
+    loss["p"] = 0.0
+    sender, receiver, tx, rx_channels = await connect(mode)
+    encoder = RcEncoder(redundancy=redundancy)
+    rtp = RtpReceiver()
+    newest = {"ts": None}
+    delivered = set()
+    sent = 0
+
+    def on_message(msg):
+        pkt = rtp.receive(msg, now_ms())
+        if pkt is None:
+            return
+        frames = rc_frames(pkt.payload)[-1 - rtp.gap :]
+        for back in range(len(frames)):
+            delivered.add(rtp.max_seq - back)
+        newest["ts"] = pkt.timestamp
+
+    while not any(c.label == tx.label for c in rx_channels):
+        await asyncio.sleep(0.01)
+    for channel in rx_channels:
+        channel.on("message", on_message)
+
+    age = Histogram()
+    loop = asyncio.get_running_loop()
+    period = 1 / args.rate
+    start = loop.time()
+    next_sample = start + WARMUP
+    stop_at = start + WARMUP + args.duration
+    channels = [992] * 16
+    tick = 0
+    while loop.time() < stop_at:
+        now = loop.time()
+        if now >= start + tick * period:
+            channels[0] = 992 + tick % 800
+            tx.send(encoder.packet(channels, int(now_ms()) & 0xFFFFFFFF))
+            tick += 1
+            if now >= start + WARMUP:
+                loss["p"] = p
+                sent += 1
+        if now >= next_sample:
+            if newest["ts"] is not None:
+                age.record((int(now_ms()) - newest["ts"]) % (1 << 32))
+            next_sample += SAMPLE
+        await asyncio.sleep(min(start + tick * period, next_sample) - loop.time())
+    loss["p"] = 0.0
+    await asyncio.sleep(0.5)  # let the last retransmissions land
+    first = tick - sent  # ticks before loss started
+    got = sum(1 for seq in delivered if seq >= rtp.base_seq + first)
+    await sender.close()
+    await receiver.close()
+    snap = age.snapshot()
+    return {
+        "mode": f"{mode}/{redundancy}",
+        "loss": p,
+        "age_p50": snap["p50"],
+        "age_p99": snap["p99"],
+        "age_max": snap["max"],
+        "delivered": got / sent if sent else 0.0,
+        "lost": rtp.lost,
+    }
+
+
+async def main(args) -> None:
+    print(
+        f"{'mode':>14} {'loss':>5} {'age p50':>8} {'p99':>8} {'max':>8} "
+        f"{'frames':>7} {'pkts lost':>9}"
+    )
+    for mode, redundancy in MODES:
+        for p in args.losses:
+            r = await measure(mode, redundancy, p, args)
+            print(
+                f"{r['mode']:>14} {r['loss']:5.2f} {r['age_p50']:8.1f} "
+                f"{r['age_p99']:8.1f} {r['age_max']:8.1f} "
+                f"{r['delivered'] * 100:6.1f}% {r['lost']:9d}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=100.0, help="packets/s")
+    parser.add_argument("--duration", type=float, default=10.0, help="s per case")
+    parser.add_argument(
+        "--losses",
+        type=lambda v: [float(p) for p in v.split(",")],
+        default=list(LOSSES),
+    )
+    asyncio.run(main(parser.parse_args()))
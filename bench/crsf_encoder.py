@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Throughput and memory of the RC packet encoder against the construct path.
+
+Encodes the same random channel frames with:
+
+* ``legacy``: ``crsf_build_frame`` with a fresh dict and list per frame plus
+  a ``struct.pack`` RTP header concatenated in front, as drone_crsf did;
+* ``encode``: ``RcEncoder.encode`` into its reused buffer;
+* ``packet``: ``RcEncoder.packet``, the same plus a ``bytes`` copy;
+* ``batch``: ``RcEncoder.encode_batch`` over all frames at once.
+
+and reports packets/s, the peak memory allocated while encoding one packet
+(tracemalloc, so transient objects count) and the memory blocks still held
+per packet after ``--count`` packets (should be 0). Before timing, every
+encoder output is checked byte for byte against the legacy path and parsed
+back with crsf_parser; exits 1 on a mismatch.
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crsf_parser import CRSFParser, PacketValidationStatus
+from crsf_parser.handling import crsf_build_frame
+from crsf_parser.payloads import PacketsTypes
+
+from crsf_commands.rc_encoder import PACKET_SIZE, RTP_HEADER_SIZE, RcEncoder
+
+SSRC = 0x12345678
+PT = 96
+
+
+def legacy_packet(channels, seq: int, ts_ms: int) -> bytes:
+    crsf = crsf_build_frame(
+        PacketsTypes.RC_CHANNELS_PACKED, {"channels": list(channels)}
+    )
+    header = struct.pack("!BBHII", 0x80, PT, seq, ts_ms & 0xFFFFFFFF, SSRC)
+    return header + crsf
+
+
+def verify(frames) -> int:
+    """Number of frames on which the encoder and crsf_parser disagree."""
+    encoder = RcEncoder(SSRC, PT)
+    decoded = []
+    parser = CRSFParser(
+        lambda frame, status: decoded.append(
+            list(frame.payload.channels)
+            if status == PacketValidationStatus.VALID
+            else None
+        )
+    )
+    batch = RcEncoder(SSRC, PT).encode_batch(frames)
+    errors = 0
+    for i, (channels, ts_ms) in enumerate(frames):
+        seq = encoder.seq
+        pkt = bytes(encoder.encode(channels, ts_ms))
+        ok = pkt == legacy_packet(channels, seq, ts_ms)
+        ok &= batch[i * PACKET_SIZE : (i + 1) * PACKET_SIZE] == pkt
+        parser.parse_stream(bytearray(pkt[RTP_HEADER_SIZE:]))
+        ok &= bool(decoded) and decoded[-1] == list(channels)
+        errors += not ok
+    return errors
+
+
+def cases():
+    encoder = RcEncoder(SSRC, PT)
+    seq = 0
+
+    def legacy(channels, ts_ms):
+        nonlocal seq
+        pkt = legacy_packet(channels, seq, ts_ms)
+        seq = (seq + 1) & 0xFFFF
+        return pkt
+
+    return {
+        "legacy": legacy,
+        "encode": encoder.encode,
+        "packet": encoder.packet,
+    }
+
+
+def throughput(fn, frames, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for channels, ts_ms in frames:
+            fn(channels, ts_ms)
+    return repeat * len(frames) / (time.perf_counter() - start)
+
+
+def batch_throughput(frames, repeat: int) -> float:
+    encoder = RcEncoder(SSRC, PT)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encoder.encode_batch(frames)
+    return repeat * len(frames) / (time.perf_counter() - start)
+
+
+def memory(fn, frames) -> tuple:
+    """(peak bytes while encoding one packet, blocks retained per packet)."""
+    channels, ts_ms = frames[0]
+    fn(channels, ts_ms)  # warm up caches
+    tracemalloc.start()
+    peak = 0
+    for channels, ts_ms in frames[:100]:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn(channels, ts_ms)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    blocks = sys.getallocatedblocks()
+    for channels, ts_ms in frames:
+        fn(channels, ts_ms)
+    retained = (sys.getallocatedblocks() - blocks) / len(frames)
+    return peak, retained
+
+
+def main(args) -> int:
+    rng = random.Random(args.seed)
+    frames = [
+        ([rng.randint(172, 1811) for _ in range(16)], rng.getrandbits(32))
+        for _ in range(args.count)
+    ]
+    errors = verify(frames)
+    print(f"verified {len(frames)} frames: {errors} mismatches")
+
+    print(f"{'path':>8} {'packets/s':>11} {'peak B/pkt':>11} {'blocks/pkt':>11}")
+    results = {}
+    for name, fn in cases().items():
+        pps = throughput(fn, frames, args.repeat)
+        peak, retained = memory(fn, frames)
+        results[name] = pps
+        print(f"{name:>8} {pps:11.0f} {peak:11d} {retained:11.3f}")
+    pps = batch_throughput(frames, args.repeat)
+    print(f"{'batch':>8} {pps:11.0f} {'-':>11} {'-':>11}")
+    speedup = results["encode"] / results["legacy"]
+    print(f"speed-up of encode over legacy: {speedup:.1f}x")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000, help="distinct frames")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Benchmark x264 settings for the drone video pipeline.
+
+Runs ``EncoderPipeline`` with ``videotestsrc`` over the cross product of the
+given settings and, for each combination, measures:
+
+* per-frame encode latency (buffer pts seen entering and leaving x264enc),
+  as p50/p95/p99/max;
+* CPU used by the encoder, in cores: process CPU time over the measured
+  window minus a source-only baseline run at the same resolution and fps;
+* output bitrate and frame rate actually delivered.
+
+Results go to a CSV or JSON file (by extension) and a table on stdout, so
+settings can be compared per airframe CPU, e.g.:
+
+    python bench/encoder_presets.py --presets ultrafast,superfast,veryfast \\
+        --bitrates 1000,2500 --resolutions 640x480,1280x720 -o rpi4.csv
+"""
+
+import argparse
+import csv
+import dataclasses
+import itertools
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gst  # noqa: E402
+
+from common.latency_stats import Histogram
+from video.drone_encoder import EncoderPipeline, EncoderSettings, caps_string
+
+WARMUP = 1.0
+FIELDS = (
+    "speed_preset",
+    "tune",
+    "bitrate",
+    "gop",
+    "sliced_threads",
+    "width",
+    "height",
+    "fps",
+    "frames",
+    "out_fps",
+    "out_kbps",
+    "latency_p50",
+    "latency_p95",
+    "latency_p99",
+    "latency_max",
+    "cpu_cores",
+)
+
+
+def _csv(value: str, cast=str):
+    return [cast(v) for v in value.split(",") if v]
+
+
+def _bool(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def _resolution(value: str):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def _source(pattern: str) -> str:
+    return f"videotestsrc is-live=true pattern={pattern}"
+
+
+def _cpu_over(pipeline, duration: float) -> float:
+    """Cores used by the process while ``pipeline`` plays for ``duration``."""
+    pipeline.set_state(Gst.State.PLAYING)
+    time.sleep(WARMUP)
+    cpu, wall = time.process_time(), time.perf_counter()
+    time.sleep(duration)
+    cores = (time.process_time() - cpu) / (time.perf_counter() - wall)
+    pipeline.set_state(Gst.State.NULL)
+    return cores
+
+
+def baseline_cpu(settings: EncoderSettings, pattern: str, duration: float) -> float:
+    pipeline = Gst.parse_launch(
+        f"{_source(pattern)} ! videoconvert ! videoscale ! videorate "
+        f"! capsfilter caps={caps_string(settings)} ! fakesink sync=false"
+    )
+    return _cpu_over(pipeline, duration)
+
+
+def run_case(settings: EncoderSettings, pattern: str, duration: float) -> dict:
+    encoder = EncoderPipeline(
+        settings, None, None, source=_source(pattern), sink="fakesink sync=false"
+    )
+    entered = {}
+    latency = Histogram()
+    counters = {"frames": 0, "bytes": 0, "measuring": False}
+
+    def on_enter(pad, info):
+        entered[info.get_buffer().pts] = time.perf_counter()
+        return Gst.PadProbeReturn.OK
+
+    def on_leave(pad, info):
+        buf = info.get_buffer()
+        start = entered.pop(buf.pts, None)
+        if counters["measuring"]:
+            counters["frames"] += 1
+            counters["bytes"] += buf.get_size()
+            if start is not None:
+                latency.record((time.perf_counter() - start) * 1000)
+        return Gst.PadProbeReturn.OK
+
+    encoder.enc.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, on_enter)
+    encoder.enc.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, on_leave)
+
+    encoder.start()
+    time.sleep(WARMUP)
+    counters["measuring"] = True
+    cpu, wall = time.process_time(), time.perf_counter()
+    time.sleep(duration)
+    counters["measuring"] = False
+    elapsed = time.perf_counter() - wall
+    cores = (time.process_time() - cpu) / elapsed
+    error = encoder.poll_bus()
+    encoder.stop()
+    if error:
+        raise RuntimeError(error)
+
+    snap = latency.snapshot()
+    row = dataclasses.asdict(settings)
+    row.update(
+        frames=counters["frames"],
+        out_fps=counters["frames"] / elapsed,
+        out_kbps=counters["bytes"] * 8 / 1000 / elapsed,
+        latency_p50=snap["p50"],
+        latency_p95=snap["p95"],
+        latency_p99=snap["p99"],
+        latency_max=snap["max"],
+        cpu_cores=cores,
+    )
+    return row
+
+
+def write_report(path: str, rows) -> None:
+    if path.endswith(".json"):
+        with open(path, "w") as f:
+            json.dump(rows, f, indent=2)
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="x264 settings benchmark")
+    parser.add_argument("--presets", type=_csv, default=["ultrafast", "superfast"])
+    parser.add_argument("--tunes", type=_csv, default=["zerolatency"])
+    parser.add_argument("--bitrates", type=lambda v: _csv(v, int), default=[2000])
+    parser.add_argument("--key-int", type=lambda v: _csv(v, int), default=[30])
+    parser.add_argument(
+        "--slice-threads", type=lambda v: _csv(v, _bool), default=[False]
+    )
+    parser.add_argument(
+        "--resolutions", type=lambda v: _csv(v, _resolution), default=[(1280, 720)]
+    )
+    parser.add_argument("--fps", type=lambda v: _csv(v, int), default=[30])
+    parser.add_argument("--pattern", default="smpte", help="videotestsrc pattern")
+    parser.add_argument("--duration", type=float, default=5.0, help="s per case")
+    parser.add_argument("-o", "--output", default="encoder_presets.csv")
+    args = parser.parse_args()
+
+    Gst.init(None)
+    baselines = {}
+    rows = []
+    cases = list(
+        itertools.product(
+            args.presets,
+            args.tunes,
+            args.bitrates,
+            args.key_int,
+            args.slice_threads,
+            args.resolutions,
+            args.fps,
+        )
+    )
+    for i, (preset, tune, bitrate, gop, sliced, (width, height), fps) in enumerate(
+        cases, 1
+    ):
+        settings = EncoderSettings(
+            bitrate=bitrate,
+            width=width,
+            height=height,
+            fps=fps,
+            gop=gop,
+            speed_preset=preset,
+            tune=tune,
+            sliced_threads=sliced,
+        )
+        key = (width, height, fps)
+        if key not in baselines:
+            baselines[key] = baseline_cpu(settings, args.pattern, args.duration)
+
+        row = run_case(settings, args.pattern, args.duration)
+        row["cpu_cores"] = max(0.0, row["cpu_cores"] - baselines[key])
+        rows.append(row)
+        print(
+            f"[{i}/{len(cases)}] {preset:>9} {tune:>11} {bitrate:5d} kbit/s "
+            f"gop={gop:<3d} sliced={int(sliced)} {width}x{height}@{fps}: "
+            f"p50={row['latency_p50']:.1f} p95={row['latency_p95']:.1f} ms "
+            f"cpu={row['cpu_cores']:.2f} out={row['out_kbps']:.0f} kbit/s "
+            f"{row['out_fps']:.1f} fps"
+        )
+
+    write_report(args.output, rows)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
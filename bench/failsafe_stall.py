@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Failsafe detection under simulated RC stalls, and its per-packet cost.
+
+Streams RC packets at ``--rate`` into a ``CrsfReceiver`` with a
+``FailsafeWatchdog`` (timeout ``--timeout``), in-process, and stops the
+stream once for each of ``--stalls`` ms in turn. Reports per stall:
+
+* ``misses``: failsafe entries (1 if the stall outlasts the timeout, else 0);
+* ``detect``: ms from the last frame before the stall to failsafe;
+* ``late``: ``detect`` minus the timeout, the watchdog's own delay;
+* ``recover``: ms from the first frame after the stall to failsafe clearing;
+* frame age p99 and max over the case.
+
+Then times ``feed()`` alone and ``CrsfReceiver.receive()`` with and
+without a watchdog. Exits 1 if a stall is misjudged, detection is more than
+``--max-late`` ms late, or feeding costs more than ``--max-feed-us``.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crsf_commands.crsf_receiver import CrsfReceiver
+from crsf_commands.failsafe import DEFAULT_TIMEOUT_MS, FailsafeWatchdog
+from crsf_commands.rc_encoder import RcEncoder
+
+STALLS = (50, 150, 300, 1000)  # ms
+RUN_UP = 1.0  # s of streaming before and after each stall
+
+
+async def stall_case(stall_ms: float, args) -> dict:
+    events = []
+    watchdog = FailsafeWatchdog(
+        args.timeout, on_change=lambda active: events.append((active, time.monotonic()))
+    )
+    receiver = CrsfReceiver(watchdog)
+    task = asyncio.create_task(watchdog.run())
+    encoder = RcEncoder()
+    channels = [992] * 16
+    period = 1 / args.rate
+    loop = asyncio.get_running_loop()
+
+    async def stream(seconds: float) -> float:
+        """Send for ``seconds``; returns the time of the last frame."""
+        start = loop.time()
+        tick = 0
+        last = None
+        while loop.time() < start + seconds:
+            channels[0] = 992 + tick % 800
+            receiver.receive(encoder.packet(channels, tick), time.time() * 1000)
+            last = time.monotonic()
+            tick += 1
+            await asyncio.sleep(start + tick * period - loop.time())
+        return last
+
+    last_frame = await stream(RUN_UP)
+    await asyncio.sleep(stall_ms / 1000)
+    resumed = time.monotonic()
+    await stream(RUN_UP)
+    task.cancel()
+    entered = [t for active, t in events if active]
+    cleared = [t for active, t in events if not active]
+    snap = watchdog.age.snapshot()
+    detect = (entered[0] - last_frame) * 1000 if entered else None
+    return {
+        "stall": stall_ms,
+        "misses": watchdog.misses,
+        "expected": 1 if stall_ms > args.timeout else 0,
+        "detect": detect,
+        "late": detect - args.timeout if entered else None,
+        "recover": (cleared[0] - resumed) * 1000 if cleared else None,
+        "p99": snap["p99"],
+        "max": snap["max"],
+    }
+
+
+def feed_costs(number: int = 200000) -> dict:
+    watchdog = FailsafeWatchdog()
+    channels = [992] * 16
+    feed = timeit.timeit(lambda: watchdog.feed(channels), number=number) / number
+    encoder = RcEncoder()
+    packets = [encoder.packet(channels, ts) for ts in range(20000)]
+
+    def receive_all(receiver) -> float:
+        t0 = time.perf_counter()
+        for i, packet in enumerate(packets):
+            receiver.receive(packet, i)
+        return (time.perf_counter() - t0) / len(packets)
+
+    return {
+        "feed": feed * 1e6,
+        "plain": receive_all(CrsfReceiver()) * 1e6,
+        "watched": receive_all(CrsfReceiver(FailsafeWatchdog())) * 1e6,
+    }
+
+
+def _ms(value) -> str:
+    return f"{value:7.1f}" if value is not None else f"{'-':>7}"
+
+
+async def main(args) -> int:
+    failed = False
+    print(f"timeout {args.timeout:g} ms, {args.rate:g} Hz")
+    print(
+        f"{'stall':>6} {'misses':>6} {'detect':>7} {'late':>7} {'recover':>7} "
+        f"{'age p99':>7} {'max':>7}"
+    )
+    for stall in args.stalls:
+        r = await stall_case(stall, args)
+        print(
+            f"{r['stall']:6g} {r['misses']:6d} {_ms(r['detect'])} {_ms(r['late'])} "
+            f"{_ms(r['recover'])} {r['p99']:7.1f} {r['max']:7.1f}"
+        )
+        failed |= r["misses"] != r["expected"]
+        failed |= r["late"] is not None and r["late"] > args.max_late
+    costs = feed_costs()
+    print(
+        f"feed {costs['feed']:.2f} us; receive {costs['plain']:.2f} us plain, "
+        f"{costs['watched']:.2f} us with watchdog"
+    )
+    failed |= costs["feed"] > args.max_feed_us
+    print("FAIL" if failed else "PASS")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=50.0, help="packets/s")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_MS, help="ms")
+    parser.add_argument(
+        "--stalls",
+        type=lambda v: [float(s) for s in v.split(",")],
+        default=list(STALLS),
+        help="ms, comma-separated",
+    )
+    parser.add_argument("--max-late", type=float, default=20.0, help="ms")
+    parser.add_argument("--max-feed-us", type=float, default=3.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,584 @@
+#!/usr/bin/env python3
+"""Ramp simulated drones and pults against one Janus until control degrades.
+
+Simulated drone ``i`` streams RC packets at ``--rate`` as drone_crsf does,
+and has a streaming mountpoint ``STREAM_BASE + i`` as drone_video does:
+
+* ``--transport textroom``: the drone joins TextRoom ``ROOM_BASE + i`` on
+  its own peer connection, and ``--pults`` CRSF pults per drone join it as
+  controller_crsf does;
+* ``--transport udp``: the drone sends to its mountpoint's data port, and
+  RC reaches the video pults.
+
+``--video-pults`` pults per drone watch its mountpoint with controller_video's
+``StreamReceiver``: decoding, one dummy window of tiles, and passthrough
+recording to a temporary directory. MockJanus serves each viewer a
+synthetic pattern. Against a real Janus, the mountpoints only carry video
+if something feeds them, e.g. drone_video with its test source.
+
+Load ramps through ``--steps`` (drone counts). Clients from earlier steps
+keep running. Each step adds drones with their pults, waits until all are
+connected, settles for ``--warmup`` s and measures for ``--duration`` s:
+
+* RC delay p50/p99/max at the pults (each packet's send time on its drone
+  to its arrival, matched by SSRC and sequence number; one host, one
+  clock) and packet loss;
+* video frames/s per video pult and frame latency p99;
+* CPU (1.0 = one core) and RSS of the generator processes, and of Janus
+  if ``--mock`` started it or ``--janus-pid`` names it.
+
+``--workers W`` spreads the drones, each with its pults, over W processes;
+0 runs everything in this one. The first step whose RC p99 is above
+``--max-p99`` ms, or whose loss is above ``--max-loss``, is reported as the
+limit.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aiortc import RTCPeerConnection
+
+from bench.udp_control import TimedReceiver, proc_usage
+from common.janus_client import JanusClient
+from common.janus_supervisor import JanusSupervisor
+from common.latency_stats import Histogram
+from common.textroom import ensure_room, negotiate_textroom
+from crsf_commands.control_channel import CONTROL_MODES, create_channels
+from crsf_commands.drone_crsf import JANUS_HOST, PT, TRANSPORTS, next_channels
+from crsf_commands.rc_encoder import RcEncoder
+from crsf_commands.tx_scheduler import TxScheduler
+from video.controller_video import StreamReceiver, stream_setup
+from video.mountpoint import ensure_mountpoint
+from video.tiled_display import TiledDisplay
+
+URL = "ws://127.0.0.1:8188"
+ROOM_BASE = 5000
+STREAM_BASE = 5000
+PORT_BASE = 20000  # mountpoint i: video on PORT_BASE + 2i, data on the next port
+STEPS = (1, 2, 4, 8)
+CONNECT_TIMEOUT = 30.0  # s for a step's new clients to come up
+
+
+def data_port(index: int) -> int:
+    return PORT_BASE + 2 * index + 1
+
+
+def _quiet(line) -> None:
+    pass
+
+
+class RoomMember:
+    """A TextRoom member on its own supervised peer connection.
+
+    Negotiates and joins like the crsf scripts; ``on_open(rc)`` runs once the
+    join is sent, and binary messages go to ``on_message``.
+    """
+
+    def __init__(self, args, room, username, on_open=None, on_message=None):
+        self.args = args
+        self.room = room
+        self.username = username
+        self.on_open = on_open
+        self.on_message = on_message
+        self.connected = False
+        self._pc = self._handle = self._supervisor = self._task = None
+
+    async def start(self) -> None:
+        self._supervisor = JanusSupervisor(self.args.janus, self._setup, emit=_quiet)
+        self._task = asyncio.create_task(self._supervisor.run())
+
+    async def _setup(self, janus) -> None:
+        if self._pc is not None:
+            await self._pc.close()
+        pc = self._pc = RTCPeerConnection()
+        opened = asyncio.get_running_loop().create_future()
+
+        @pc.on("connectionstatechange")
+        def on_state():
+            if pc.connectionState == "failed":
+                self.connected = False
+                self._supervisor.fail()
+
+        dc, rc = create_channels(pc, self.args.control)
+
+        @dc.on("open")
+        def on_open():
+            join = {"textroom": "join", "transaction": "j", "room": self.room}
+            join.update(username=self.username, display=self.username)
+            dc.send(json.dumps(dict(join, datatype="binary")))
+            if self.on_open is not None:
+                self.on_open(dc, rc)
+            if not opened.done():
+                opened.set_result(None)
+
+        def on_msg(msg):
+            if isinstance(msg, bytes) and self.on_message is not None:
+                self.on_message(msg)
+
+        dc.on("message", on_msg)
+        if rc is not dc:
+            rc.on("message", on_msg)
+        self._handle = await negotiate_textroom(janus, pc, self._handle)
+        await opened
+        self.connected = True
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await self._supervisor.close()
+        if self._pc is not None:
+            await self._pc.close()
+
+
+class SimDrone:
+    """RC at ``--rate`` over the TextRoom or to the mountpoint's data port."""
+
+    def __init__(self, index: int, args):
+        self.index = index
+        self.args = args
+        self.encoder = RcEncoder(payload_type=PT)
+        self.sent = 0
+        self.sent_at = {}  # (ssrc, seq) -> send time, ms since the epoch
+        self._member = self._sock = None
+        self._tasks = []
+
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None or self._member.connected
+
+    def _scheduler(self, send) -> TxScheduler:
+        return TxScheduler(self.args.rate, send, report_interval=3600, emit=_quiet)
+
+    async def start(self) -> None:
+        if self.args.transport == "udp":
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.setblocking(False)
+            self._sock.connect((self.args.host, data_port(self.index)))
+            self._tasks.append(asyncio.create_task(self._scheduler(self._send).run()))
+            return
+        self._member = RoomMember(
+            self.args, ROOM_BASE + self.index, f"drone{self.index}", self._on_open
+        )
+        await self._member.start()
+
+    def _packet(self) -> bytes:
+        now_ms = time.time() * 1000
+        self.sent_at[(self.encoder.ssrc, self.encoder.seq)] = now_ms
+        return self.encoder.packet(next_channels(), int(now_ms))
+
+    def _send(self) -> None:
+        try:
+            self._sock.send(self._packet())
+        except (BlockingIOError, ConnectionRefusedError):
+            return
+        self.sent += 1
+
+    def _on_open(self, dc, rc) -> None:
+        def send():
+            if rc.readyState == "open":
+                rc.send(self._packet())
+                self.sent += 1
+
+        scheduler = self._scheduler(send)
+        self._tasks.append(
+            asyncio.create_task(scheduler.run(lambda: dc.readyState == "open"))
+        )
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._member is not None:
+            await self._member.close()
+        if self._sock is not None:
+            self._sock.close()
+
+
+class CrsfPult:
+    """Receives one drone's RC in its TextRoom, as controller_crsf does."""
+
+    def __init__(self, drone: int, number: int, args):
+        self.drone = drone
+        self.receiver = TimedReceiver()
+        self.receiver.recording = True
+        self._member = RoomMember(
+            args,
+            ROOM_BASE + drone,
+            f"pult{drone}_{number}",
+            on_message=lambda msg: self.receiver.receive(msg, time.time() * 1000),
+        )
+
+    @property
+    def connected(self) -> bool:
+        return self._member.connected
+
+    async def start(self) -> None:
+        await self._member.start()
+
+    async def close(self) -> None:
+        await self._member.close()
+
+
+class VideoPult:
+    """Watches one drone's mountpoint with controller_video's StreamReceiver."""
+
+    def __init__(self, drone: int, number: int, args, display, record_dir):
+        self.drone = drone
+        self.args = args
+        self.stream = StreamReceiver(
+            STREAM_BASE + drone,
+            os.path.join(record_dir, f"pult{drone}_{number}.mp4"),
+            stats_interval=3600,
+            display=display,
+            prefix="",
+        )
+        self.receiver = self.stream.control = TimedReceiver()
+        self.receiver.recording = True
+        self._supervisor = self._task = None
+
+    @property
+    def connected(self) -> bool:
+        return self._supervisor is not None and self._supervisor.ready.is_set()
+
+    async def start(self) -> None:
+        self._supervisor = JanusSupervisor(
+            self.args.janus, stream_setup([self.stream]), emit=_quiet
+        )
+        self.stream.on_failed = self._supervisor.fail
+        self.stream.start()
+        self._task = asyncio.create_task(self._supervisor.run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await self._supervisor.close()
+        await self.stream.close()
+
+
+class Worker:
+    """The drones and pults of one process; driven by the coordinator."""
+
+    def __init__(self, args, max_video: int):
+        self.args = args
+        self.drones = {}
+        self.pults = []
+        self.record_dir = tempfile.mkdtemp(prefix="load_generator_")
+        self.display = None
+        if max_video:
+            self.display = TiledDisplay(max_video)
+            self.display.start()
+        self._base = {}
+
+    async def scale(self, indices) -> dict:
+        """Start the drones in ``indices`` not running yet, with their pults."""
+        new = []
+        for i in indices:
+            if i in self.drones:
+                continue
+            self.drones[i] = SimDrone(i, self.args)
+            new.append(self.drones[i])
+            if self.args.transport == "textroom":
+                for j in range(self.args.pults):
+                    new.append(CrsfPult(i, j, self.args))
+            for j in range(self.args.video_pults):
+                new.append(
+                    VideoPult(i, j, self.args, self.display, self.record_dir)
+                )
+        self.pults += [c for c in new if not isinstance(c, SimDrone)]
+        for client in new:
+            await client.start()
+        clients = list(self.drones.values()) + self.pults
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while time.monotonic() < deadline:
+            if all(c.connected for c in clients):
+                break
+            await asyncio.sleep(0.1)
+        return {
+            "clients": len(clients),
+            "connected": sum(c.connected for c in clients),
+        }
+
+    def _reset(self) -> None:
+        for drone in self.drones.values():
+            drone.sent_at.clear()
+        for pult in self.pults:
+            pult.receiver.arrivals.clear()
+            if isinstance(pult, VideoPult):
+                pult.stream.stats.rotate()
+        rtp = [p.receiver.rtp for p in self.pults]
+        self._base = {
+            "sent": sum(d.sent for d in self.drones.values()),
+            "expected": sum(r.expected for r in rtp),
+            "lost": sum(r.lost for r in rtp),
+            "frames": sum(
+                p.stream.frames_total for p in self.pults if isinstance(p, VideoPult)
+            ),
+            "cpu": time.process_time(),
+            "time": time.monotonic(),
+        }
+
+    async def measure(self, warmup: float, duration: float) -> dict:
+        await asyncio.sleep(warmup)
+        self._reset()
+        await asyncio.sleep(duration)
+        base = self._base
+        elapsed = time.monotonic() - base["time"]
+        delay, video = Histogram(), Histogram()
+        videos = [p for p in self.pults if isinstance(p, VideoPult)]
+        for pult in self.pults:
+            sent_at = self.drones[pult.drone].sent_at
+            for key, arrival_ms in pult.receiver.arrivals.items():
+                sent_ms = sent_at.get(key)
+                if sent_ms is not None:
+                    delay.record(arrival_ms - sent_ms)
+        for pult in videos:
+            video.merge(pult.stream.stats.histogram("latency"))
+        rtp = [p.receiver.rtp for p in self.pults]
+        return {
+            "elapsed": elapsed,
+            "sent": sum(d.sent for d in self.drones.values()) - base["sent"],
+            "expected": sum(r.expected for r in rtp) - base["expected"],
+            "lost": sum(r.lost for r in rtp) - base["lost"],
+            "delay": delay,
+            "videos": len(videos),
+            "frames": sum(p.stream.frames_total for p in videos) - base["frames"],
+            "video": video,
+            "cpu": time.process_time() - base["cpu"],
+            "rss_mb": proc_usage(os.getpid())[1],
+        }
+
+    async def close(self) -> None:
+        for client in self.pults + list(self.drones.values()):
+            await client.close()
+        if self.display is not None:
+            await asyncio.to_thread(self.display.stop)
+        shutil.rmtree(self.record_dir, ignore_errors=True)
+
+
+async def _serve(conn, args, max_video: int) -> None:
+    worker = Worker(args, max_video)
+    try:
+        while True:
+            command, arg = await asyncio.to_thread(conn.recv)
+            if command == "scale":
+                conn.send(await worker.scale(arg))
+            elif command == "measure":
+                conn.send(await worker.measure(*arg))
+            else:
+                break
+    finally:
+        await worker.close()
+
+
+def worker_main(conn, args, max_video: int) -> None:
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        asyncio.run(_serve(conn, args, max_video))
+
+
+class RemoteWorker:
+    """A Worker in a child process, with the same coroutine interface."""
+
+    def __init__(self, context, args, max_video: int):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=worker_main, args=(child, args, max_video), daemon=True
+        )
+        self.process.start()
+
+    async def _call(self, command, arg):
+        self.conn.send((command, arg))
+        return await asyncio.to_thread(self.conn.recv)
+
+    async def scale(self, indices) -> dict:
+        return await self._call("scale", indices)
+
+    async def measure(self, warmup: float, duration: float) -> dict:
+        return await self._call("measure", (warmup, duration))
+
+    async def close(self) -> None:
+        self.conn.send(("stop", None))
+        await asyncio.to_thread(self.process.join, 10)
+        if self.process.is_alive():
+            self.process.kill()
+
+
+async def start_mock(url: str):
+    port = urlsplit(url).port or 8188
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        os.path.join(ROOT, "bench/mock_janus.py"),
+        "--port",
+        str(port),
+        stdout=asyncio.subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + CONNECT_TIMEOUT
+    while True:
+        try:
+            async with JanusClient(url):
+                return process
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def prepare(args, drones: int) -> None:
+    """Create the rooms and mountpoints the largest step needs."""
+    async with JanusClient(args.janus) as client:
+        for i in range(drones):
+            if args.transport == "textroom":
+                await ensure_room(client, ROOM_BASE + i)
+            if args.video_pults or args.transport == "udp":
+                await ensure_mountpoint(
+                    client, STREAM_BASE + i, PORT_BASE + 2 * i, data_port(i)
+                )
+
+
+def report(*args) -> None:
+    print(*args, file=sys.__stdout__, flush=True)
+
+
+def combine(results, janus) -> dict:
+    delay, video = Histogram(), Histogram()
+    for r in results:
+        delay.merge(r["delay"])
+        video.merge(r["video"])
+    elapsed = max(r["elapsed"] for r in results)
+    expected = sum(r["expected"] for r in results)
+    videos = sum(r["videos"] for r in results)
+    frames = sum(r["frames"] for r in results)
+    return {
+        "delay": delay.snapshot(),
+        "loss": sum(r["lost"] for r in results) / expected if expected else 0.0,
+        "fps": frames / elapsed / videos if videos else None,
+        "video_p99": video.snapshot()["p99"] if videos else None,
+        "cpu": sum(r["cpu"] for r in results) / elapsed,
+        "rss_mb": sum(r["rss_mb"] for r in results),
+        "janus_cpu": janus[0] if janus else None,
+        "janus_rss_mb": janus[1] if janus else None,
+    }
+
+
+def _opt(value, fmt: str, width: int) -> str:
+    return format(value, fmt) if value is not None else f"{'-':>{width}}"
+
+
+async def main(args) -> int:
+    janus_process = None
+    janus_pid = args.janus_pid
+    if args.mock:
+        janus_process = await start_mock(args.janus)
+        janus_pid = janus_process.pid
+    drones = max(args.steps)
+    count = args.workers or 1
+    per_worker = -(-drones // count)  # drones of the busiest worker
+    max_video = per_worker * args.video_pults
+    if args.workers:
+        context = multiprocessing.get_context("spawn")
+        workers = [RemoteWorker(context, args, max_video) for _ in range(count)]
+    else:
+        workers = [Worker(args, max_video)]
+    limit = None
+    try:
+        await prepare(args, drones)
+        report(
+            f"{args.transport}/{args.control}, {args.rate:g} Hz, "
+            f"{args.pults if args.transport == 'textroom' else 0} CRSF and "
+            f"{args.video_pults} video pult(s) per drone, {count} process(es)"
+        )
+        report(
+            f"{'drones':>6} {'up':>7} {'rc p50':>7} {'p99':>7} {'max':>7} "
+            f"{'loss':>6} {'fps':>5} {'v p99':>7} {'cpu':>5} {'rss MB':>7} "
+            f"{'janus cpu':>9} {'MB':>6}"
+        )
+        for step in args.steps:
+            ups = await asyncio.gather(
+                *(
+                    w.scale([i for i in range(step) if i % count == k])
+                    for k, w in enumerate(workers)
+                )
+            )
+            measuring = asyncio.gather(
+                *(w.measure(args.warmup, args.duration) for w in workers)
+            )
+            await asyncio.sleep(args.warmup)
+            janus = None
+            if janus_pid:
+                cpu0, _ = proc_usage(janus_pid)
+                t0 = time.monotonic()
+            results = await measuring
+            if janus_pid:
+                cpu1, rss = proc_usage(janus_pid)
+                janus = ((cpu1 - cpu0) / (time.monotonic() - t0), rss)
+            r = combine(results, janus)
+            d = r["delay"]
+            up = f"{sum(u['connected'] for u in ups)}/{sum(u['clients'] for u in ups)}"
+            report(
+                f"{step:6d} {up:>7} {d['p50']:7.1f} {d['p99']:7.1f} {d['max']:7.1f} "
+                f"{r['loss'] * 100:5.1f}% {_opt(r['fps'], '5.1f', 5)} "
+                f"{_opt(r['video_p99'], '7.1f', 7)} {r['cpu']:5.2f} "
+                f"{r['rss_mb']:7.1f} {_opt(r['janus_cpu'], '9.2f', 9)} "
+                f"{_opt(r['janus_rss_mb'], '6.1f', 6)}"
+            )
+            if limit is None and (d["p99"] > args.max_p99 or r["loss"] > args.max_loss):
+                limit = step
+    finally:
+        for worker in workers:
+            await worker.close()
+        if janus_process is not None:
+            janus_process.terminate()
+            await janus_process.wait()
+    if limit is None:
+        report(f"no limit up to {drones} drones")
+    else:
+        report(
+            f"limit: {limit} drones (RC p99 > {args.max_p99:g} ms "
+            f"or loss > {args.max_loss * 100:g}%)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--janus", default=URL, help="Janus WebSocket URL")
+    parser.add_argument(
+        "--mock", action="store_true", help="start MockJanus at --janus first"
+    )
+    parser.add_argument("--janus-pid", type=int, help="sample this Janus's CPU/RSS")
+    parser.add_argument(
+        "--steps",
+        type=lambda v: [int(s) for s in v.split(",")],
+        default=list(STEPS),
+        help="drones per step, comma-separated",
+    )
+    parser.add_argument("--pults", type=int, default=1, help="CRSF pults per drone")
+    parser.add_argument("--video-pults", type=int, default=0, help="per drone")
+    parser.add_argument("--rate", type=float, default=50.0, help="RC packets/s")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="textroom")
+    parser.add_argument("--control", choices=CONTROL_MODES, default="reliable")
+    parser.add_argument("--host", default=JANUS_HOST, help="udp transport only")
+    parser.add_argument("--workers", type=int, default=0, help="0: one process")
+    parser.add_argument("--warmup", type=float, default=3.0, help="s per step")
+    parser.add_argument("--duration", type=float, default=10.0, help="s per step")
+    parser.add_argument("--max-p99", type=float, default=50.0, help="ms")
+    parser.add_argument("--max-loss", type=float, default=0.01)
+    args = parser.parse_args()
+    if args.transport == "udp" and not args.video_pults:
+        parser.error("--transport udp delivers RC to video pults; set --video-pults")
+    if sorted(args.steps) != args.steps:
+        parser.error("--steps must not decrease")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        sys.exit(asyncio.run(main(args)))
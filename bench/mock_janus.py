@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""Local stand-in for Janus, for benchmarks and recovery tests.
+
+Speaks the Janus WebSocket API (``create``, ``attach``, ``claim``,
+``keepalive``, ``detach``, ``destroy`` and plugin ``message``) on one port.
+Only as much of each plugin is implemented as the scripts need:
+
+* streaming: ``info``/``create``/``list`` mountpoints, and ``watch``, which
+  offers an aiortc H.264 track of a synthetic pattern (the loopback media
+  source), followed by ``start``. Mountpoints created with ``data`` listen
+  on their ``dataport`` and relay each datagram, unchanged, to the data
+  channel of every viewer;
+* textroom: ``setup``/``ack`` negotiate a data channel peer connection, and
+  ``exists``/``create`` manage room ids (1234 exists from the start, as in
+  the sample config, but any room can be joined); on
+  the data channel ``join``, ``message`` (with ``to``/``tos``) and ``leave``
+  work as in Janus, and binary messages are relayed to the rest of the room,
+  on the receiver's channel with the same label if it opened one.
+
+Fault injection for tests:
+
+* ``drop_connections()`` closes every WebSocket; sessions stay claimable;
+* ``stall_connections()`` stops reading from the sockets, so pings go
+  unanswered, like a link that went silent;
+* ``expire_sessions()`` forgets all sessions and closes their peer
+  connections, like a Janus restart or a session timeout.
+
+``requests`` counts what was asked for (``"create"``,
+``"streaming.create"``...). ``python bench/mock_janus.py`` serves on
+127.0.0.1:8188 until interrupted.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import random
+import time
+
+import av
+import numpy as np
+import websockets
+from aiortc import (
+    RTCPeerConnection,
+    RTCRtpSender,
+    RTCSessionDescription,
+    VideoStreamTrack,
+)
+
+HOST = "127.0.0.1"
+PORT = 8188
+FRAME_SIZE = (320, 240)
+
+ERROR_SESSION_NOT_FOUND = 458
+ERROR_HANDLE_NOT_FOUND = 459
+ERROR_UNKNOWN_REQUEST = 453
+STREAMING_NO_SUCH_MOUNTPOINT = 455
+STREAMING_INVALID_REQUEST = 450
+TEXTROOM_INVALID_REQUEST = 412
+TEXTROOM_ROOM_EXISTS = 418
+TEXTROOM_USERNAME_EXISTS = 421
+TEXTROOM_NOT_IN_ROOM = 422
+
+
+class PatternTrack(VideoStreamTrack):
+    """Frames whose gray level changes every frame, so each one encodes."""
+
+    def __init__(self):
+        super().__init__()
+        self._frame = 0
+
+    async def recv(self):
+        pts, time_base = await self.next_timestamp()
+        width, height = FRAME_SIZE
+        level = (self._frame * 5) % 255
+        self._frame += 1
+        img = np.full((height, width, 3), level, np.uint8)
+        frame = av.VideoFrame.from_ndarray(img, format="rgb24")
+        frame.pts = pts
+        frame.time_base = time_base
+        return frame
+
+
+class _Session:
+    def __init__(self, session_id, ws):
+        self.id = session_id
+        self.ws = ws
+        self.handles = {}  # handle id -> plugin name
+        self.pcs = {}  # handle id -> RTCPeerConnection
+
+
+class MockJanus:
+    def __init__(self, host: str = HOST, port: int = PORT):
+        self.host = host
+        self.port = port
+        self.sessions = {}
+        self.mountpoints = {}
+        self.rooms = collections.defaultdict(dict)  # room -> username -> _Member
+        self.room_ids = {1234}  # rooms that ``exists`` reports
+        self._members = collections.defaultdict(list)  # handle id -> [_Member]
+        self._channels = collections.defaultdict(dict)  # handle id -> label -> chan
+        self._data_ports = {}  # mountpoint id -> DatagramTransport
+        self._viewers = collections.defaultdict(set)  # mountpoint id -> channels
+        self.requests = collections.Counter()
+        self._connections = set()
+        self._stalled = set()
+        self._server = None
+
+    async def start(self) -> None:
+        self._server = await websockets.serve(
+            self._serve, self.host, self.port, subprotocols=["janus-protocol"]
+        )
+
+    async def stop(self) -> None:
+        await self.expire_sessions()
+        for transport in self._data_ports.values():
+            transport.close()
+        self._data_ports.clear()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def drop_connections(self) -> None:
+        for ws in list(self._connections):
+            if ws in self._stalled:
+                ws.transport.abort()  # a closing handshake would never finish
+            else:
+                await ws.close()
+
+    def stall_connections(self) -> None:
+        for ws in list(self._connections):
+            ws.transport.pause_reading()
+            self._stalled.add(ws)
+
+    async def expire_sessions(self) -> None:
+        for session in list(self.sessions.values()):
+            await self.expire_session(session)
+
+    async def _serve(self, ws) -> None:
+        self._connections.add(ws)
+        try:
+            async for raw in ws:
+                msg = json.loads(raw)
+                try:
+                    await self._handle(ws, msg)
+                except Exception as e:  # reported to the client, like Janus
+                    await self._error(ws, msg, ERROR_UNKNOWN_REQUEST, str(e))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._connections.discard(ws)
+            self._stalled.discard(ws)
+
+    async def _send(self, ws, msg: dict) -> None:
+        try:
+            await ws.send(json.dumps(msg))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _error(self, ws, msg, code, reason) -> None:
+        await self._send(
+            ws,
+            {
+                "janus": "error",
+                "transaction": msg.get("transaction"),
+                "error": {"code": code, "reason": reason},
+            },
+        )
+
+    async def _handle(self, ws, msg: dict) -> None:
+        kind = msg.get("janus")
+        tx = msg.get("transaction")
+        self.requests[kind] += 1
+
+        if kind == "create":
+            session = _Session(random.randint(1, 2**52), ws)
+            self.sessions[session.id] = session
+            await self._send(
+                ws, {"janus": "success", "transaction": tx, "data": {"id": session.id}}
+            )
+            return
+
+        session = self.sessions.get(msg.get("session_id"))
+        if session is None:
+            await self._error(ws, msg, ERROR_SESSION_NOT_FOUND, "No such session")
+            return
+
+        if kind == "claim":
+            session.ws = ws
+            await self._send(ws, {"janus": "success", "transaction": tx})
+        elif kind == "keepalive":
+            await self._send(ws, {"janus": "ack", "transaction": tx})
+        elif kind == "destroy":
+            await self.expire_session(session)
+            await self._send(ws, {"janus": "success", "transaction": tx})
+        elif kind == "attach":
+            handle_id = random.randint(1, 2**52)
+            session.handles[handle_id] = msg["plugin"].rsplit(".", 1)[-1]
+            await self._send(
+                ws,
+                {
+                    "janus": "success",
+                    "transaction": tx,
+                    "session_id": session.id,
+                    "data": {"id": handle_id},
+                },
+            )
+        elif kind in ("detach", "message", "trickle"):
+            handle_id = msg.get("handle_id")
+            if handle_id not in session.handles:
+                await self._error(ws, msg, ERROR_HANDLE_NOT_FOUND, "No such handle")
+            elif kind == "detach":
+                pc = session.pcs.pop(handle_id, None)
+                if pc is not None:
+                    self._leave_all(handle_id)
+                    await pc.close()
+                del session.handles[handle_id]
+                await self._send(ws, {"janus": "success", "transaction": tx})
+            elif kind == "trickle":
+                await self._send(ws, {"janus": "ack", "transaction": tx})
+            else:
+                await self._plugin_message(session, handle_id, msg)
+        else:
+            await self._error(ws, msg, ERROR_UNKNOWN_REQUEST, f"Unknown request {kind}")
+
+    async def expire_session(self, session: _Session) -> None:
+        self.sessions.pop(session.id, None)
+        for handle_id, pc in session.pcs.items():
+            self._leave_all(handle_id)
+            await pc.close()
+
+    async def _plugin_message(self, session: _Session, handle_id, msg) -> None:
+        plugin = session.handles[handle_id]
+        body = msg.get("body", {})
+        request = body.get("request")
+        self.requests[f"{plugin}.{request}"] += 1
+        if plugin == "streaming":
+            await self._streaming(session, handle_id, msg, body)
+        elif plugin == "textroom":
+            await self._textroom(session, handle_id, msg, body)
+        else:
+            await self._event(
+                session,
+                handle_id,
+                msg,
+                {"error_code": ERROR_UNKNOWN_REQUEST, "error": f"Plugin {plugin}"},
+            )
+
+    async def _success(self, session, handle_id, msg, data: dict) -> None:
+        plugin = session.handles[handle_id]
+        await self._send(
+            session.ws,
+            {
+                "janus": "success",
+                "transaction": msg.get("transaction"),
+                "sender": handle_id,
+                "plugindata": {"plugin": f"janus.plugin.{plugin}", "data": data},
+            },
+        )
+
+    async def _event(self, session, handle_id, msg, data: dict, jsep=None) -> None:
+        plugin = session.handles[handle_id]
+        await self._send(
+            session.ws, {"janus": "ack", "transaction": msg.get("transaction")}
+        )
+        event = {
+            "janus": "event",
+            "transaction": msg.get("transaction"),
+            "sender": handle_id,
+            "plugindata": {"plugin": f"janus.plugin.{plugin}", "data": data},
+        }
+        if jsep is not None:
+            event["jsep"] = jsep
+        await self._send(session.ws, event)
+
+    async def _streaming(self, session, handle_id, msg, body) -> None:
+        request = body.get("request")
+        if request == "info":
+            info = self.mountpoints.get(body.get("id"))
+            if info is None:
+                data = {
+                    "streaming": "event",
+                    "error_code": STREAMING_NO_SUCH_MOUNTPOINT,
+                    "error": f"No such mountpoint ({body.get('id')})",
+                }
+            else:
+                data = {"streaming": "info", "info": info}
+            await self._success(session, handle_id, msg, data)
+        elif request == "create":
+            info = {k: v for k, v in body.items() if k != "request"}
+            self.mountpoints[body["id"]] = info
+            if info.get("data") and body["id"] not in self._data_ports:
+                await self._open_data_port(body["id"], info["dataport"])
+            data = {"streaming": "created", "stream": {"id": body["id"]}}
+            await self._success(session, handle_id, msg, data)
+        elif request == "list":
+            data = {"streaming": "list", "list": list(self.mountpoints.values())}
+            await self._success(session, handle_id, msg, data)
+        elif request == "watch":
+            pc = RTCPeerConnection()
+            old = session.pcs.pop(handle_id, None)
+            if old is not None:
+                await old.close()
+            session.pcs[handle_id] = pc
+            mountpoint = self.mountpoints.get(body.get("id"), {})
+            if mountpoint.get("data"):
+                channel = pc.createDataChannel("JanusDataChannel")
+                self._viewers[body["id"]].add(channel)
+            transceiver = pc.addTransceiver(PatternTrack(), direction="sendonly")
+            transceiver.setCodecPreferences(
+                [
+                    c
+                    for c in RTCRtpSender.getCapabilities("video").codecs
+                    if c.mimeType == "video/H264"
+                ]
+            )
+            await pc.setLocalDescription(await pc.createOffer())
+            data = {"streaming": "event", "result": {"status": "preparing"}}
+            jsep = {"type": "offer", "sdp": pc.localDescription.sdp}
+            await self._event(session, handle_id, msg, data, jsep)
+        elif request == "start":
+            jsep = msg["jsep"]
+            await session.pcs[handle_id].setRemoteDescription(
+                RTCSessionDescription(jsep["sdp"], jsep["type"])
+            )
+            data = {"streaming": "event", "result": {"status": "starting"}}
+            await self._event(session, handle_id, msg, data)
+        else:
+            data = {
+                "streaming": "event",
+                "error_code": STREAMING_INVALID_REQUEST,
+                "error": f"Unknown request '{request}'",
+            }
+            await self._event(session, handle_id, msg, data)
+
+    async def _textroom(self, session, handle_id, msg, body) -> None:
+        request = body.get("request")
+        if request == "setup":
+            pc = RTCPeerConnection()
+            old = session.pcs.pop(handle_id, None)
+            if old is not None:
+                self._leave_all(handle_id)
+                await old.close()
+            session.pcs[handle_id] = pc
+            self._serve_channel(handle_id, pc.createDataChannel("JanusDataChannel"))
+            pc.on("datachannel", lambda ch: self._serve_channel(handle_id, ch))
+            await pc.setLocalDescription(await pc.createOffer())
+            jsep = {"type": "offer", "sdp": pc.localDescription.sdp}
+            data = {"textroom": "event", "result": "ok"}
+            await self._event(session, handle_id, msg, data, jsep)
+        elif request == "ack":
+            jsep = msg["jsep"]
+            await session.pcs[handle_id].setRemoteDescription(
+                RTCSessionDescription(jsep["sdp"], jsep["type"])
+            )
+            await self._event(session, handle_id, msg, {"textroom": "ack"})
+        elif request == "exists":
+            room = body.get("room")
+            exists = room in self.room_ids
+            data = {"textroom": "success", "room": room, "exists": exists}
+            await self._success(session, handle_id, msg, data)
+        elif request == "create":
+            room = body.get("room")
+            if room in self.room_ids:
+                data = {
+                    "textroom": "event",
+                    "error_code": TEXTROOM_ROOM_EXISTS,
+                    "error": f"Room {room} already exists",
+                }
+            else:
+                self.room_ids.add(room)
+                data = {"textroom": "created", "room": room, "permanent": False}
+            await self._success(session, handle_id, msg, data)
+        else:
+            data = {
+                "textroom": "event",
+                "error_code": TEXTROOM_INVALID_REQUEST,
+                "error": f"Unsupported request {request}",
+            }
+            await self._event(session, handle_id, msg, data)
+
+    async def _open_data_port(self, stream_id, port: int) -> None:
+        viewers = self._viewers[stream_id]
+
+        class DataPort(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                for channel in list(viewers):
+                    if channel.readyState == "closed":
+                        viewers.discard(channel)
+                    else:
+                        _send_data(channel, data)
+
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(
+            DataPort, local_addr=(self.host, port)
+        )
+        self._data_ports[stream_id] = transport
+
+    def _serve_channel(self, handle_id, channel) -> None:
+        self._channels[handle_id][channel.label] = channel
+
+        @channel.on("message")
+        def on_message(data):
+            if isinstance(data, str):
+                self._room_request(handle_id, channel, json.loads(data))
+                return
+            for member in self._members.get(handle_id, []):
+                for other in self.rooms[member.room].values():
+                    if other.handle_id != handle_id:
+                        channels = self._channels[other.handle_id]
+                        _send_data(channels.get(channel.label, other.channel), data)
+
+    def _room_request(self, handle_id, channel, req: dict) -> None:
+        kind = req.get("textroom")
+        tx = req.get("transaction")
+        room = req.get("room")
+        self.requests[f"textroom.{kind}"] += 1
+        members = self.rooms[room]
+        me = next((m for m in self._members[handle_id] if m.room == room), None)
+
+        def reply(data: dict) -> None:
+            _send_data(channel, json.dumps(dict(data, transaction=tx)))
+
+        def error(code: int, reason: str) -> None:
+            reply({"textroom": "error", "error_code": code, "error": reason})
+
+        if kind == "join":
+            username = req.get("username")
+            if username in members:
+                return error(TEXTROOM_USERNAME_EXISTS, f"Username '{username}' exists")
+            member = _Member(handle_id, room, username, req.get("display"), channel)
+            participants = [m.describe() for m in members.values()]
+            event = dict(member.describe(), textroom="join", room=room)
+            for other in members.values():
+                _send_data(other.channel, json.dumps(event))
+            members[username] = member
+            self._members[handle_id].append(member)
+            reply({"textroom": "success", "participants": participants})
+        elif me is None:
+            error(TEXTROOM_NOT_IN_ROOM, "Not in room")
+        elif kind == "message":
+            text = {
+                "textroom": "message",
+                "room": room,
+                "from": me.username,
+                "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "text": req.get("text"),
+            }
+            targets = req.get("tos") or ([req["to"]] if req.get("to") else None)
+            if targets is not None:
+                text["whisper"] = True
+            for other in members.values():
+                if other is not me and (targets is None or other.username in targets):
+                    _send_data(other.channel, json.dumps(text))
+            if req.get("ack", True):
+                reply({"textroom": "success"})
+        elif kind == "leave":
+            self._leave(me)
+            reply({"textroom": "success"})
+        else:
+            error(TEXTROOM_INVALID_REQUEST, f"Unsupported request {kind}")
+
+    def _leave(self, member) -> None:
+        self.rooms[member.room].pop(member.username, None)
+        self._members[member.handle_id].remove(member)
+        event = {"textroom": "leave", "room": member.room, "username": member.username}
+        for other in self.rooms[member.room].values():
+            _send_data(other.channel, json.dumps(event))
+
+    def _leave_all(self, handle_id) -> None:
+        for member in list(self._members.get(handle_id, [])):
+            self._leave(member)
+        self._members.pop(handle_id, None)
+        self._channels.pop(handle_id, None)
+
+
+class _Member:
+    def __init__(self, handle_id, room, username, display, channel):
+        self.handle_id = handle_id
+        self.room = room
+        self.username = username
+        self.display = display
+        self.channel = channel
+
+    def describe(self) -> dict:
+        return {"username": self.username, "display": self.display}
+
+
+def _send_data(channel, data) -> None:
+    if channel.readyState == "open":
+        channel.send(data)
+
+
+async def serve(host: str, port: int) -> None:
+    janus = MockJanus(host, port)
+    await janus.start()
+    print(f"Mock Janus on ws://{host}:{port}")
+    await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Janus stand-in")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
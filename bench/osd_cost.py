@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Per-frame cost of the pult's on-screen display at 1080p.
+
+Draws the OSD (``video.osd``) with a full set of lines (video, link,
+battery, attitude, gps, from a ``CrsfReceiver`` filled with samples) onto a
+1920x1080 surface for ``--frames`` frames, in four cases:
+
+* ``static``: the values never change;
+* ``2 Hz``: the lines change every ``--fps / 2`` frames, as when
+  ``StreamReceiver`` refreshes them every ``OSD_INTERVAL``;
+* ``every frame``: the lines change on every frame, the worst case;
+* ``naive``: no caching, every line rendered and a fresh panel allocated
+  and composited on every frame.
+
+Reports mean and p99 µs per frame, and text renders and overlay composites
+per frame. Exits 1 if the ``2 Hz`` case averages more than ``--max-us``.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+
+from common.latency_stats import Histogram
+from crsf_commands.crsf_receiver import CrsfReceiver
+from video.osd import COLOR, MARGIN, PANEL, Osd, stream_lines
+
+SIZE = (1920, 1080)
+
+
+def make_control(now_ms: float) -> CrsfReceiver:
+    control = CrsfReceiver()
+    series = control.telemetry.series
+    series["link"].append(now_ms, (-62, -64, 98, 9, 0, 4, 2, -70, 100, 7))
+    series["battery"].append(now_ms, (15.8, 12.4, 640, 71))
+    series["attitude"].append(now_ms, (0.05, -0.12, 1.57))
+    series["gps"].append(now_ms, (50.4501, 30.5234, 42.0, 90.0, 120, 14))
+    return control
+
+
+def frame_lines(i: int, change_every: int, control, now_ms: float) -> dict:
+    step = i // change_every if change_every else 0
+    latency = Histogram()
+    latency.record(80.0 + step % 40)
+    latency.record(120.0 + step % 25)
+    loss = 0.001 * (step % 7)
+    return stream_lines(30.0 - step % 3, latency, loss, control, None, now_ms)
+
+
+def naive_draw(font, screen, texts: dict) -> None:
+    surfaces = [font.render(text, True, COLOR) for text in texts.values()]
+    width = max(s.get_width() for s in surfaces) + 2 * MARGIN
+    height = sum(s.get_height() for s in surfaces) + 2 * MARGIN
+    panel = pygame.Surface((width, height), pygame.SRCALPHA)
+    panel.fill(PANEL)
+    y = MARGIN
+    for surface in surfaces:
+        panel.blit(surface, (MARGIN, y))
+        y += surface.get_height()
+    screen.blit(panel, (MARGIN, MARGIN))
+
+
+def run_case(name: str, change_every, args, screen, control, now_ms) -> dict:
+    # lines are formatted outside the timed part: on the pult that happens
+    # on the event loop, not in the display thread
+    lines = [
+        frame_lines(i, change_every, control, now_ms) for i in range(args.frames)
+    ]
+    osd = Osd()
+    font = None
+    if name == "naive":
+        pygame.font.init()
+        font = pygame.font.Font(None, osd.font_size)
+    costs = []
+    for texts in lines:
+        start = time.perf_counter()
+        if font is not None:
+            naive_draw(font, screen, texts)
+        else:
+            osd.update(texts)
+            osd.draw(screen)
+        costs.append((time.perf_counter() - start) * 1e6)
+    costs.sort()
+    return {
+        "name": name,
+        "mean": sum(costs) / len(costs),
+        "p99": costs[int(len(costs) * 0.99)],
+        "renders": osd.renders / args.frames if font is None else len(lines[0]),
+        "composites": osd.composites / args.frames if font is None else 1.0,
+    }
+
+
+def main(args) -> int:
+    screen = pygame.Surface(SIZE)
+    screen.fill((40, 90, 40))
+    now_ms = time.time() * 1000
+    control = make_control(now_ms)
+    half_second = max(1, round(args.fps / 2))
+    cases = (("static", 0), ("2 Hz", half_second), ("every frame", 1), ("naive", 1))
+    print(f"{args.frames} frames at {SIZE[0]}x{SIZE[1]}")
+    print(
+        f"{'case':>12} {'mean us':>8} {'p99 us':>8} {'renders':>8} "
+        f"{'composites':>10}"
+    )
+    results = {}
+    for name, change_every in cases:
+        r = results[name] = run_case(name, change_every, args, screen, control, now_ms)
+        print(
+            f"{r['name']:>12} {r['mean']:8.1f} {r['p99']:8.1f} "
+            f"{r['renders']:8.2f} {r['composites']:10.3f}"
+        )
+    failed = results["2 Hz"]["mean"] > args.max_us
+    print("FAIL" if failed else "PASS")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--max-us", type=float, default=500.0)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Time-to-recover of the supervised pult and drone against MockJanus.
+
+Runs a pult ``StreamReceiver`` under ``JanusSupervisor`` against the mock
+in-process, injects each fault and measures:
+
+* ``recover``: from the fault to the supervisor's recovery (loss detection
+  included; for "stall" that is the WebSocket ping timeout);
+* ``media``: from the fault to the next decoded frame;
+* the passthrough recording across the fault: whether the stream's
+  timestamps restarted from a new base (a new peer connection; aiortc
+  starts them near 0, so they go back), the frames written after it, and
+  the largest pts gap in the file, which stays within the outage when the
+  recorder rebases its timeline.
+
+Faults: ``drop`` (WebSocket closed, session claimable), ``stall`` (link goes
+silent) and ``expire`` (session lost, stream renegotiated). A last case
+checks that the drone side reuses its mountpoint after the session expires
+instead of creating it again. Exits 1 if a recovery takes longer than
+``--max-recovery`` seconds, or if a recording has a gap that long, goes
+backwards, or writes nothing after the fault.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import av
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.mock_janus import MockJanus
+from common.janus_supervisor import JanusSupervisor
+from video.controller_video import StreamReceiver, stream_setup
+from video.mountpoint import ensure_mountpoint
+from video.passthrough_recorder import MAX_JUMP, RTP_TS_MOD, VIDEO_TIME_BASE
+
+PORT = 8198
+URL = f"ws://127.0.0.1:{PORT}"
+FAULTS = ("drop", "stall", "expire")
+SETTLE = 2.0  # s of streaming before each fault
+RECORD_AFTER = 1.0  # s of streaming after the first frame past a fault
+
+
+async def inject(janus: MockJanus, fault: str) -> None:
+    if fault == "drop":
+        await janus.drop_connections()
+    elif fault == "stall":
+        janus.stall_connections()
+    elif fault == "expire":
+        await janus.expire_sessions()
+        await janus.drop_connections()
+
+
+async def next_frame(receiver: StreamReceiver, after: int) -> None:
+    while receiver.frames_total <= after:
+        await asyncio.sleep(0.005)
+
+
+def recording_gaps(path: str) -> tuple:
+    """(largest pts gap in s, whether pts ever went backwards) of a recording."""
+    with av.open(path) as container:
+        pts = [p.pts for p in container.demux(video=0) if p.pts is not None]
+    gaps = [b - a for a, b in zip(pts, pts[1:])]
+    return max(gaps, default=0) * VIDEO_TIME_BASE, any(g <= 0 for g in gaps)
+
+
+async def pult_case(janus: MockJanus, fault: str, timeout: float) -> dict:
+    record = os.path.join(tempfile.mkdtemp(), "reconnect.mp4")
+    receiver = StreamReceiver(1001, record, stats_interval=3600, prefix="")
+    recorder = receiver.recorder
+    push = recorder.push
+    base = {"last": None, "changed": False}
+
+    def watch_base(data, ts):
+        last = base["last"]
+        if last is not None:
+            delta = (ts - last + RTP_TS_MOD // 2) % RTP_TS_MOD - RTP_TS_MOD // 2
+            base["changed"] |= not 0 < delta <= MAX_JUMP
+        base["last"] = ts
+        push(data, ts)
+
+    recorder.push = watch_base
+    recovered = asyncio.get_running_loop().create_future()
+    supervisor = JanusSupervisor(
+        URL,
+        stream_setup([receiver]),
+        "[bench] ",
+        emit=lambda line: None,
+        on_recover=lambda seconds, mode: recovered.done()
+        or recovered.set_result(mode),
+    )
+    receiver.on_failed = supervisor.fail
+    receiver.start()
+    task = asyncio.create_task(supervisor.run())
+    try:
+        await asyncio.wait_for(supervisor.ready.wait(), timeout)
+        await asyncio.sleep(SETTLE)
+        frames = receiver.frames_total
+        written = recorder.written
+        start = time.monotonic()
+        await inject(janus, fault)
+        media = asyncio.create_task(next_frame(receiver, frames))
+        mode = await asyncio.wait_for(recovered, timeout)
+        recover = time.monotonic() - start
+        if fault == "drop" or fault == "stall":
+            # the old media path may survive; wait for a frame after recovery
+            frames = max(frames, receiver.frames_total)
+            media.cancel()
+            media = asyncio.create_task(next_frame(receiver, frames))
+        await asyncio.wait_for(media, timeout)
+        media_ms = (time.monotonic() - start) * 1000
+        await asyncio.sleep(RECORD_AFTER)
+    finally:
+        task.cancel()
+        await supervisor.close()
+        await receiver.close()
+    gap, backwards = recording_gaps(record)
+    return {
+        "fault": fault,
+        "mode": mode,
+        "recover_ms": recover * 1000,
+        "media_ms": media_ms,
+        "new_base": base["changed"],
+        "written": recorder.written - written,
+        "gap_ms": float(gap) * 1000,
+        "backwards": backwards,
+    }
+
+
+async def drone_case(janus: MockJanus, timeout: float) -> dict:
+    janus.mountpoints.clear()
+    before = janus.requests["streaming.create"]
+    recovered = asyncio.get_running_loop().create_future()
+    supervisor = JanusSupervisor(
+        URL,
+        lambda client: ensure_mountpoint(client, 1001, 8004, 8006),
+        emit=lambda line: None,
+        on_recover=lambda seconds, mode: recovered.set_result(mode),
+    )
+    task = asyncio.create_task(supervisor.run())
+    try:
+        await asyncio.wait_for(supervisor.ready.wait(), timeout)
+        start = time.monotonic()
+        await inject(janus, "expire")
+        mode = await asyncio.wait_for(recovered, timeout)
+        return {
+            "fault": "drone expire",
+            "mode": mode,
+            "recover_ms": (time.monotonic() - start) * 1000,
+            "media_ms": float("nan"),
+            "creates": janus.requests["streaming.create"] - before,
+        }
+    finally:
+        task.cancel()
+        await supervisor.close()
+
+
+async def main(args) -> int:
+    janus = MockJanus(port=PORT)
+    await janus.start()
+    results = []
+    try:
+        for fault in args.faults:
+            results.append(await pult_case(janus, fault, args.timeout))
+        results.append(await drone_case(janus, args.timeout))
+    finally:
+        await janus.stop()
+
+    failed = False
+    for r in results:
+        print(
+            f"{r['fault']:>12}: {r['mode']:<16} recover={r['recover_ms']:7.0f} ms "
+            f"next frame={r['media_ms']:7.0f} ms"
+        )
+        failed |= r["recover_ms"] > args.max_recovery * 1000
+        if "written" in r:
+            print(
+                f"{'':>12}  recording: new RTP base={'yes' if r['new_base'] else 'no'}"
+                f" written after={r['written']} max gap={r['gap_ms']:.0f} ms"
+                f"{' WENT BACKWARDS' if r['backwards'] else ''}"
+            )
+            failed |= r["written"] == 0 or r["backwards"]
+            failed |= r["gap_ms"] > args.max_recovery * 1000
+    creates = results[-1]["creates"]
+    if creates != 1:
+        print(f"FAIL: mountpoint created {creates} times, expected once")
+        failed = True
+    print("FAIL" if failed else "PASS")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--faults", type=lambda v: v.split(","), default=list(FAULTS)
+    )
+    parser.add_argument("--max-recovery", type=float, default=6.0, help="s")
+    parser.add_argument("--timeout", type=float, default=20.0, help="s")
+    sys.exit(asyncio.run(main(parser.parse_args())))
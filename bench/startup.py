@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Startup and time-to-first-frame of the real clients against MockJanus.
+
+Launches the entry points as they are run in the field, as subprocesses
+against ``MockJanus`` on the Janus port (8188, which the clients have
+hard-coded, so stop a local Janus first), and collects the phase marks the
+clients write through ``common.phase_timer``:
+
+* ``pult``: ``video/controller_video.py`` watching one stream:
+  import, ws_connect, session, attach, sdp, ice, first_packet, first_frame;
+* ``crsf``: ``crsf_commands/controller_crsf.py`` and ``drone_crsf.py`` on one
+  TextRoom: import, ws_connect, session, attach, sdp, ice, datachannel, and
+  first_send (drone) / first_packet (controller).
+
+Times are ms since the launcher spawned the process, so interpreter start-up
+and imports count. Each scenario runs ``--runs`` times; the report holds the
+median and max per phase as JSON (``--output``). With ``--baseline`` a
+previous report is compared and the run exits 1 if a median phase regressed
+by more than ``--tolerance`` (relative) and ``--slack`` ms.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.mock_janus import PORT, MockJanus
+from common.phase_timer import LOG_ENV, T0_ENV
+
+CONNECT_PHASES = ("import", "ws_connect", "session", "attach", "sdp", "ice")
+PULT_PHASES = CONNECT_PHASES + ("first_packet", "first_frame")
+CRSF_PHASES = CONNECT_PHASES + ("datachannel",)
+
+# scenario -> [(process name, script, stdin, phases, final phase)]
+SCENARIOS = {
+    "pult": [
+        (
+            "controller_video",
+            "video/controller_video.py",
+            "1001\n\n\n{tmp}/record.mp4\n",  # ids, mode, lag budget, file
+            PULT_PHASES,
+            "first_frame",
+        ),
+    ],
+    "crsf": [
+        (
+            "drone_crsf",
+            "crsf_commands/drone_crsf.py",
+            "",
+            CRSF_PHASES + ("first_send",),
+            "first_send",
+        ),
+        (
+            "controller_crsf",
+            "crsf_commands/controller_crsf.py",
+            "",
+            CRSF_PHASES + ("first_packet",),
+            "first_packet",
+        ),
+    ],
+}
+
+
+def read_marks(path: str) -> dict:
+    marks = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    marks.setdefault(entry["phase"], entry["ms"])
+    return marks
+
+
+async def stop(proc) -> None:
+    if proc.returncode is None:
+        proc.send_signal(signal.SIGINT)
+        try:
+            await asyncio.wait_for(proc.wait(), 3)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+
+
+async def run_once(scenario: str, timeout: float) -> dict:
+    """Run one scenario; returns {process: {phase: ms}}."""
+    tmp = tempfile.mkdtemp(prefix="startup-")
+    procs = []
+    try:
+        for name, script, stdin, _, final in SCENARIOS[scenario]:
+            log = os.path.join(tmp, f"{name}.jsonl")
+            env = dict(
+                os.environ,
+                SDL_VIDEODRIVER="dummy",
+                **{LOG_ENV: log, T0_ENV: repr(time.time())},
+            )
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable,
+                os.path.join(ROOT, script),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+                env=env,
+                cwd=tmp,
+            )
+            proc.stdin.write(stdin.format(tmp=tmp).encode())
+            await proc.stdin.drain()
+            procs.append((name, log, final, proc))
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if all(final in read_marks(log) for _, log, final, _ in procs):
+                break
+            if any(proc.returncode is not None for *_, proc in procs):
+                break
+            await asyncio.sleep(0.05)
+        return {name: read_marks(log) for name, log, _, _ in procs}
+    finally:
+        for *_, proc in procs:
+            await stop(proc)
+
+
+def _round(ms):
+    return None if ms is None else round(ms, 1)
+
+
+def summarize(runs: list, scenario: str) -> dict:
+    report = {}
+    for name, _, _, phases, _ in SCENARIOS[scenario]:
+        report[name] = {}
+        for phase in phases:
+            values = [run[name][phase] for run in runs if phase in run[name]]
+            report[name][phase] = {
+                "median_ms": _round(statistics.median(values) if values else None),
+                "max_ms": _round(max(values) if values else None),
+                "runs": len(values),
+            }
+    return report
+
+
+def compare(report: dict, baseline: dict, tolerance: float, slack: float) -> list:
+    regressions = []
+    for scenario, processes in baseline.get("scenarios", {}).items():
+        if scenario not in report["scenarios"]:
+            continue
+        for name, phases in processes.items():
+            entry = report["scenarios"][scenario].get(name, {})
+            for phase, base in phases.items():
+                now = entry.get(phase, {}).get("median_ms")
+                was = base.get("median_ms")
+                if was is None:
+                    continue
+                if now is None:
+                    regressions.append(f"{scenario}/{name}/{phase}: missing")
+                elif now > was * (1 + tolerance) + slack:
+                    regressions.append(
+                        f"{scenario}/{name}/{phase}: {now:.0f} ms "
+                        f"(baseline {was:.0f} ms)"
+                    )
+    return regressions
+
+
+def print_report(report: dict) -> None:
+    for scenario, processes in report["scenarios"].items():
+        for name, phases in processes.items():
+            print(f"{scenario}/{name}")
+            for phase, entry in phases.items():
+                if entry["median_ms"] is None:
+                    print(f"  {phase:>13}: -")
+                    continue
+                print(
+                    f"  {phase:>13}: median {entry['median_ms']:7.0f} ms  "
+                    f"max {entry['max_ms']:7.0f} ms  ({entry['runs']} runs)"
+                )
+
+
+async def main(args) -> int:
+    janus = MockJanus(port=PORT)
+    await janus.start()
+    report = {"runs": args.runs, "scenarios": {}}
+    try:
+        for scenario in args.scenarios:
+            runs = []
+            for _ in range(args.runs):
+                runs.append(await run_once(scenario, args.timeout))
+                await janus.expire_sessions()
+            report["scenarios"][scenario] = summarize(runs, scenario)
+    finally:
+        await janus.stop()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = any(
+        entry["runs"] < args.runs
+        for processes in report["scenarios"].values()
+        for phases in processes.values()
+        for entry in phases.values()
+    )
+    if failed:
+        print("FAIL: some phases were not reached in every run")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.slack)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        failed |= bool(regressions)
+    print("FAIL" if failed else "PASS")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenarios", type=lambda v: v.split(","), default=list(SCENARIOS)
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0, help="s per run")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--slack", type=float, default=50.0, help="ms")
+    sys.exit(asyncio.run(main(parser.parse_args())))
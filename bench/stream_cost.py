@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Per-stream decode and convert cost behind ``MAX_STREAMS_PER_CORE``.
+
+Encodes ``--frames`` frames of moving noise at ``--size``/``--fps`` and
+``--kbps`` with libx264 (zerolatency, as the drone sends), then times on one
+thread, per frame, the pult's work for one tile of ``run_multi_pult``:
+
+* ``decode``: H.264 decode with a PyAV codec context, as aiortc does;
+* ``convert``: ``to_ndarray(format="bgr24")``, as ``FrameBuffers`` does;
+* ``scale``: ``cv2.resize`` into a ``--tile`` array, as ``TiledDisplay`` does.
+
+RTP/SRTP handling is not reproduced here; ``--rtp-ms`` is added per frame as
+an estimate. Reports mean and p99 ms per step, the share of a core one stream
+takes at ``--fps``, and how many streams fit in ``--budget`` of a core.
+Exits 1 if that is fewer than ``--limit`` (``MAX_STREAMS_PER_CORE``; pass
+half of it with ``--size 1920x1080``).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import av
+import cv2
+import numpy as np
+
+from video.controller_video import MAX_STREAMS_PER_CORE
+
+STEPS = ("decode", "convert", "scale")
+
+
+def _size(value: str) -> tuple:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def encode(args) -> list:
+    width, height = args.size
+    codec = av.CodecContext.create("libx264", "w")
+    codec.width, codec.height = width, height
+    codec.pix_fmt = "yuv420p"
+    codec.framerate = round(args.fps)
+    codec.bit_rate = args.kbps * 1000
+    codec.options = {"preset": "veryfast", "tune": "zerolatency"}
+    rng = np.random.default_rng(0)
+    # blurred noise panning 4 px a frame: costly to code, cheap to generate
+    base = rng.integers(0, 256, (height, width + args.frames * 4, 3), np.uint8)
+    base = cv2.GaussianBlur(base, (0, 0), 1.5)
+    packets = []
+    for i in range(args.frames):
+        image = np.ascontiguousarray(base[:, i * 4 : i * 4 + width])
+        frame = av.VideoFrame.from_ndarray(image, format="bgr24")
+        frame.pts = i
+        packets.extend(bytes(p) for p in codec.encode(frame))
+    packets.extend(bytes(p) for p in codec.encode(None))
+    return packets
+
+
+def measure(packets: list, args) -> dict:
+    codec = av.CodecContext.create("h264", "r")
+    tile = np.empty((args.tile[1], args.tile[0], 3), np.uint8)
+    costs = {step: [] for step in STEPS}
+    for data in packets:
+        start = time.perf_counter()
+        frames = codec.decode(av.Packet(data))
+        decoded = time.perf_counter()
+        for frame in frames:
+            bgr = frame.to_ndarray(format="bgr24")
+            converted = time.perf_counter()
+            cv2.resize(bgr, args.tile, dst=tile, interpolation=cv2.INTER_LINEAR)
+            scaled = time.perf_counter()
+            costs["decode"].append((decoded - start) * 1000)
+            costs["convert"].append((converted - decoded) * 1000)
+            costs["scale"].append((scaled - converted) * 1000)
+    return costs
+
+
+def main(args) -> int:
+    cv2.setNumThreads(1)
+    packets = encode(args)
+    kbps = sum(len(p) for p in packets) * 8 * args.fps / args.frames / 1000
+    costs = measure(packets, args)
+    print(
+        f"{len(costs['decode'])} frames {args.size[0]}x{args.size[1]}@{args.fps:g} "
+        f"at {kbps:.0f} kbit/s -> {args.tile[0]}x{args.tile[1]} tile"
+    )
+    print(f"{'step':>8} {'mean ms':>8} {'p99 ms':>8}")
+    total = args.rtp_ms
+    for step in STEPS:
+        values = sorted(costs[step])
+        mean = sum(values) / len(values)
+        total += mean
+        print(f"{step:>8} {mean:8.2f} {values[int(len(values) * 0.99)]:8.2f}")
+    print(f"{'rtp':>8} {args.rtp_ms:8.2f} {'(est.)':>8}")
+    share = total * args.fps / 1000
+    fit = int(args.budget / share)
+    print(
+        f"{total:.2f} ms/frame, {share:.0%} of a core per stream; "
+        f"{fit} streams fit in {args.budget:.0%} (limit {args.limit})"
+    )
+    failed = fit < args.limit
+    print("FAIL" if failed else "PASS")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--size", type=_size, default=(1280, 720))
+    parser.add_argument("--tile", type=_size, default=(640, 360))
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--kbps", type=int, default=10000)
+    parser.add_argument("--rtp-ms", type=float, default=1.0)
+    parser.add_argument("--budget", type=float, default=0.75)
+    parser.add_argument("--limit", type=int, default=MAX_STREAMS_PER_CORE)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Telemetry downlink throughput, batched against one frame per datagram.
+
+Runs ``drone_crsf``'s telemetry sender on a ``TxScheduler`` for
+``--duration`` seconds, with the default schedule scaled by each of
+``--scales`` (x1 is 100 frames/s), sending over a local UDP socket to a
+``TelemetryReceiver`` in the same process. Reports per case:
+
+* ``frames/s``: frames decoded into the pult's series per second;
+* ``dgrams/s``: datagrams sent per second;
+* ``wire B/s``: bytes on the wire, counting 28 bytes of IP and UDP header;
+* ``send us``: sender time per tick (sample, encode, send);
+* ``decode us``: receiver time per frame;
+* ``cpu``: process CPU time over wall time, both ends (1.0 = one core).
+
+Then simulates a ``--flight-hours`` flight without waiting for it: every
+simulated second, one frame of each kind from ``sample_telemetry`` is
+encoded and decoded, and the decoded values are checked against what was
+sampled, to within the field's resolution. A value the field cannot hold
+is sent saturated, so it counts as wrong too.
+
+Exits 1 if any case decodes fewer than ``--min-delivered`` of the frames
+the schedule asked for, or the long flight fails to encode or decode a
+frame.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crsf_commands.drone_crsf import sample_telemetry, telemetry_sender
+from crsf_commands.telemetry import (
+    DEFAULT_SCHEDULE,
+    KINDS,
+    TelemetryEncoder,
+    TelemetryReceiver,
+    TelemetrySchedule,
+    parse_schedule,
+)
+from crsf_commands.tx_scheduler import TxScheduler
+
+SCALES = (1, 2, 5)
+UDP_OVERHEAD = 28  # IPv4 + UDP headers
+
+
+async def measure(scale: float, batch: bool, duration: float) -> dict:
+    rates = parse_schedule(DEFAULT_SCHEDULE)
+    rates = {name: rate * scale for name, rate in rates.items()}
+    schedule = TelemetrySchedule(rates)
+    receiver = TelemetryReceiver()
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    sink.setblocking(False)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    sock.connect(sink.getsockname())
+    stats = {"datagrams": 0, "bytes": 0, "send": 0.0, "decode": 0.0}
+
+    def send_datagram(data):
+        sock.send(data)
+        stats["datagrams"] += 1
+        stats["bytes"] += len(data) + UDP_OVERHEAD
+
+    send_telemetry = telemetry_sender(schedule, send_datagram, batch)
+
+    def tick():
+        t0 = time.perf_counter()
+        send_telemetry()
+        t1 = time.perf_counter()
+        while True:
+            try:
+                data = sink.recv(2048)
+            except BlockingIOError:
+                break
+            receiver.receive(data, time.time() * 1000)
+        stats["send"] += t1 - t0
+        stats["decode"] += time.perf_counter() - t1
+
+    scheduler = TxScheduler(schedule.tick_rate, tick, report_interval=duration * 10)
+    stop_at = time.monotonic() + duration
+    wall, cpu = time.monotonic(), time.process_time()
+    try:
+        await scheduler.run(lambda: time.monotonic() < stop_at)
+    finally:
+        sock.close()
+        sink.close()
+    wall, cpu = time.monotonic() - wall, time.process_time() - cpu
+    frames = receiver.frames
+    return {
+        "case": f"x{scale:g} {'batched' if batch else 'single'}",
+        "target": sum(rates.values()),
+        "frames": frames / wall,
+        "datagrams": stats["datagrams"] / wall,
+        "wire": stats["bytes"] / wall,
+        "send_us": stats["send"] / max(scheduler.sent, 1) * 1e6,
+        "decode_us": stats["decode"] / max(frames, 1) * 1e6,
+        "cpu": cpu / wall,
+        "lost": receiver.rtp.lost,
+    }
+
+
+def flight_case(hours: float) -> dict:
+    encoder = TelemetryEncoder()
+    receiver = TelemetryReceiver(capacity=1)
+    seconds = int(hours * 3600)
+    errors = mismatches = 0
+    first_error = None
+    for t in range(seconds):
+        frames = [(name, sample_telemetry(name, float(t))) for name in KINDS]
+        try:
+            receiver.receive(bytes(encoder.encode(frames, t * 1000)), t * 1000.0)
+        except Exception as e:  # anything here is what the bench is looking for
+            errors += 1
+            first_error = first_error or f"t={t} s: {e!r}"
+            continue
+        for name, values in frames:
+            kind = KINDS[name]
+            decoded = receiver.series[name].latest()
+            if decoded is None or decoded["time"] != t * 1000.0:
+                mismatches += 1
+                continue
+            for field, value, scale in zip(kind.fields, values, kind.scales):
+                if abs(decoded[field] - value) > abs(scale) / 2 + 1e-9:
+                    mismatches += 1
+                    first_error = first_error or (
+                        f"t={t} s: {name}.{field} sent {value}, "
+                        f"got {decoded[field]}"
+                    )
+    return {
+        "seconds": seconds,
+        "frames": receiver.frames,
+        "errors": errors,
+        "mismatches": mismatches,
+        "first_error": first_error,
+    }
+
+
+async def main(args) -> int:
+    failed = False
+    print(
+        f"{'case':>13} {'target':>6} {'frames/s':>8} {'dgrams/s':>8} "
+        f"{'wire B/s':>8} {'send us':>7} {'decode us':>9} {'cpu':>5} {'lost':>4}"
+    )
+    for scale in args.scales:
+        for batch in (True, False):
+            r = await measure(scale, batch, args.duration)
+            print(
+                f"{r['case']:>13} {r['target']:6g} {r['frames']:8.1f} "
+                f"{r['datagrams']:8.1f} {r['wire']:8.0f} {r['send_us']:7.1f} "
+                f"{r['decode_us']:9.1f} {r['cpu']:5.2f} {r['lost']:4d}"
+            )
+            failed |= r["frames"] < r["target"] * args.min_delivered
+    r = flight_case(args.flight_hours)
+    print(
+        f"{args.flight_hours:g} h flight: {r['frames']} frames decoded, "
+        f"{r['errors']} encode/decode errors, {r['mismatches']} wrong values"
+    )
+    if r["first_error"]:
+        print(f"  first: {r['first_error']}")
+    failed |= r["errors"] > 0 or r["mismatches"] > 0
+    failed |= r["frames"] != r["seconds"] * len(KINDS)
+    print("FAIL" if failed else "PASS")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scales",
+        type=lambda v: [float(s) for s in v.split(",")],
+        default=list(SCALES),
+        help="multiples of the default schedule, comma-separated",
+    )
+    parser.add_argument("--duration", type=float, default=5.0, help="s per case")
+    parser.add_argument("--min-delivered", type=float, default=0.97)
+    parser.add_argument("--flight-hours", type=float, default=3.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Achieved rate, deadline misses and send jitter of the CRSF TX scheduler.
+
+Drives ``TxScheduler`` at each rate for ``--duration`` seconds, building
+every packet the way ``drone_crsf`` does and sending it over a local UDP
+socket in place of the data channel, and reports:
+
+* ``rate``: packets actually sent per second;
+* ``missed``: ticks skipped because their deadline had already passed;
+* jitter percentiles: how late each send was against its deadline;
+* ``cpu``: process CPU time over wall time (1.0 = one core).
+
+With ``--load`` a second task burns that fraction of each millisecond to
+stand in for the rest of the event loop (peer connection, stats). Exits 1
+if any rate falls more than ``--max-shortfall`` short of its target.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crsf_commands.drone_crsf import PT, next_channels
+from crsf_commands.rc_encoder import RcEncoder
+from crsf_commands.tx_scheduler import TxScheduler
+
+RATES = (50, 150, 250, 500)
+
+
+async def busy(fraction: float) -> None:
+    while True:
+        end = time.perf_counter() + fraction / 1000
+        while time.perf_counter() < end:
+            pass
+        await asyncio.sleep(0.001 * (1 - fraction))
+
+
+async def measure(rate: float, duration: float, load: float) -> dict:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    addr = sink.getsockname()
+    encoder = RcEncoder(payload_type=PT)
+
+    def send():
+        sock.sendto(encoder.packet(next_channels(), int(time.time() * 1000)), addr)
+        while True:  # keep the receive buffer from filling up
+            try:
+                sink.recv(2048)
+            except BlockingIOError:
+                break
+
+    sink.setblocking(False)
+    scheduler = TxScheduler(rate, send, report_interval=duration * 10)
+    loader = asyncio.create_task(busy(load)) if load else None
+    stop_at = time.monotonic() + duration
+    wall, cpu = time.monotonic(), time.process_time()
+    try:
+        await scheduler.run(lambda: time.monotonic() < stop_at)
+    finally:
+        if loader is not None:
+            loader.cancel()
+        sock.close()
+        sink.close()
+    wall, cpu = time.monotonic() - wall, time.process_time() - cpu
+    snap = scheduler.jitter.snapshot()
+    return {
+        "target": rate,
+        "rate": scheduler.sent / wall,
+        "missed": scheduler.missed,
+        "p50": snap["p50"],
+        "p99": snap["p99"],
+        "max": snap["max"],
+        "cpu": cpu / wall,
+    }
+
+
+async def main(args) -> int:
+    failed = False
+    print(
+        f"{'target':>7} {'rate':>8} {'missed':>7} {'p50':>6} {'p99':>6} "
+        f"{'max':>6} {'cpu':>5}"
+    )
+    for rate in args.rates:
+        r = await measure(rate, args.duration, args.load)
+        print(
+            f"{r['target']:>7g} {r['rate']:8.1f} {r['missed']:7d} {r['p50']:6.2f} "
+            f"{r['p99']:6.2f} {r['max']:6.2f} {r['cpu']:5.2f}"
+        )
+        failed |= r["rate"] < rate * (1 - args.max_shortfall)
+    print("FAIL" if failed else "PASS")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rates",
+        type=lambda v: [float(r) for r in v.split(",")],
+        default=list(RATES),
+        help="Hz, comma-separated",
+    )
+    parser.add_argument("--duration", type=float, default=5.0, help="s per rate")
+    parser.add_argument("--load", type=float, default=0.0, help="0..1")
+    parser.add_argument("--max-shortfall", type=float, default=0.01)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""Drone CPU, memory and pult latency of the two CRSF transports.
+
+Runs ``crsf_commands/drone_crsf.py`` as a subprocess at ``--rate`` against
+MockJanus (port 8188, as the scripts have it hard-coded), once per
+transport:
+
+* ``textroom``: the drone's own aiortc peer connection to the TextRoom; the
+  pult joins the room on another peer connection;
+* ``udp``: the drone sends datagrams to mountpoint 1001's data port, and a
+  pult ``StreamReceiver`` watching the mountpoint gets them on the data
+  channel of its video connection.
+
+After ``WARMUP`` seconds it samples the drone's CPU time and RSS (from
+/proc) for ``--duration`` seconds and, on the pult, the delay of each RC
+packet from send to arrival. The packets' own RTP timestamps are whole ms,
+too coarse on one host, so the drone runs with ``--log`` and each packet's
+send time is taken from its flight log record (µs, written just after the
+send), matched by SSRC and sequence number. Both ends read the same wall
+clock.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import struct
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aiortc import RTCPeerConnection
+
+from bench.mock_janus import PORT, MockJanus
+from common.janus_client import JanusClient
+from common.janus_supervisor import JanusSupervisor
+from common.latency_stats import Histogram
+from common.textroom import negotiate_textroom
+from crsf_commands.crsf_receiver import CrsfReceiver
+from crsf_commands.drone_crsf import DATA_PORT, ROOM_ID
+from crsf_commands.flight_log import TX, FlightLogReader
+from video.controller_video import StreamReceiver, stream_setup
+from video.mountpoint import ensure_mountpoint
+
+URL = f"ws://127.0.0.1:{PORT}"
+STREAM_ID = 1001
+WARMUP = 3.0
+TRANSPORTS = ("textroom", "udp")
+_SEQ = struct.Struct("!H")
+_SSRC = struct.Struct("!I")
+
+
+class TimedReceiver(CrsfReceiver):
+    """CrsfReceiver that also records each RC packet's arrival time."""
+
+    def __init__(self):
+        super().__init__()
+        self.arrivals = {}  # (ssrc, seq) -> arrival, ms since the epoch
+        self.recording = False
+
+    def receive(self, data, arrival_ms: float):
+        pkt = super().receive(data, arrival_ms)
+        if pkt is not None and self.recording:
+            self.arrivals[(pkt.ssrc, pkt.seq)] = arrival_ms
+        return pkt
+
+
+def send_delays(log_path: str, arrivals: dict) -> Histogram:
+    """Delay (ms) of each arrived packet from its send in the drone's flight log."""
+    delay = Histogram()
+    with FlightLogReader(log_path) as log:
+        for ts_us, direction, packet in log:
+            if direction == TX and len(packet) >= 12:
+                (seq,) = _SEQ.unpack_from(packet, 2)
+                (ssrc,) = _SSRC.unpack_from(packet, 8)
+                arrival_ms = arrivals.get((ssrc, seq))
+                if arrival_ms is not None:
+                    delay.record(arrival_ms - ts_us / 1000)
+            packet.release()
+    return delay
+
+
+async def textroom_pult(receiver: TimedReceiver):
+    """Join the drone's room; returns a coroutine function that closes it all."""
+    janus = JanusClient(URL)
+    await janus.connect()
+    await janus.create_session()
+    pc = RTCPeerConnection()
+    channel = pc.createDataChannel("JanusDataChannel")
+    opened = asyncio.get_running_loop().create_future()
+
+    @channel.on("open")
+    def on_open():
+        join = {"textroom": "join", "transaction": "b", "room": ROOM_ID}
+        channel.send(json.dumps(dict(join, username="bench", display="bench")))
+        opened.set_result(None)
+
+    @channel.on("message")
+    def on_message(msg):
+        if isinstance(msg, bytes):
+            receiver.receive(msg, time.time() * 1000)
+
+    await negotiate_textroom(janus, pc)
+    await asyncio.wait_for(opened, 10)
+
+    async def close():
+        await pc.close()
+        await janus.close()
+
+    return close
+
+
+async def udp_pult(receiver: TimedReceiver):
+    record = os.path.join(tempfile.mkdtemp(), "udp_control.mp4")
+    stream = StreamReceiver(STREAM_ID, record, stats_interval=3600, prefix="")
+    stream.control = receiver
+    supervisor = JanusSupervisor(URL, stream_setup([stream]), emit=lambda line: None)
+    stream.start()
+    task = asyncio.create_task(supervisor.run())
+    await asyncio.wait_for(supervisor.ready.wait(), 20)
+
+    async def close():
+        task.cancel()
+        await supervisor.close()
+        await stream.close()
+
+    return close
+
+
+def proc_usage(pid: int):
+    """(CPU seconds, RSS MB) of a process, from /proc."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    with open(f"/proc/{pid}/status") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS"))
+    return cpu, rss / 1024
+
+
+async def measure(transport: str, args) -> dict:
+    receiver = TimedReceiver()
+    command = [sys.executable, os.path.join(ROOT, "crsf_commands/drone_crsf.py")]
+    log_path = os.path.join(tempfile.mkdtemp(), f"{transport}.crsflog")
+    command += ["--rate", str(args.rate), "--transport", transport]
+    command += ["--log", log_path]
+    drone = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    close = None
+    try:
+        if transport == "udp":
+            close = await udp_pult(receiver)
+        else:
+            await asyncio.sleep(1.0)  # let the drone join first
+            close = await textroom_pult(receiver)
+        await asyncio.sleep(WARMUP)
+        receiver.recording = True
+        cpu0, _ = proc_usage(drone.pid)
+        start = time.monotonic()
+        rss = 0.0
+        while time.monotonic() - start < args.duration:
+            await asyncio.sleep(0.5)
+            rss = max(rss, proc_usage(drone.pid)[1])
+        cpu1, _ = proc_usage(drone.pid)
+        elapsed = time.monotonic() - start
+        receiver.recording = False
+    finally:
+        drone.send_signal(signal.SIGINT)  # the drone flushes its flight log
+        try:
+            await asyncio.wait_for(drone.wait(), 5)
+        except asyncio.TimeoutError:
+            drone.kill()
+            await drone.wait()
+        if close is not None:
+            await close()
+    snap = send_delays(log_path, receiver.arrivals).snapshot()
+    return {
+        "transport": transport,
+        "cpu": (cpu1 - cpu0) / elapsed,
+        "rss_mb": rss,
+        "packets": snap["count"],
+        "p50": snap["p50"],
+        "p99": snap["p99"],
+        "lost": receiver.rtp.lost,
+    }
+
+
+async def main(args) -> None:
+    janus = MockJanus(port=PORT)
+    await janus.start()
+    try:
+        async with JanusClient(URL) as client:
+            await ensure_mountpoint(client, STREAM_ID, 8004, DATA_PORT)
+        print(
+            f"{'transport':>9} {'drone cpu':>9} {'rss MB':>7} {'packets':>8} "
+            f"{'delay p50':>9} {'p99':>6} {'lost':>5}"
+        )
+        for transport in args.transports:
+            r = await measure(transport, args)
+            print(
+                f"{r['transport']:>9} {r['cpu'] * 100:8.1f}% {r['rss_mb']:7.1f} "
+                f"{r['packets']:8d} {r['p50']:9.3f} {r['p99']:6.3f} {r['lost']:5d}"
+            )
+    finally:
+        await janus.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=100.0, help="packets/s")
+    parser.add_argument("--duration", type=float, default=10.0, help="s")
+    parser.add_argument(
+        "--transports", type=lambda v: v.split(","), default=list(TRANSPORTS)
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,326 @@
+"""Async Janus client over the WebSocket transport.
+
+One reader task owns the socket and routes every incoming message:
+
+* replies (``success``/``error``/``ack``) resolve the future of the request
+  with the same ``transaction``, so several requests can be in flight at
+  once and nothing else is consumed by mistake;
+* plugin events and session events (``webrtcup``, ``hangup``, ``media``...)
+  go to the ``JanusHandle`` named by ``sender``: first to any ``call`` or
+  ``wait_for`` that is waiting on them, then to ``on_event`` listeners;
+* a keepalive is sent every ``keepalive_interval`` seconds while a session
+  exists, and WebSocket pings detect a dead link within ~``PING_INTERVAL`` +
+  ``PING_TIMEOUT`` seconds (``closed`` is then resolved);
+* ``reconnect()`` opens a new socket and ``claim``s the old session, so its
+  handles and peer connections survive a dropped WebSocket.
+
+Typical use::
+
+    async with JanusClient(JANUS_WS) as janus:
+        handle = await janus.attach("janus.plugin.streaming")
+        event = await handle.call({"request": "watch", "id": 1001})
+        ... answer event["jsep"] ...
+        await handle.call({"request": "start"}, jsep=answer)
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+
+import websockets
+
+from common import phase_timer
+
+KEEPALIVE_INTERVAL = 30  # Janus drops idle sessions after 60 s by default
+REQUEST_TIMEOUT = 10.0
+PING_INTERVAL = 2.0
+PING_TIMEOUT = 2.0
+
+log = logging.getLogger("janus")
+
+
+class JanusError(Exception):
+    """Error reply from Janus or from a plugin (``error_code`` in plugindata)."""
+
+    def __init__(self, code, reason):
+        super().__init__(f"Janus error {code}: {reason}")
+        self.code = code
+        self.reason = reason
+
+
+def _transaction() -> str:
+    return uuid.uuid4().hex
+
+
+def plugin_data(msg: dict) -> dict:
+    """The plugin's own payload of a reply or event (``{}`` if none)."""
+    return msg.get("plugindata", {}).get("data", {})
+
+
+def _check(msg: dict) -> dict:
+    if msg.get("janus") == "error":
+        error = msg.get("error", {})
+        raise JanusError(error.get("code"), error.get("reason"))
+    data = plugin_data(msg)
+    if "error_code" in data:
+        raise JanusError(data["error_code"], data.get("error"))
+    return msg
+
+
+class JanusHandle:
+    """A plugin handle; receives the events Janus sends with its id as sender."""
+
+    def __init__(self, client: "JanusClient", handle_id: int, plugin: str):
+        self.client = client
+        self.id = handle_id
+        self.plugin = plugin
+        self._waiters = []  # (match, future)
+        self._listeners = []
+
+    def on_event(self, callback) -> None:
+        """Call ``callback(msg)`` for every event of this handle."""
+        self._listeners.append(callback)
+
+    async def message(self, body: dict, jsep=None, timeout=REQUEST_TIMEOUT) -> dict:
+        """Send a plugin message; returns the ``ack`` or synchronous ``success``."""
+        msg = {"janus": "message", "handle_id": self.id, "body": body}
+        if jsep is not None:
+            msg["jsep"] = _jsep(jsep)
+        return await self.client.request(msg, timeout=timeout)
+
+    async def call(self, body: dict, jsep=None, timeout=REQUEST_TIMEOUT) -> dict:
+        """Send a plugin message and return its result.
+
+        Synchronous plugin requests (``create``, ``info``, ``list``...) return
+        the ``success`` reply; asynchronous ones the event Janus pushes later
+        with the same transaction. Plugin errors raise JanusError.
+        """
+        transaction = _transaction()
+        event = self._wait(lambda m: m.get("transaction") == transaction)
+        msg = {"janus": "message", "handle_id": self.id, "body": body}
+        if jsep is not None:
+            msg["jsep"] = _jsep(jsep)
+        try:
+            reply = await self.client.request(msg, transaction, timeout)
+            if reply.get("janus") == "ack":
+                reply = await asyncio.wait_for(event, timeout)
+        finally:
+            self._cancel(event)
+        return _check(reply)
+
+    async def trickle(self, candidate) -> None:
+        await self.client.request(
+            {"janus": "trickle", "handle_id": self.id, "candidate": candidate}
+        )
+
+    async def wait_for(self, match, timeout=None) -> dict:
+        """Wait for the next event of this handle for which ``match(msg)`` holds."""
+        event = self._wait(match)
+        try:
+            return await asyncio.wait_for(event, timeout)
+        finally:
+            self._cancel(event)
+
+    async def detach(self) -> None:
+        await self.client.request({"janus": "detach", "handle_id": self.id})
+        self.client.handles.pop(self.id, None)
+
+    def _wait(self, match) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((match, future))
+        return future
+
+    def _cancel(self, future) -> None:
+        self._waiters = [(m, f) for m, f in self._waiters if f is not future]
+        future.cancel()
+
+    def _dispatch(self, msg: dict) -> None:
+        for match, future in list(self._waiters):
+            if not future.done() and match(msg):
+                future.set_result(msg)
+                return
+        for callback in self._listeners:
+            callback(msg)
+        if not self._listeners:
+            log.debug("Unhandled event for handle %s: %s", self.id, msg)
+
+
+def _jsep(jsep) -> dict:
+    if isinstance(jsep, dict):
+        return jsep
+    return {"type": jsep.type, "sdp": jsep.sdp}  # RTCSessionDescription
+
+
+class JanusClient:
+    """Janus session over one WebSocket, with transaction multiplexing."""
+
+    def __init__(self, url: str, keepalive_interval: float = KEEPALIVE_INTERVAL):
+        self.url = url
+        self.keepalive_interval = keepalive_interval
+        self.session_id = None
+        self.handles = {}
+        self._ws = None
+        self._pending = {}
+        self._listeners = []
+        self._tasks = []
+        self.closed = None  # future, done when the connection is lost or closed
+
+    async def __aenter__(self) -> "JanusClient":
+        await self.connect()
+        try:
+            await self.create_session()
+        except BaseException:
+            await self.close()
+            raise
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def on_event(self, callback) -> None:
+        """Call ``callback(msg)`` for session-level events (e.g. ``timeout``)."""
+        self._listeners.append(callback)
+
+    async def connect(self) -> None:
+        self._ws = await websockets.connect(
+            self.url,
+            subprotocols=["janus-protocol"],
+            ping_interval=PING_INTERVAL,
+            ping_timeout=PING_TIMEOUT,
+            close_timeout=1,
+        )
+        self.closed = asyncio.get_running_loop().create_future()
+        self._tasks.append(asyncio.create_task(self._reader()))
+        phase_timer.mark("ws_connect")
+
+    async def reconnect(self) -> bool:
+        """Reconnect and claim the session; False if it expired and was recreated.
+
+        After a False return ``handles`` is empty: the caller has to attach
+        and negotiate again.
+        """
+        self._stop_tasks()
+        if self._ws is not None:
+            await self._ws.close()
+        await self.connect()
+        if self.session_id is not None:
+            try:
+                await self.request({"janus": "claim"})
+                self._tasks.append(asyncio.create_task(self._keepalive()))
+                return True
+            except JanusError as e:
+                log.info("Session %s not claimed: %s", self.session_id, e.reason)
+            self.session_id = None
+            self.handles.clear()
+        await self.create_session()
+        return False
+
+    async def create_session(self) -> int:
+        reply = await self.request({"janus": "create"})
+        self.session_id = reply["data"]["id"]
+        self._tasks.append(asyncio.create_task(self._keepalive()))
+        phase_timer.mark("session")
+        return self.session_id
+
+    async def attach(self, plugin: str) -> JanusHandle:
+        reply = await self.request({"janus": "attach", "plugin": plugin})
+        handle = JanusHandle(self, reply["data"]["id"], plugin)
+        self.handles[handle.id] = handle
+        phase_timer.mark("attach")
+        return handle
+
+    async def request(self, msg: dict, transaction=None, timeout=REQUEST_TIMEOUT):
+        """Send ``msg`` and return the first reply with its transaction."""
+        if self._ws is None or self.closed.done():
+            raise ConnectionError("Janus connection is closed")
+        transaction = transaction or _transaction()
+        msg = dict(msg, transaction=transaction)
+        if self.session_id is not None and msg["janus"] != "create":
+            msg.setdefault("session_id", self.session_id)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[transaction] = future
+        try:
+            await self._ws.send(json.dumps(msg))
+            return _check(await asyncio.wait_for(future, timeout))
+        finally:
+            self._pending.pop(transaction, None)
+
+    async def close(self) -> None:
+        self._stop_tasks()
+        if self._ws is not None:
+            if self.session_id is not None and not self.closed.done():
+                try:
+                    await self._ws.send(
+                        json.dumps(
+                            {
+                                "janus": "destroy",
+                                "session_id": self.session_id,
+                                "transaction": _transaction(),
+                            }
+                        )
+                    )
+                except websockets.ConnectionClosed:
+                    pass
+            await self._ws.close()
+            self._set_closed()
+
+    def _stop_tasks(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+    async def _keepalive(self) -> None:
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                await self.request({"janus": "keepalive"})
+            except (asyncio.TimeoutError, JanusError) as e:
+                log.warning("Keepalive failed: %s", e)
+            except ConnectionError:
+                return
+
+    async def _reader(self) -> None:
+        # only losing the connection ends the reader: a malformed message or a
+        # failing listener costs that one message, not every handle
+        try:
+            async for raw in self._ws:
+                try:
+                    self._route(json.loads(raw))
+                except Exception:
+                    log.exception("Failed to handle Janus message: %.200s", raw)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._set_closed()
+
+    def _route(self, msg: dict) -> None:
+        kind = msg.get("janus")
+        future = self._pending.get(msg.get("transaction"))
+        if kind in ("success", "error", "ack") and future is not None:
+            if not future.done():
+                future.set_result(msg)
+            return
+
+        if kind == "timeout" and msg.get("session_id") == self.session_id:
+            log.warning("Session %s timed out", self.session_id)
+            self.session_id = None
+            self.handles.clear()
+            self._set_closed()
+            return
+
+        handle = self.handles.get(msg.get("sender"))
+        if handle is not None:
+            handle._dispatch(msg)
+            return
+        for callback in self._listeners:
+            callback(msg)
+        if kind not in ("ack", "keepalive") and not self._listeners:
+            log.debug("Unhandled Janus message: %s", msg)
+
+    def _set_closed(self) -> None:
+        if self.closed is not None and not self.closed.done():
+            self.closed.set_result(None)
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Janus connection closed"))
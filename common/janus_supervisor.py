@@ -0,0 +1,132 @@
+"""Keep a Janus session, and what was negotiated on it, alive across link loss.
+
+``JanusSupervisor.run()`` owns a ``JanusClient`` and a ``setup(janus)``
+coroutine that attaches handles and negotiates peer connections, returning
+once media or data flows. When something breaks it recovers in the cheapest
+way that works:
+
+* WebSocket lost: reconnect and ``claim`` the session. Handles and peer
+  connections survive, so nothing is renegotiated ("session resumed");
+* session expired (claim refused, or a ``timeout`` event): create a new
+  session and run ``setup`` again ("new session");
+* peer connection failed (the owner calls ``fail()``): run ``setup`` again
+  on the live session ("renegotiated").
+
+Failed attempts back off exponentially from ``BACKOFF_MIN`` to
+``BACKOFF_MAX`` with jitter. Time-to-recover runs from detecting the loss to
+the end of recovery. It is emitted and recorded in ``recovery``, a Histogram
+in ms.
+"""
+
+import asyncio
+import random
+import time
+
+import websockets
+
+from common.janus_client import JanusClient, JanusError
+from common.latency_stats import Histogram
+
+BACKOFF_MIN = 0.25
+BACKOFF_MAX = 5.0
+SETUP_TIMEOUT = 15.0
+
+RECOVERABLE = (
+    OSError,
+    ConnectionError,
+    asyncio.TimeoutError,
+    JanusError,
+    websockets.WebSocketException,
+)
+
+
+class JanusSupervisor:
+    def __init__(
+        self,
+        url: str,
+        setup,
+        prefix: str = "",
+        emit=print,
+        setup_timeout: float = SETUP_TIMEOUT,
+        on_recover=None,
+    ):
+        self.janus = JanusClient(url)
+        self.setup = setup
+        self.prefix = prefix
+        self.emit = emit
+        self.setup_timeout = setup_timeout
+        self.on_recover = on_recover  # on_recover(seconds, mode)
+        self.recovery = Histogram()
+        self.ready = asyncio.Event()
+        self._failed = asyncio.Event()
+        self._lost_at = None
+        self.recoveries = 0
+        self._up = False  # set once the first setup succeeded
+
+    def fail(self, reason: str = "peer connection failed") -> None:
+        """Report that what ``setup`` negotiated broke; it will be redone."""
+        if self._failed.is_set():
+            return
+        self.emit(f"{self.prefix}{reason}, renegotiating")
+        if self._lost_at is None:
+            self._lost_at = time.monotonic()
+        self.ready.clear()
+        self._failed.set()
+
+    async def run(self) -> None:
+        backoff = BACKOFF_MIN
+        janus = self.janus
+        while True:
+            try:
+                if janus.closed is None:
+                    await janus.connect()
+                    await janus.create_session()
+                    mode = "new session"
+                elif janus.closed.done() or janus.session_id is None:
+                    resumed = await janus.reconnect()
+                    mode = "session resumed" if resumed else "new session"
+                else:
+                    mode = "renegotiated"
+                if mode == "new session" or self._failed.is_set():
+                    self._failed.clear()
+                    await asyncio.wait_for(self.setup(janus), self.setup_timeout)
+            except RECOVERABLE as e:
+                self._failed.set()
+                if self._lost_at is None and self._up:
+                    self._lost_at = time.monotonic()
+                delay = backoff * random.uniform(0.8, 1.2)
+                self.emit(
+                    f"{self.prefix}Janus setup failed ({type(e).__name__}: {e}), "
+                    f"retrying in {delay:.1f} s"
+                )
+                await asyncio.sleep(delay)
+                backoff = min(backoff * 2, BACKOFF_MAX)
+                continue
+
+            backoff = BACKOFF_MIN
+            if self._lost_at is not None:
+                elapsed = time.monotonic() - self._lost_at
+                self._lost_at = None
+                self.recovery.record(elapsed * 1000)
+                self.recoveries += 1
+                self.emit(f"{self.prefix}Recovered in {elapsed * 1000:.0f} ms ({mode})")
+                if self.on_recover is not None:
+                    self.on_recover(elapsed, mode)
+            self._up = True
+            self.ready.set()
+
+            failed = asyncio.create_task(self._failed.wait())
+            try:
+                await asyncio.wait(
+                    (janus.closed, failed), return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                failed.cancel()
+            if janus.closed.done():
+                self.ready.clear()
+                if self._lost_at is None:
+                    self._lost_at = time.monotonic()
+                self.emit(f"{self.prefix}Janus connection lost, reconnecting")
+
+    async def close(self) -> None:
+        await self.janus.close()
@@ -0,0 +1,174 @@
+"""Fixed-memory latency histograms with periodic percentile reports.
+
+Values are recorded in milliseconds and bucketed at microsecond resolution
+with 16 sub-buckets per power of two (about 6% relative error), so a
+histogram is a flat list of a few hundred counters no matter how many
+samples it sees. Recording is a handful of integer operations and takes no
+lock; ``LatencyStats.rotate`` swaps in fresh histograms instead.
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_EXPONENT = 40  # ~12 days in microseconds, more than enough
+BUCKETS = (MAX_EXPONENT + 1) * SUB_BUCKETS
+PERCENTILES = (50, 95, 99)
+SNAPSHOT_FIELDS = ("count", "mean", "p50", "p95", "p99", "max")
+
+
+def _bucket(us: int) -> int:
+    if us < 2 * SUB_BUCKETS:
+        return us
+    shift = us.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (us >> shift) - SUB_BUCKETS
+
+
+def _bucket_value(index: int) -> int:
+    """Upper bound, in microseconds, of the values that fall into a bucket."""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    return (((index % SUB_BUCKETS) + SUB_BUCKETS + 1) << shift) - 1
+
+
+class Histogram:
+    """Log-linear histogram of millisecond values."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value_ms: float) -> None:
+        if value_ms < 0:
+            value_ms = 0.0
+        us = int(value_ms * 1000)
+        index = _bucket(us)
+        if index >= BUCKETS:
+            index = BUCKETS - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def merge(self, other: "Histogram") -> None:
+        """Add ``other``'s samples, e.g. from another process, to this one."""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(1, int(self.count * q / 100.0 + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_bucket_value(index) / 1000.0, self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        snap = {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+        }
+        for q in PERCENTILES:
+            snap[f"p{q}"] = self.percentile(q)
+        snap["max"] = self.max
+        return snap
+
+
+class LatencyStats:
+    """A named set of histograms covering one reporting interval."""
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self._hists = {name: Histogram() for name in self.names}
+        self.last = {name: Histogram().snapshot() for name in self.names}
+
+    def record(self, name: str, value_ms: float) -> None:
+        self._hists[name].record(value_ms)
+
+    def histogram(self, name: str) -> Histogram:
+        return self._hists[name]
+
+    def snapshot(self) -> dict:
+        """Percentiles of the interval in progress, per histogram."""
+        return {name: h.snapshot() for name, h in self._hists.items()}
+
+    def rotate(self) -> dict:
+        """Close the current interval and return its snapshot (also kept in ``last``)."""
+        old, self._hists = self._hists, {name: Histogram() for name in self.names}
+        self.last = {name: h.snapshot() for name, h in old.items()}
+        return self.last
+
+
+class StatsReporter:
+    """Rotates a LatencyStats every ``interval`` seconds and writes the result.
+
+    ``path`` selects the sink by extension: ``.csv`` appends one row per
+    histogram, ``.jsonl`` one JSON object per interval, and ``None`` passes a
+    one-line summary per histogram, starting with ``prefix``, to ``emit``
+    (``print`` by default, or e.g. ``logging.info``).
+    """
+
+    def __init__(
+        self,
+        stats: LatencyStats,
+        interval: float = 5.0,
+        path=None,
+        prefix="",
+        emit=print,
+    ):
+        self.stats = stats
+        self.interval = interval
+        self.path = path
+        self.prefix = prefix
+        self.emit = emit
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stats", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write(time.time(), self.stats.rotate())
+
+    def write(self, ts: float, snapshot: dict) -> None:
+        if self.path is None:
+            for name, snap in snapshot.items():
+                if snap["count"]:
+                    self.emit(
+                        f"{self.prefix}{name}: n={snap['count']} "
+                        f"p50={snap['p50']:.2f} p95={snap['p95']:.2f} "
+                        f"p99={snap['p99']:.2f} max={snap['max']:.2f} ms"
+                    )
+        elif self.path.endswith(".csv"):
+            new_file = not os.path.exists(self.path)
+            with open(self.path, "a", newline="") as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(("time", "name") + SNAPSHOT_FIELDS)
+                for name, snap in snapshot.items():
+                    writer.writerow(
+                        (f"{ts:.3f}", name) + tuple(snap[k] for k in SNAPSHOT_FIELDS)
+                    )
+        else:
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"time": ts, **snapshot}) + "\n")
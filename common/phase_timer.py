@@ -0,0 +1,48 @@
+"""Startup phase marks for the startup benchmark.
+
+Clients call ``mark(phase)`` at the milestones of their startup (imports
+done, WebSocket connected, session created, handle attached, SDP exchanged,
+ICE connected, first packet, first rendered frame). Only the first mark of
+each phase counts, so reconnects do not overwrite it.
+
+Marking is a no-op unless ``PHASE_TIMER_LOG`` names a file: then each mark
+appends a JSON line ``{"phase": ..., "ms": ...}`` with the time since
+``PHASE_TIMER_T0`` (epoch seconds, set by the launcher so that interpreter
+start-up counts too) or since this module was imported.
+"""
+
+import json
+import os
+import threading
+import time
+
+LOG_ENV = "PHASE_TIMER_LOG"
+T0_ENV = "PHASE_TIMER_T0"
+
+
+class PhaseTimer:
+    def __init__(self, path=None, t0=None):
+        self.path = path
+        self.t0 = time.time() if t0 is None else t0
+        self.marks = {}  # phase -> ms since t0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "PhaseTimer":
+        t0 = os.environ.get(T0_ENV)
+        return cls(os.environ.get(LOG_ENV), float(t0) if t0 else None)
+
+    def mark(self, phase: str) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            if phase in self.marks:
+                return
+            ms = (time.time() - self.t0) * 1000
+            self.marks[phase] = ms
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"phase": phase, "ms": round(ms, 3)}) + "\n")
+
+
+timer = PhaseTimer.from_env()
+mark = timer.mark
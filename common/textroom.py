@@ -0,0 +1,48 @@
+"""Peer connection negotiation and room setup with the Janus TextRoom plugin."""
+
+from aiortc import RTCPeerConnection, RTCSessionDescription
+
+from common import phase_timer
+from common.janus_client import JanusClient, JanusError, JanusHandle, plugin_data
+
+TEXTROOM_PLUGIN = "janus.plugin.textroom"
+
+
+async def negotiate_textroom(
+    janus: JanusClient, pc: RTCPeerConnection, previous: JanusHandle = None
+) -> JanusHandle:
+    """Attach a TextRoom handle and answer its offer with ``pc``.
+
+    Register ``pc``'s event handlers (and create any data channel) before
+    calling. ``previous`` is the handle of an earlier negotiation on the
+    same session; it is detached first so Janus does not keep it in the room.
+    """
+    if previous is not None and previous.id in janus.handles:
+        try:
+            await previous.detach()
+        except JanusError:
+            pass
+    handle = await janus.attach(TEXTROOM_PLUGIN)
+    offer = (await handle.call({"request": "setup"}))["jsep"]
+    await pc.setRemoteDescription(RTCSessionDescription(offer["sdp"], offer["type"]))
+    await pc.setLocalDescription(await pc.createAnswer())
+    await handle.call({"request": "ack"}, jsep=pc.localDescription)
+    phase_timer.mark("sdp")
+    return handle
+
+
+async def ensure_room(janus: JanusClient, room: int) -> bool:
+    """Create TextRoom ``room`` unless it exists; returns True if created.
+
+    Rooms created this way are not permanent: they go away when Janus
+    restarts, like the sessions that use them.
+    """
+    handle = await janus.attach(TEXTROOM_PLUGIN)
+    try:
+        reply = await handle.call({"request": "exists", "room": room})
+        if plugin_data(reply).get("exists"):
+            return False
+        await handle.call({"request": "create", "room": room, "permanent": False})
+        return True
+    finally:
+        await handle.detach()
@@ -0,0 +1,101 @@
+"""NTP-style clock offset estimation over the CRSF data channel.
+
+The pult sends a ping carrying its send time t1; the drone answers with a
+pong carrying t1 plus its own receive and send times t2 and t3; the pult
+notes the arrival time t4. From one exchange:
+
+    offset = ((t2 - t1) + (t3 - t4)) / 2    (drone clock - pult clock)
+    rtt    = (t4 - t1) - (t3 - t2)
+
+Samples whose RTT is well above the best recent one were delayed on one leg
+and are rejected as outliers; the estimate always comes from the sample
+with the lowest RTT in the window, as in NTP's clock filter.
+
+Messages start with ``CLOCK_SYNC_MAGIC``, whose top two bits can never be
+read as RTP version 2, so they share the channel with RTP-wrapped CRSF.
+"""
+
+import random
+import struct
+import time
+from collections import deque
+
+CLOCK_SYNC_MAGIC = 0x43
+PING = 1
+PONG = 2
+_FMT = struct.Struct("!BBHIqqq")
+WINDOW = 8
+OUTLIER_FACTOR = 2.0
+OUTLIER_SLACK_MS = 2.0
+
+
+def now_us() -> int:
+    return time.time_ns() // 1000
+
+
+def is_clock_sync(msg: bytes) -> bool:
+    return len(msg) == _FMT.size and msg[0] == CLOCK_SYNC_MAGIC
+
+
+def make_pong(ping: bytes, t2_us: int):
+    """Answer a ping received at ``t2_us``; returns None for anything else."""
+    magic, kind, seq, origin, t1, _, _ = _FMT.unpack(ping)
+    if kind != PING:
+        return None
+    return _FMT.pack(magic, PONG, seq, origin, t1, t2_us, now_us())
+
+
+class ClockSync:
+    """Pult-side offset/RTT estimator fed by ping/pong exchanges."""
+
+    def __init__(self, window: int = WINDOW, outlier_factor: float = OUTLIER_FACTOR):
+        self.origin = random.getrandbits(32)
+        self.outlier_factor = outlier_factor
+        self.offset_ms = None
+        self.rtt_ms = None
+        self.accepted = 0
+        self.rejected = 0
+        self._seq = 0
+        self._samples = deque(maxlen=window)
+
+    @property
+    def synced(self) -> bool:
+        return self.offset_ms is not None
+
+    def make_ping(self) -> bytes:
+        self._seq = (self._seq + 1) & 0xFFFF
+        return _FMT.pack(CLOCK_SYNC_MAGIC, PING, self._seq, self.origin, now_us(), 0, 0)
+
+    def on_pong(self, msg: bytes, t4_us: int) -> bool:
+        """Feed a pong received at ``t4_us``; True if the sample was used."""
+        _, kind, _, origin, t1, t2, t3 = _FMT.unpack(msg)
+        if kind != PONG or origin != self.origin:
+            return False
+
+        rtt = ((t4_us - t1) - (t3 - t2)) / 1000.0
+        offset = ((t2 - t1) + (t3 - t4_us)) / 2000.0
+        if rtt < 0:
+            self.rejected += 1
+            return False
+
+        # Outliers still enter the window so that a lasting change of path
+        # delay ages the old minimum out instead of being rejected forever.
+        outlier = bool(self._samples) and (
+            rtt > min(self._samples)[0] * self.outlier_factor + OUTLIER_SLACK_MS
+        )
+        self._samples.append((rtt, offset))
+        self.rtt_ms, self.offset_ms = min(self._samples)
+        if outlier:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    def one_way_ms(self, remote_ts_ms: int, now_ms: int):
+        """Offset-corrected delay of a 32-bit millisecond remote timestamp."""
+        if self.offset_ms is None:
+            return None
+        raw = (now_ms - remote_ts_ms) & 0xFFFFFFFF
+        if raw & 0x80000000:
+            raw -= 1 << 32
+        return raw + self.offset_ms
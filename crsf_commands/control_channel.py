@@ -0,0 +1,36 @@
+"""Data channels that carry the CRSF link through the TextRoom.
+
+Two modes, chosen on both ends with ``--control``:
+
+* ``reliable`` (default): everything goes over the TextRoom channel, which is
+  reliable and ordered. One lost SCTP packet holds back every later stick
+  update until it is retransmitted, at least ``SCTP_RTO_MIN`` (1 s in
+  aiortc) later when there are too few packets behind it for a fast
+  retransmit;
+* ``unreliable``: TextRoom requests (join, ...) stay on that channel, and RC
+  and clock-sync packets move to a second channel labelled ``crsf`` with
+  ``ordered=False`` and ``maxRetransmits=0``. A lost packet stays lost and
+  nothing waits for it. The drone sends the last ``DEFAULT_REDUNDANCY``
+  frames in each packet so the pult can fill short gaps.
+
+Each peer only negotiates its own leg to Janus. Stock Janus TextRoom relays
+data to the other peers on its default, reliable channel, so through a
+real Janus only the drone-to-Janus leg becomes unreliable. MockJanus relays
+on the receiver's channel with the same label, which shows the end-to-end
+behavior that ``bench/control_loss.py`` measures.
+"""
+
+CONTROL_MODES = ("reliable", "unreliable")
+TEXTROOM_LABEL = "JanusDataChannel"
+RC_LABEL = "crsf"
+DEFAULT_REDUNDANCY = 3  # frames per packet in unreliable mode
+
+
+def create_channels(pc, mode: str = "reliable"):
+    """Create the channels for ``mode``; returns (textroom, rc), maybe the same."""
+    if mode not in CONTROL_MODES:
+        raise ValueError(f"unknown control mode {mode!r}")
+    room = pc.createDataChannel(TEXTROOM_LABEL)
+    if mode == "reliable":
+        return room, room
+    return room, pc.createDataChannel(RC_LABEL, ordered=False, maxRetransmits=0)
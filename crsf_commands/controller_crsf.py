@@ -1,135 +1,193 @@
+import argparse
 import asyncio
 import json
 import logging
+import os
 import random
-import struct
+import sys
 import time
-import websockets
 
-from aiortc import RTCPeerConnection, RTCSessionDescription
-from crsf_parser import CRSFParser, PacketValidationStatus
+from aiortc import RTCPeerConnection
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import phase_timer
+from common.janus_supervisor import JanusSupervisor
+from common.latency_stats import LatencyStats, StatsReporter
+from common.textroom import negotiate_textroom
+from crsf_commands.clock_sync import ClockSync, is_clock_sync, now_us
+from crsf_commands.control_channel import CONTROL_MODES, create_channels
+from crsf_commands.crsf_receiver import CrsfReceiver
+from crsf_commands.failsafe import (
+    DEFAULT_TIMEOUT_MS,
+    FAILSAFE_CHANNELS,
+    FailsafeWatchdog,
+)
+from crsf_commands.flight_log import RX, FlightLogWriter
 
 JANUS_WS = "ws://localhost:8188/janus"
 ROOM_ID = 1234
 USERNAME = f"pult{random.randint(100,999)}"
 DISPLAY = "PULT"
-
-
-def strip_rtp(pkt: bytes) -> bytes:
-    return pkt[12:] if len(pkt) > 12 else pkt
-
-
-parser = CRSFParser(
-    lambda frame, status: (
-        (
-            logging.info("RX channels: %s", frame.payload.channels),
-            logging.info("RX raw: %s", frame.raw.hex(" ")),
-        )
-        if status == PacketValidationStatus.VALID
-        else None
-    )
-)
-
-
-async def run():
+PING_INTERVAL = 1.0
+STATS_INTERVAL = 5
+
+
+async def ping_loop(dc, clock: ClockSync):
+    sent = 0
+    while dc.readyState == "open":
+        dc.send(clock.make_ping())
+        sent += 1
+        if clock.synced and sent % STATS_INTERVAL == 0:
+            logging.info(
+                "Clock offset %.2f ms, RTT %.2f ms (%d rejected)",
+                clock.offset_ms,
+                clock.rtt_ms,
+                clock.rejected,
+            )
+        await asyncio.sleep(PING_INTERVAL)
+
+
+async def rx_report_loop(receiver: CrsfReceiver):
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        if receiver.rtp.expected:
+            logging.info("%s", receiver.summary())
+        if receiver.telemetry.rtp.expected:
+            logging.info("%s", receiver.telemetry.summary())
+        if receiver.watchdog.age.count or receiver.watchdog.active:
+            logging.info("%s", receiver.watchdog.summary())
+
+
+def on_failsafe(active: bool) -> None:
+    if active:
+        logging.warning("No RC frame for the deadline, FAILSAFE channels active")
+    else:
+        logging.warning("RC frames back, failsafe cleared")
+
+
+async def run(
+    control: str = "reliable",
+    failsafe_timeout=DEFAULT_TIMEOUT_MS,
+    failsafe=FAILSAFE_CHANNELS,
+    log=None,
+):
+    """Receive the drone's packets, appending each to ``log`` if given."""
     logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
     logging.getLogger("aioice").setLevel(logging.WARNING)
 
-    async with websockets.connect(JANUS_WS, subprotocols=["janus-protocol"]) as ws:
-
-        await ws.send(json.dumps({"janus": "create", "transaction": "a"}))
-        sid = (json.loads(await ws.recv()))["data"]["id"]
-
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "attach",
-                    "plugin": "janus.plugin.textroom",
-                    "session_id": sid,
-                    "transaction": "b",
-                }
-            )
-        )
-        hid = (json.loads(await ws.recv()))["data"]["id"]
-
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "message",
-                    "session_id": sid,
-                    "handle_id": hid,
-                    "transaction": "c",
-                    "body": {"request": "setup"},
-                }
-            )
-        )
-        await ws.recv()
+    clock = ClockSync()
+    stats = LatencyStats(("one_way", "rtt"))
+    reporter = StatsReporter(stats, STATS_INTERVAL, emit=logging.info)
+    reporter.start()
+    watchdog = FailsafeWatchdog(failsafe_timeout, failsafe, on_change=on_failsafe)
+    receiver = CrsfReceiver(watchdog)
+    rx_report = asyncio.create_task(rx_report_loop(receiver))
+    watchdog_task = asyncio.create_task(watchdog.run())
+
+    pc = handle = None
+
+    async def setup(janus):
+        nonlocal pc, handle
+        if pc is not None:
+            await pc.close()
+        pc = RTCPeerConnection()
+        opened = asyncio.get_running_loop().create_future()
 
-        while True:
-            ev = json.loads(await ws.recv())
-            if ev.get("janus") == "event" and "jsep" in ev:
-                offer = ev["jsep"]
-                break
+        @pc.on("connectionstatechange")
+        def on_state():
+            if pc.connectionState == "connected":
+                phase_timer.mark("ice")
+            elif pc.connectionState == "failed":
+                supervisor.fail()
 
-        pc = RTCPeerConnection()
+        dc, rc = create_channels(pc, control)
 
-        @pc.on("datachannel")
-        def on_dc(dc):
+        @dc.on("open")
+        def on_open():
             logging.info("DC open, joining room")
-
-            @dc.on("open")
-            def _(_):
-                dc.send(
-                    json.dumps(
-                        {
-                            "textroom": "join",
-                            "transaction": "j2",
-                            "room": ROOM_ID,
-                            "username": USERNAME,
-                            "display": DISPLAY,
-                            "datatype": "binary",
-                        }
-                    )
+            dc.send(
+                json.dumps(
+                    {
+                        "textroom": "join",
+                        "transaction": "j2",
+                        "room": ROOM_ID,
+                        "username": USERNAME,
+                        "display": DISPLAY,
+                        "datatype": "binary",
+                    }
                 )
-
-            @dc.on("message")
-            def on_msg(msg):
-                if isinstance(msg, (bytes, bytearray)):
-                    if len(msg) >= 8:
-                        remote_ts = struct.unpack_from("!I", msg, 4)[0]
-                        now_ms = int(time.time() * 1000) & 0xFFFFFFFF
-                        latency = (now_ms - remote_ts) & 0xFFFFFFFF
-                        logging.info("Latency: %d ms", latency)
-                    parser.parse_stream(strip_rtp(msg))
-                else:
-                    logging.info("RX text: %s", msg)
-
-        # 5. SDP answer
-        await pc.setRemoteDescription(
-            RTCSessionDescription(offer["sdp"], offer["type"])
-        )
-        await pc.setLocalDescription(await pc.createAnswer())
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "message",
-                    "session_id": sid,
-                    "handle_id": hid,
-                    "transaction": "d",
-                    "body": {"request": "configure"},
-                    "jsep": {
-                        "type": pc.localDescription.type,
-                        "sdp": pc.localDescription.sdp,
-                    },
-                }
             )
-        )
-
-        await ws.recv()
-        await ws.recv()
+            if not opened.done():
+                opened.set_result(None)
+                phase_timer.mark("datachannel")
+
+        @rc.on("open")
+        def on_rc_open():
+            asyncio.ensure_future(ping_loop(rc, clock))
+
+        def on_msg(msg):
+            if isinstance(msg, (bytes, bytearray)):
+                if is_clock_sync(msg):
+                    if clock.on_pong(msg, now_us()):
+                        stats.record("rtt", clock.rtt_ms)
+                    return
+                now_ms = time.time() * 1000
+                if log is not None:
+                    log.write(msg, RX)
+                pkt = receiver.receive(msg, now_ms)
+                if pkt is None:
+                    return
+                phase_timer.mark("first_packet")
+                latency = clock.one_way_ms(pkt.timestamp, int(now_ms) & 0xFFFFFFFF)
+                if latency is not None:
+                    stats.record("one_way", latency)
+            else:
+                logging.info("RX text: %s", msg)
+
+        dc.on("message", on_msg)
+        if rc is not dc:
+            rc.on("message", on_msg)
+
+        handle = await negotiate_textroom(janus, pc, handle)
+        await opened
         logging.info("Pult ready, awaiting packets…")
-        await asyncio.Future()
+
+    supervisor = JanusSupervisor(JANUS_WS, setup, emit=logging.info)
+    try:
+        await supervisor.run()
+    finally:
+        rx_report.cancel()
+        watchdog_task.cancel()
+        await supervisor.close()
+        if pc is not None:
+            await pc.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(run())
+    phase_timer.mark("import")
+    parser = argparse.ArgumentParser(
+        description="Receive RC channels from the drone over the TextRoom data channel."
+    )
+    parser.add_argument("--control", choices=CONTROL_MODES, default="reliable")
+    parser.add_argument(
+        "--failsafe-timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT_MS,
+        help="ms without a valid RC frame before failsafe",
+    )
+    parser.add_argument(
+        "--failsafe",
+        type=lambda v: [int(c) & 0x7FF for c in v.split(",")],
+        default=list(FAILSAFE_CHANNELS),
+        help="comma-separated failsafe channel values (default: centred, throttle low)",
+    )
+    parser.add_argument("--log", help="append received packets to this flight log")
+    args = parser.parse_args()
+    channels = (args.failsafe + list(FAILSAFE_CHANNELS))[: len(FAILSAFE_CHANNELS)]
+    log = FlightLogWriter(args.log) if args.log else None
+    try:
+        asyncio.run(run(args.control, args.failsafe_timeout, channels, log))
+    finally:
+        if log is not None:
+            log.close()
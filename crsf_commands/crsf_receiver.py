@@ -0,0 +1,56 @@
+"""Pult-side decoding of the drone's RTP-wrapped CRSF packets.
+
+``CrsfReceiver`` chains an ``RtpReceiver`` (loss, reorder, jitter) and a
+``CRSFParser``. It keeps the newest RC channel values and fills gaps from
+the redundant frames a packet may carry (see ``RcEncoder``). The same
+receiver serves the TextRoom path (``controller_crsf``) and the streaming
+mountpoint's data channel (``controller_video``). Packets with the telemetry
+payload type go to ``telemetry``, a ``TelemetryReceiver``. Each valid RC
+frame also feeds ``watchdog`` (a ``FailsafeWatchdog``), if one is given.
+"""
+
+from crsf_parser import CRSFParser, PacketValidationStatus
+
+from crsf_commands.rc_encoder import rc_frames
+from crsf_commands.rtp_receiver import RtpReceiver
+from crsf_commands.telemetry import TELEMETRY_PT, TelemetryReceiver
+
+
+class CrsfReceiver:
+    def __init__(self, watchdog=None):
+        self.rtp = RtpReceiver()
+        self.watchdog = watchdog
+        self.telemetry = TelemetryReceiver()
+        self.channels = None  # newest valid RC channel values
+        self.recovered = 0  # frames filled in from redundant copies
+        self._parser = CRSFParser(self._on_frame)
+
+    def _on_frame(self, frame, status) -> None:
+        if status == PacketValidationStatus.VALID:
+            self.channels = list(frame.payload.channels)
+            if self.watchdog is not None:
+                self.watchdog.feed(self.channels)
+
+    def receive(self, data, arrival_ms: float):
+        """Decode one packet; returns an RC packet if it was the newest, else None."""
+        if len(data) > 1 and data[1] & 0x7F == TELEMETRY_PT:
+            self.telemetry.receive(data, arrival_ms)
+            return None
+        pkt = self.rtp.receive(data, arrival_ms)
+        if pkt is None:
+            return None
+        # the payload ends with the newest frame; earlier ones fill the gap
+        frames = rc_frames(pkt.payload)[-1 - self.rtp.gap :]
+        self.recovered += len(frames) - 1
+        for frame in frames:
+            self._parser.parse_stream(bytearray(frame))
+        return pkt
+
+    def summary(self) -> str:
+        rtp = self.rtp
+        return (
+            f"RX {rtp.accepted}/{rtp.expected} packets, lost {rtp.lost} "
+            f"({rtp.loss_rate * 100:.1f}%), {rtp.duplicates} duplicate, "
+            f"{rtp.stale} stale, {self.recovered} frames recovered, "
+            f"jitter {rtp.jitter_ms:.2f} ms, channels {self.channels}"
+        )
@@ -1,157 +1,355 @@
+import argparse
+import os
 import sys
 import asyncio
 import json
 import logging
+import math
 import random
-import struct
-import websockets
+import socket
 import time
 
-from aiortc import RTCPeerConnection, RTCSessionDescription
-from crsf_parser.handling import crsf_build_frame
-from crsf_parser.payloads import PacketsTypes
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import phase_timer
+from common.janus_supervisor import JanusSupervisor
+from crsf_commands.clock_sync import is_clock_sync, make_pong, now_us
+from crsf_commands.control_channel import (
+    CONTROL_MODES,
+    DEFAULT_REDUNDANCY,
+    create_channels,
+)
+from crsf_commands.flight_log import FlightLogWriter
+from crsf_commands.rc_encoder import RC_CHANNELS, RcEncoder
+from crsf_commands.telemetry import (
+    DEFAULT_SCHEDULE,
+    TelemetryEncoder,
+    TelemetrySchedule,
+    parse_schedule,
+)
+from crsf_commands.tx_scheduler import TxScheduler
 
 JANUS_WS = "ws://localhost:8188/janus"
+# the streaming mountpoint's data port, as video/drone_video.py creates it
+JANUS_HOST = "127.0.0.1"
+DATA_PORT = 8006
+TRANSPORTS = ("textroom", "udp")
 ROOM_ID = 1234
 USERNAME = "drone"
 DISPLAY = "DRONE"
+DEFAULT_RATE = 50.0  # Hz
 
 PT = 96
-SSRC = random.getrandbits(32)
-SEQ = 0
-
-
-def make_rtp(payload: bytes, seq: int, ts_ms: int) -> bytes:
-    header = struct.pack(
-        "!BBHII",
-        0x80,
-        PT,
-        seq,
-        ts_ms & 0xFFFFFFFF,
-        SSRC,
-    )
-    return header + payload
-
 
-cli_vals = [int(a) & 0x7FF for a in sys.argv[1:17]]
-use_cli = bool(cli_vals)
+cli_vals = []  # fixed channel values from the command line
+channels = [992] * RC_CHANNELS  # reused by next_channels
 
 
 def next_channels():
-    if use_cli:
-        return cli_vals + [992] * (16 - len(cli_vals))
-    return [random.randint(992, 1500) for _ in range(16)]
+    if not cli_vals:
+        rand = random.random
+        for i in range(RC_CHANNELS):
+            channels[i] = 992 + int(rand() * 509)  # 992..1500
+    return channels
+
+
+def sample_telemetry(name: str, t: float) -> tuple:
+    """Simulated sensor values, ``t`` seconds in, until a flight controller is wired."""
+    if name == "link":
+        rssi = 60 + 10 * random.random()
+        return (-rssi, -rssi - 3, 100, 9, 0, 2, 3, -rssi - 5, 98, 7)
+    if name == "battery":
+        used = 2.5 * t  # mAh at 9 A
+        voltage = max(13.2, 16.8 - used / 1000)  # 4S pack, down to cut-off
+        return (voltage, 9.0, used, max(0, 100 - used / 15))
+    if name == "attitude":
+        yaw = (0.1 * t + math.pi) % math.tau - math.pi  # [-pi, pi)
+        return (0.2 * math.sin(t), 0.3 * math.sin(0.7 * t), yaw)
+    heading = (10 * t) % 360
+    lat = 55.75 + 1e-4 * math.cos(math.radians(heading))
+    lon = 37.62 + 1e-4 * math.sin(math.radians(heading))
+    return (lat, lon, 36.0, heading, 120.0, 12)
+
+
+def telemetry_sender(schedule: TelemetrySchedule, send, batch: bool = True):
+    """A TxScheduler callback that sends the telemetry frames due on each tick.
+
+    ``send`` gets a view of the encoder's buffer. With ``batch`` all frames
+    due on a tick share one datagram, otherwise each goes on its own.
+    """
+    encoder = TelemetryEncoder()
+    started = time.monotonic()
+
+    def send_telemetry():
+        now = time.monotonic()
+        due = schedule.due(now)
+        if not due:
+            return
+        ts_ms = int(time.time() * 1000)
+        frames = [(name, sample_telemetry(name, now - started)) for name in due]
+        if batch:
+            send(encoder.encode(frames, ts_ms))
+        else:
+            for frame in frames:
+                send(encoder.encode((frame,), ts_ms))
+
+    return send_telemetry
+
+
+async def run_udp(
+    rate: float = DEFAULT_RATE,
+    host=JANUS_HOST,
+    port=DATA_PORT,
+    redundancy=1,
+    telemetry=DEFAULT_SCHEDULE,
+    batch=True,
+    log=None,
+    source=None,
+):
+    """Send RC packets straight to the streaming mountpoint's data port.
 
+    No peer connection on the drone: Janus relays each datagram unchanged to
+    the data channel of every viewer of the mountpoint (drone_video creates
+    it with ``data: true``), so the pult gets them on its video connection.
+    The link is one-way, so there is no clock sync either.
 
-async def run():
+    Sent packets go to ``log``, a FlightLogWriter, if given. ``source``, if
+    given, replaces the RC and telemetry schedulers: it is awaited as
+    ``source(send, active)`` and sends ready-made packets (see replay_crsf).
+    """
     logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
-    logging.getLogger("aioice").setLevel(logging.WARNING)
+    if cli_vals:
+        logging.info("TX fixed channels: %s", next_channels())
+    encoder = RcEncoder(payload_type=PT, redundancy=redundancy)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    sock.connect((host, port))
 
-    async with websockets.connect(JANUS_WS, subprotocols=["janus-protocol"]) as ws:
+    def send_datagram(data) -> bool:
+        try:
+            sock.send(data)
+        except (BlockingIOError, ConnectionRefusedError):
+            return False  # socket buffer full, or no mountpoint listening yet
+        if log is not None:
+            log.write(data)
+        return True
 
-        await ws.send(json.dumps({"janus": "create", "transaction": "t1"}))
-        sid = (json.loads(await ws.recv()))["data"]["id"]
+    def send_channels():
+        if send_datagram(encoder.encode(next_channels(), int(time.time() * 1000))):
+            phase_timer.mark("first_send")
 
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "attach",
-                    "plugin": "janus.plugin.textroom",
-                    "session_id": sid,
-                    "transaction": "t2",
-                }
-            )
-        )
-        hid = (json.loads(await ws.recv()))["data"]["id"]
-
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "message",
-                    "session_id": sid,
-                    "handle_id": hid,
-                    "transaction": "t3",
-                    "body": {"request": "setup"},
-                }
-            )
+    logging.info(
+        "Sending RC over UDP to %s:%d, %d frame(s) per packet", host, port, redundancy
+    )
+    if source is not None:
+        tasks = [source(send_datagram, lambda: True)]
+    else:
+        tasks = [TxScheduler(rate, send_channels, emit=logging.info).run()]
+    if telemetry and source is None:
+        schedule = TelemetrySchedule(parse_schedule(telemetry))
+        send_telemetry = telemetry_sender(schedule, send_datagram, batch)
+        tasks.append(
+            TxScheduler(
+                schedule.tick_rate, send_telemetry, emit=logging.info, prefix="TLM "
+            ).run()
         )
-        await ws.recv()
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        sock.close()
+
+
+async def run(
+    rate: float = DEFAULT_RATE,
+    control: str = "reliable",
+    redundancy=None,
+    telemetry=DEFAULT_SCHEDULE,
+    batch=True,
+    log=None,
+    source=None,
+):
+    """Send RC packets through the TextRoom; ``log`` and ``source`` as in run_udp."""
+    # the WebRTC stack is only loaded on this path; run_udp does without it
+    from aiortc import RTCPeerConnection
+
+    from common.textroom import negotiate_textroom
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+    logging.getLogger("aioice").setLevel(logging.WARNING)
+    if cli_vals:
+        logging.info("TX fixed channels: %s", next_channels())
+    if redundancy is None:
+        redundancy = DEFAULT_REDUNDANCY if control == "unreliable" else 1
+    encoder = RcEncoder(payload_type=PT, redundancy=redundancy)
+    logging.info("Control channel %s, %d frame(s) per packet", control, redundancy)
+    schedule = TelemetrySchedule(parse_schedule(telemetry)) if telemetry else None
 
-        while True:
-            ev = json.loads(await ws.recv())
-            if ev.get("janus") == "event" and "jsep" in ev:
-                offer = ev["jsep"]
-                break
+    pc = handle = None
 
+    async def setup(janus):
+        nonlocal pc, handle
+        if pc is not None:
+            await pc.close()
         pc = RTCPeerConnection()
+        opened = asyncio.get_running_loop().create_future()
 
-        @pc.on("datachannel")
-        def on_dc(dc):
-            logging.info("DC open, start stream")
+        @pc.on("connectionstatechange")
+        def on_state():
+            if pc.connectionState == "connected":
+                phase_timer.mark("ice")
+            elif pc.connectionState == "failed":
+                supervisor.fail()
+
+        dc, rc = create_channels(pc, control)
 
-            @dc.on("open")
-            def _(_):
-
-                dc.send(
-                    json.dumps(
-                        {
-                            "textroom": "join",
-                            "transaction": "j",
-                            "room": ROOM_ID,
-                            "username": USERNAME,
-                            "display": DISPLAY,
-                            "datatype": "binary",
-                        }
-                    )
+        @dc.on("open")
+        def on_open():
+            logging.info("DC open, start stream")
+            dc.send(
+                json.dumps(
+                    {
+                        "textroom": "join",
+                        "transaction": "j",
+                        "room": ROOM_ID,
+                        "username": USERNAME,
+                        "display": DISPLAY,
+                        "datatype": "binary",
+                    }
                 )
+            )
 
-                async def tx_loop():
-                    global SEQ
-                    while True:
+            def send_datagram(data) -> bool:
+                if rc.readyState != "open":
+                    return False
+                data = bytes(data)
+                rc.send(data)
+                if log is not None:
+                    log.write(data)
+                return True
 
-                        chans = next_channels()
-                        crsf = crsf_build_frame(
-                            PacketsTypes.RC_CHANNELS_PACKED, {"channels": chans}
-                        )
+            def send_channels():
+                ts_ms = int(time.time() * 1000)
+                if send_datagram(encoder.packet(next_channels(), ts_ms)):
+                    phase_timer.mark("first_send")
 
-                        ts_ms = int(time.time() * 1000)
-                        pkt = make_rtp(crsf, SEQ, ts_ms)
-                        SEQ = (SEQ + 1) & 0xFFFF
+            def active():
+                return dc.readyState == "open"
 
-                        logging.info("TX channels: %s", chans)
-                        logging.info("TX raw: %s", pkt.hex(" "))
-                        dc.send(pkt)
+            if source is not None:
+                asyncio.create_task(source(send_datagram, active))
+            else:
+                scheduler = TxScheduler(rate, send_channels, emit=logging.info)
+                asyncio.create_task(scheduler.run(active))
+            if schedule is not None and source is None:
+                send_telemetry = telemetry_sender(schedule, send_datagram, batch)
+                telemetry_scheduler = TxScheduler(
+                    schedule.tick_rate,
+                    send_telemetry,
+                    emit=logging.info,
+                    prefix="TLM ",
+                )
+                asyncio.create_task(telemetry_scheduler.run(active))
+            if not opened.done():
+                opened.set_result(None)
+                phase_timer.mark("datachannel")
 
-                        await asyncio.sleep(0.5)
+        def on_msg(msg):
+            if isinstance(msg, (bytes, bytearray)) and is_clock_sync(msg):
+                pong = make_pong(msg, now_us())
+                if pong is not None and rc.readyState == "open":
+                    rc.send(pong)
 
-                asyncio.create_task(tx_loop())
+        dc.on("message", on_msg)
+        if rc is not dc:
+            rc.on("message", on_msg)
 
-        # 5. SDP answer
-        await pc.setRemoteDescription(
-            RTCSessionDescription(offer["sdp"], offer["type"])
-        )
-        await pc.setLocalDescription(await pc.createAnswer())
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "message",
-                    "session_id": sid,
-                    "handle_id": hid,
-                    "transaction": "t4",
-                    "body": {"request": "configure"},
-                    "jsep": {
-                        "type": pc.localDescription.type,
-                        "sdp": pc.localDescription.sdp,
-                    },
-                }
-            )
-        )
-
-        await ws.recv()
-        await ws.recv()
+        handle = await negotiate_textroom(janus, pc, handle)
+        await opened
         logging.info("Drone streaming…")
-        await asyncio.Future()
+
+    supervisor = JanusSupervisor(JANUS_WS, setup, emit=logging.info)
+    try:
+        await supervisor.run()
+    finally:
+        await supervisor.close()
+        if pc is not None:
+            await pc.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(run())
+    phase_timer.mark("import")
+    parser = argparse.ArgumentParser(
+        description="Stream RC channels to the pult over the TextRoom data channel."
+    )
+    parser.add_argument(
+        "channels",
+        nargs="*",
+        type=int,
+        help="fixed values for channels 1-16 (11-bit, rest 992); random if omitted",
+    )
+    parser.add_argument(
+        "--rate", type=float, default=DEFAULT_RATE, help="packets per second"
+    )
+    parser.add_argument(
+        "--transport",
+        choices=TRANSPORTS,
+        default="textroom",
+        help="textroom peer connection, or udp to the mountpoint data port",
+    )
+    parser.add_argument("--control", choices=CONTROL_MODES, default="reliable")
+    parser.add_argument(
+        "--redundancy",
+        type=int,
+        help=f"frames per packet (default {DEFAULT_REDUNDANCY} if unreliable, else 1)",
+    )
+    parser.add_argument(
+        "--telemetry",
+        default=DEFAULT_SCHEDULE,
+        help=f"Hz per telemetry kind, '' for none (default {DEFAULT_SCHEDULE})",
+    )
+    parser.add_argument(
+        "--telemetry-unbatched",
+        action="store_true",
+        help="one datagram per telemetry frame instead of one per tick",
+    )
+    parser.add_argument("--host", default=JANUS_HOST, help="udp transport only")
+    parser.add_argument(
+        "--port", type=int, default=DATA_PORT, help="udp transport only"
+    )
+    parser.add_argument("--log", help="append sent packets to this flight log")
+    args = parser.parse_args()
+    try:
+        parse_schedule(args.telemetry)
+    except ValueError as e:
+        parser.error(str(e))
+    batch = not args.telemetry_unbatched
+    cli_vals = [v & 0x7FF for v in args.channels[:RC_CHANNELS]]
+    channels[: len(cli_vals)] = cli_vals
+    log = FlightLogWriter(args.log) if args.log else None
+    try:
+        if args.transport == "udp":
+            asyncio.run(
+                run_udp(
+                    args.rate,
+                    args.host,
+                    args.port,
+                    args.redundancy or 1,
+                    args.telemetry,
+                    batch,
+                    log,
+                )
+            )
+        else:
+            asyncio.run(
+                run(
+                    args.rate,
+                    args.control,
+                    args.redundancy,
+                    args.telemetry,
+                    batch,
+                    log,
+                )
+            )
+    finally:
+        if log is not None:
+            log.close()
@@ -0,0 +1,131 @@
+"""Failsafe for the receiving end of the RC link.
+
+``FailsafeWatchdog.feed()`` is called with every valid RC channel frame and
+only stores the values and a timestamp. ``run()`` sleeps until the newest
+frame would be ``timeout_ms`` old. If nothing newer has arrived by then,
+the deadline is missed: ``channels`` switches to the failsafe set and
+``on_change(True)`` is called. The next fed frame switches back and calls
+``on_change(False)``.
+
+Metrics, read from the watchdog or ``summary()``:
+
+* ``age``: a Histogram of how old each frame got before the next one
+  replaced it, in ms. Its tail shows how close the link comes to the
+  deadline;
+* ``misses``: deadlines missed, that is, failsafe entries;
+* ``failsafe_ms``: total time spent in failsafe.
+
+Feeding records one Histogram value, about a microsecond; the watchdog
+costs nothing more per packet. Nothing is logged here.
+"""
+
+import asyncio
+import time
+
+from common.latency_stats import Histogram
+from crsf_commands.rc_encoder import RC_CHANNELS
+
+DEFAULT_TIMEOUT_MS = 200.0
+# sticks centred, throttle (channel 3) at its minimum
+FAILSAFE_CHANNELS = tuple(172 if i == 2 else 992 for i in range(RC_CHANNELS))
+
+
+class FailsafeWatchdog:
+    def __init__(
+        self,
+        timeout_ms: float = DEFAULT_TIMEOUT_MS,
+        failsafe=FAILSAFE_CHANNELS,
+        on_change=None,
+        clock=time.monotonic,
+    ):
+        if timeout_ms <= 0:
+            raise ValueError(f"timeout must be positive, got {timeout_ms}")
+        self.timeout_ms = timeout_ms
+        self.failsafe = list(failsafe)
+        self.on_change = on_change
+        self.clock = clock
+        self.age = Histogram()
+        self.misses = 0
+        self.active = False  # failsafe channels in use
+        self._channels = None
+        self._last = None  # clock() of the newest frame
+        self._since = None  # clock() when failsafe was entered
+        self._failsafe_s = 0.0
+        self._wakeup = None
+
+    @property
+    def channels(self):
+        """The channel values to act on: the newest frame's, or the failsafe set."""
+        if self.active or self._channels is None:
+            return self.failsafe
+        return self._channels
+
+    @property
+    def failsafe_ms(self) -> float:
+        total = self._failsafe_s
+        if self.active:
+            total += self.clock() - self._since
+        return total * 1000
+
+    def feed(self, channels, now: float = None) -> None:
+        """Take one valid frame's channel values."""
+        if now is None:
+            now = self.clock()
+        if self._last is not None:
+            self.age.record((now - self._last) * 1000)
+        self._channels = channels
+        self._last = now
+        if self.active:
+            self.active = False
+            self._failsafe_s += now - self._since
+            if self.on_change is not None:
+                self.on_change(False)
+        if self._wakeup is not None and not self._wakeup.is_set():
+            self._wakeup.set()  # first frame, or back from failsafe: rearm
+
+    def check(self, now: float = None) -> bool:
+        """Enter failsafe if the deadline has passed; returns ``active``."""
+        if now is None:
+            now = self.clock()
+        if (
+            not self.active
+            and self._last is not None
+            and (now - self._last) * 1000 >= self.timeout_ms
+        ):
+            self.active = True
+            self._since = now
+            self.misses += 1
+            if self.on_change is not None:
+                self.on_change(True)
+        return self.active
+
+    async def run(self) -> None:
+        """Enforce the deadline until cancelled.
+
+        Wakes once per deadline, not per packet. Before the first frame
+        there is no deadline; a link that never comes up is not a miss.
+        """
+        self._wakeup = asyncio.Event()
+        if self._last is None:
+            await self._wakeup.wait()
+        timeout = self.timeout_ms / 1000
+        while True:
+            if self.active:
+                # wait for a frame, then start the next deadline from it
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            delay = self._last + timeout - self.clock()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.check()
+
+    def summary(self) -> str:
+        snap = self.age.snapshot()
+        state = "ACTIVE" if self.active else "ok"
+        return (
+            f"Failsafe {state}: {self.misses} missed deadlines "
+            f"({self.timeout_ms:g} ms), {self.failsafe_ms:.0f} ms in failsafe, "
+            f"frame age p50={snap['p50']:.1f} p99={snap['p99']:.1f} "
+            f"max={snap['max']:.1f} ms"
+        )
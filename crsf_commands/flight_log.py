@@ -0,0 +1,184 @@
+"""Append-only binary log of the CRSF link's packets, and an mmap reader.
+
+A log is ``MAGIC`` followed by records, each a fixed header and the packet
+bytes exactly as sent or received (RTP header included):
+
+    time (int64 LE, µs since the epoch) | length (uint16 LE) | direction (uint8)
+    packet (length bytes)
+
+``direction`` is ``TX`` on the sending end and ``RX`` on the receiving end,
+and times are wall clock, so a drone log and a pult log of the same flight
+line up. There is no footer: a log cut short by a crash is still readable
+up to its last complete record, and a writer reopening it cuts the partial
+one off before appending.
+
+``FlightLogWriter.write()`` is called on the send and receive paths and
+only copies the packet onto a deque. A writer thread drains the deque every
+``flush_interval`` seconds into one ``write()``, so the event loop never
+waits on the disk. ``FlightLogReader`` maps the file and indexes the record
+offsets and times in one pass on open; records come back as memoryviews of
+the mapping, which must be released before ``close()``.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+MAGIC = b"CRSFLOG\x01"
+RECORD = struct.Struct("<qHB")
+MAX_PACKET = 0xFFFF
+TX = 0
+RX = 1
+FLUSH_INTERVAL = 0.5  # s
+
+
+class FlightLogWriter:
+    def __init__(self, path, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.records = 0  # written to the file so far
+        self.dropped = 0  # packets too long for a record
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        else:
+            try:
+                with FlightLogReader(path) as reader:
+                    end = reader.end if reader.truncated else None
+            except ValueError:
+                self._file.close()
+                raise
+            if end is not None:
+                self._file.truncate(end)
+        self._queue = deque()
+        self._closed = False
+        self._wake = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="flight-log", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, data, direction: int = TX, ts_us: int = None) -> None:
+        """Queue one packet; ``ts_us`` defaults to now."""
+        if ts_us is None:
+            ts_us = time.time_ns() // 1000
+        self._queue.append((ts_us, direction, bytes(data)))
+
+    def _drain(self) -> None:
+        queue = self._queue
+        out = bytearray()
+        records = 0
+        while queue:
+            ts_us, direction, data = queue.popleft()
+            if len(data) > MAX_PACKET:
+                self.dropped += 1
+                continue
+            out += RECORD.pack(ts_us, len(data), direction)
+            out += data
+            records += 1
+        if out:
+            self._file.write(out)
+            self._file.flush()
+            self.records += records
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._drain()
+
+    def close(self) -> None:
+        """Write everything queued so far and close the file."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self._drain()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FlightLogReader:
+    """Random access to a flight log's records.
+
+    ``reader[i]`` is ``(ts_us, direction, packet)``, with ``packet`` a
+    memoryview of the mapping. ``times`` holds every record's time, in file
+    order. ``end`` is the offset just past the last complete record, and
+    ``truncated`` is set if the file goes on after it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = array("q")
+        self.times = array("q")
+        self.end = len(MAGIC)
+        self.truncated = False
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < len(MAGIC):
+            self._file.close()
+            raise ValueError(f"{path} is not a flight log")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a flight log")
+        self._view = memoryview(self._map)
+        self._index(size)
+
+    def _index(self, size: int) -> None:
+        offset = len(MAGIC)
+        header = RECORD.size
+        unpack_from = RECORD.unpack_from
+        while offset + header <= size:
+            ts_us, length, _ = unpack_from(self._map, offset)
+            if offset + header + length > size:
+                break
+            self.offsets.append(offset)
+            self.times.append(ts_us)
+            offset += header + length
+        self.end = offset
+        self.truncated = offset != size
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, i: int) -> tuple:
+        offset = self.offsets[i]
+        ts_us, length, direction = RECORD.unpack_from(self._map, offset)
+        start = offset + RECORD.size
+        return ts_us, direction, self._view[start : start + length]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def find(self, ts_us: int) -> int:
+        """Index of the first record at or after ``ts_us`` (times must not go back)."""
+        return bisect_left(self.times, ts_us)
+
+    @property
+    def duration_s(self) -> float:
+        return (self.times[-1] - self.times[0]) / 1e6 if len(self) else 0.0
+
+    def close(self) -> None:
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,151 @@
+"""Fast encoder for RTP-wrapped CRSF ``RC_CHANNELS_PACKED`` packets.
+
+``crsf_build_frame`` goes through ``construct`` for every frame. This module
+writes the same bytes straight into a preallocated buffer:
+
+    RTP header (12)  0x80 | PT | seq | timestamp (ms) | SSRC
+    CRSF frame (26)  0xC8 | 24 | 0x16 | 22 bytes of channels | CRC8
+                     (``redundancy`` frames, oldest first; 1 by default)
+
+The 16 channels are 11 bits each. They are packed as one 176-bit integer
+written little-endian, with channel 1 in the top bits. That is the layout
+crsf_parser builds and parses (``ByteSwapped(BitStruct(...))``), which both
+ends of the link use; the CRSF spec puts channel 1 in the low bits. The
+CRC8 (DVB-S2, polynomial 0xD5) covers the type byte and the payload and is
+computed from a 256-entry table.
+
+``RcEncoder.encode`` updates the sequence number, timestamp, channels and
+CRC in place and returns a view of the reused buffer, which is only valid
+until the next call. ``packet`` returns a ``bytes`` copy for senders that
+queue their data (``RTCDataChannel.send`` only takes ``bytes``), and
+``encode_batch`` fills one buffer with many packets for replay and tests.
+"""
+
+import random
+import struct
+
+CRSF_SYNC = 0xC8
+RC_CHANNELS_PACKED = 0x16
+RC_CHANNELS = 16
+RC_PAYLOAD_SIZE = 22
+CRSF_FRAME_SIZE = RC_PAYLOAD_SIZE + 4  # sync, length, type, payload, CRC
+RTP_HEADER_SIZE = 12
+PACKET_SIZE = RTP_HEADER_SIZE + CRSF_FRAME_SIZE
+DEFAULT_PT = 96
+
+_RTP_HEADER = struct.Struct("!BBHII")
+_SEQ_TS = struct.Struct("!HI")
+_CRSF_HEADER = bytes((CRSF_SYNC, RC_PAYLOAD_SIZE + 2, RC_CHANNELS_PACKED))
+
+
+def _crc8_table(poly: int) -> bytes:
+    table = bytearray(256)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly if crc & 0x80 else crc << 1) & 0xFF
+        table[i] = crc
+    return bytes(table)
+
+
+CRC8_TABLE = _crc8_table(0xD5)
+
+
+def crc8(data, crc: int = 0) -> int:
+    table = CRC8_TABLE
+    for b in data:
+        crc = table[crc ^ b]
+    return crc
+
+
+def pack_channels(channels) -> bytes:
+    """The 22 payload bytes for 16 channel values (masked to 11 bits)."""
+    v = 0
+    for c in channels:
+        v = (v << 11) | (c & 0x7FF)
+    return v.to_bytes(RC_PAYLOAD_SIZE, "little")
+
+
+class RcEncoder:
+    """Builds RC packets of one RTP stream in a reused buffer.
+
+    With ``redundancy`` K above 1 every packet carries the last K frames,
+    oldest first, so a receiver that missed up to K - 1 packets can recover
+    their frames from the next one. Until K frames have been encoded the
+    first frame fills the older slots, so packets always have the same size.
+    """
+
+    def __init__(
+        self,
+        ssrc: int = None,
+        payload_type: int = DEFAULT_PT,
+        seq: int = 0,
+        redundancy: int = 1,
+    ):
+        if redundancy < 1:
+            raise ValueError(f"redundancy must be at least 1, got {redundancy}")
+        self.ssrc = random.getrandbits(32) if ssrc is None else ssrc
+        self.payload_type = payload_type
+        self.seq = seq & 0xFFFF
+        self.redundancy = redundancy
+        self.packet_size = RTP_HEADER_SIZE + redundancy * CRSF_FRAME_SIZE
+        self.buffer = bytearray(self.packet_size)
+        _RTP_HEADER.pack_into(self.buffer, 0, 0x80, payload_type, 0, 0, self.ssrc)
+        for slot in range(redundancy):
+            offset = RTP_HEADER_SIZE + slot * CRSF_FRAME_SIZE
+            self.buffer[offset : offset + 3] = _CRSF_HEADER
+        self._view = memoryview(self.buffer)
+        self._newest = self.packet_size - CRSF_FRAME_SIZE  # offset of the last slot
+        self._primed = False
+
+    def _pack(self, channels, ts_ms: int) -> None:
+        buf = self.buffer
+        _SEQ_TS.pack_into(buf, 2, self.seq, ts_ms & 0xFFFFFFFF)
+        self.seq = (self.seq + 1) & 0xFFFF
+        newest = self._newest
+        if newest > RTP_HEADER_SIZE and self._primed:  # shift the history
+            buf[RTP_HEADER_SIZE:newest] = buf[RTP_HEADER_SIZE + CRSF_FRAME_SIZE :]
+        v = 0
+        for c in channels:
+            v = (v << 11) | (c & 0x7FF)
+        start = newest + 3
+        buf[start : start + RC_PAYLOAD_SIZE] = v.to_bytes(RC_PAYLOAD_SIZE, "little")
+        crc = 0
+        table = CRC8_TABLE
+        for b in self._view[newest + 2 : start + RC_PAYLOAD_SIZE]:
+            crc = table[crc ^ b]
+        buf[start + RC_PAYLOAD_SIZE] = crc
+        if not self._primed:
+            self._primed = True
+            frame = bytes(buf[newest:])
+            for offset in range(RTP_HEADER_SIZE, newest, CRSF_FRAME_SIZE):
+                buf[offset : offset + CRSF_FRAME_SIZE] = frame
+
+    def encode(self, channels, ts_ms: int) -> memoryview:
+        """Encode the next packet; the view is overwritten by the next call."""
+        self._pack(channels, ts_ms)
+        return self._view
+
+    def packet(self, channels, ts_ms: int) -> bytes:
+        """Encode the next packet and return a copy of it."""
+        self._pack(channels, ts_ms)
+        return bytes(self.buffer)
+
+    def encode_batch(self, frames) -> bytearray:
+        """Encode ``(channels, ts_ms)`` pairs into one buffer, packet after packet."""
+        frames = list(frames)
+        size = self.packet_size
+        out = bytearray(size * len(frames))
+        for i, (channels, ts_ms) in enumerate(frames):
+            self._pack(channels, ts_ms)
+            out[i * size : (i + 1) * size] = self.buffer
+        return out
+
+
+def rc_frames(payload) -> list:
+    """Split a payload into its CRSF frames, oldest first."""
+    view = memoryview(payload)
+    return [
+        view[offset : offset + CRSF_FRAME_SIZE]
+        for offset in range(0, len(view) - CRSF_FRAME_SIZE + 1, CRSF_FRAME_SIZE)
+    ]
@@ -0,0 +1,165 @@
+"""Replay a flight log through the drone's CRSF data path.
+
+Sends the packets of a log written with ``--log`` (by drone_crsf or
+controller_crsf) over drone_crsf's transports, in place of its RC and
+telemetry schedulers: ``--speed 1`` keeps the recorded timing, other
+values scale it, and ``--speed 0`` sends as fast as the transport takes
+packets, for load tests. With ``--loops`` above 1 the log is sent again
+from the start.
+
+RTP timestamps are rewritten to the send time so the pult's latency
+figures stay meaningful, and on every loop after the first each stream's
+sequence numbers carry on from where the last loop left them, so the pult
+sees one continuous stream. ``--keep-timestamps`` sends the packets
+unchanged.
+
+drone_crsf starts the source again each time its data channel reopens
+after a reconnect. The replay then carries on from the first packet not
+yet handed to the transport, not from the start of the log, and the run
+that was interrupted stops for good.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crsf_commands.control_channel import CONTROL_MODES
+from crsf_commands.drone_crsf import DATA_PORT, JANUS_HOST, TRANSPORTS, run, run_udp
+from crsf_commands.flight_log import FlightLogReader
+
+FAST_BATCH = 64  # packets between yields to the event loop at --speed 0
+_SEQ = struct.Struct("!H")
+_TIMESTAMP = struct.Struct("!I")
+_SSRC = struct.Struct("!I")
+
+
+def seq_spans(reader: FlightLogReader) -> dict:
+    """Sequence numbers each RTP stream (by SSRC) spans in the log."""
+    first, last = {}, {}
+    for _, _, packet in reader:
+        if len(packet) >= 12:
+            ssrc = _SSRC.unpack_from(packet, 8)[0]
+            seq = _SEQ.unpack_from(packet, 2)[0]
+            first.setdefault(ssrc, seq)
+            last[ssrc] = seq
+        packet.release()
+    return {ssrc: (last[ssrc] - seq + 1) & 0xFFFF for ssrc, seq in first.items()}
+
+
+def log_source(reader: FlightLogReader, speed=1.0, loops=1, restamp=True):
+    """A drone_crsf ``source`` that sends the records of ``reader``.
+
+    Calling it again resumes the replay where the last call left off.
+    """
+
+    spans = seq_spans(reader) if restamp and loops > 1 else {}
+    position = [0, 0]  # loop and record index of the next packet to send
+    runs = 0  # source() calls so far; only the newest one sends
+
+    async def source(send, active) -> None:
+        nonlocal runs
+        runs += 1
+        run = runs
+        if position[0] >= loops:
+            return
+        loop = asyncio.get_running_loop()
+        sent = dropped = 0
+        started = loop.time()
+        first = reader.times[0] if len(reader) else 0
+        while position[0] < loops:
+            n, resume = position
+            # a resumed loop sends its next record now, the rest in step
+            offset = 0.0
+            if speed > 0 and resume < len(reader):
+                offset = (reader.times[resume] - first) / 1e6 / speed
+            start = loop.time() - offset
+            for i in range(resume, len(reader)):
+                if speed > 0:
+                    ts_us = reader.times[i]
+                    delay = start + (ts_us - first) / 1e6 / speed - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                elif i % FAST_BATCH == 0:
+                    await asyncio.sleep(0)
+                # checked after the wait: a reconnect may have come meanwhile
+                if run != runs or not active():
+                    logging.info("Replay paused at packet %d of loop %d", i, n + 1)
+                    return
+                _, _, packet = reader[i]
+                data = bytearray(packet)
+                packet.release()
+                if restamp and len(data) >= 12:
+                    now_ms = int(time.time() * 1000) & 0xFFFFFFFF
+                    _TIMESTAMP.pack_into(data, 4, now_ms)
+                    if n:
+                        span = spans[_SSRC.unpack_from(data, 8)[0]]
+                        seq = _SEQ.unpack_from(data, 2)[0]
+                        _SEQ.pack_into(data, 2, (seq + n * span) & 0xFFFF)
+                if send(data):
+                    sent += 1
+                else:
+                    dropped += 1
+                position[1] = i + 1
+            position[:] = [n + 1, 0]
+        elapsed = loop.time() - started
+        logging.info(
+            "Replay done: %d packets in %.1f s (%.0f/s), %d not sent",
+            sent,
+            elapsed,
+            sent / elapsed if elapsed > 0 else 0.0,
+            dropped,
+        )
+
+    return source
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay a CRSF flight log over the drone's data path."
+    )
+    parser.add_argument("log", help="flight log written with --log")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="timing scale (1 = as recorded, 0 = as fast as possible)",
+    )
+    parser.add_argument("--loops", type=int, default=1)
+    parser.add_argument("--keep-timestamps", action="store_true")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="textroom")
+    parser.add_argument("--control", choices=CONTROL_MODES, default="reliable")
+    parser.add_argument("--host", default=JANUS_HOST, help="udp transport only")
+    parser.add_argument(
+        "--port", type=int, default=DATA_PORT, help="udp transport only"
+    )
+    args = parser.parse_args()
+    if args.speed < 0:
+        parser.error("--speed must not be negative")
+
+    with FlightLogReader(args.log) as reader:
+        logging.basicConfig(
+            level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s"
+        )
+        logging.info(
+            "%s: %d packets over %.1f s%s",
+            args.log,
+            len(reader),
+            reader.duration_s,
+            " (truncated)" if reader.truncated else "",
+        )
+        source = log_source(
+            reader, args.speed, args.loops, restamp=not args.keep_timestamps
+        )
+        if args.transport == "udp":
+            coro = run_udp(
+                host=args.host, port=args.port, telemetry="", source=source
+            )
+        else:
+            coro = run(control=args.control, telemetry="", source=source)
+        asyncio.run(coro)
@@ -0,0 +1,192 @@
+"""RTP receive stage for the CRSF control stream.
+
+``parse_rtp`` decodes the full RTP header (CSRC list, header extension,
+padding) and returns the payload as a view. ``RtpReceiver`` tracks one
+stream. Sequence numbers are extended to 32 bits across wrap-around as in
+RFC 3550 appendix A.1, and only packets newer than the newest one accepted
+so far are passed on. A duplicate, or a packet overtaken by a newer one,
+carries an older stick position and is dropped and counted. A jump of more
+than ``MAX_DROPOUT`` packets is taken as a restarted sender once two
+consecutive packets confirm it, as is a new SSRC.
+
+Interarrival jitter is the RFC 3550 estimator (``J += (|D| - J) / 16``) in
+timestamp units, which are milliseconds for the drone's 1000 Hz clock. Lost
+packets are the sequence numbers up to the newest one that never arrived;
+packets that arrive after being overtaken are counted as stale instead.
+``gap`` tells how many packets went missing just before the one returned,
+for senders that repeat earlier frames. Nothing is logged here; read the
+counters or ``snapshot()``.
+"""
+
+import struct
+
+RTP_VERSION = 2
+RTP_HEADER = struct.Struct("!BBHII")
+RTP_SEQ_MOD = 1 << 16
+MAX_DROPOUT = 3000
+MAX_MISORDER = 100
+# sequence numbers remembered to tell duplicates from stale packets; covers
+# every packet within MAX_MISORDER, so a duplicate is never counted as received
+HISTORY = 128
+DEFAULT_CLOCK_RATE = 1000  # Hz; the drone stamps packets in ms
+
+
+class RtpPacket:
+    __slots__ = (
+        "marker",
+        "payload_type",
+        "seq",
+        "timestamp",
+        "ssrc",
+        "csrcs",
+        "payload",
+    )
+
+    def __init__(self, marker, payload_type, seq, timestamp, ssrc, csrcs, payload):
+        self.marker = marker
+        self.payload_type = payload_type
+        self.seq = seq
+        self.timestamp = timestamp
+        self.ssrc = ssrc
+        self.csrcs = csrcs
+        self.payload = payload
+
+
+def parse_rtp(data) -> RtpPacket:
+    """Parse one RTP packet; raises ValueError if it is not one."""
+    if len(data) < RTP_HEADER.size:
+        raise ValueError(f"RTP packet too short ({len(data)} bytes)")
+    b0, b1, seq, timestamp, ssrc = RTP_HEADER.unpack_from(data)
+    if b0 >> 6 != RTP_VERSION:
+        raise ValueError(f"not RTP version 2 (first byte {b0:#04x})")
+    cc = b0 & 0x0F
+    start = RTP_HEADER.size + 4 * cc
+    csrcs = struct.unpack_from(f"!{cc}I", data, RTP_HEADER.size) if cc else ()
+    if b0 & 0x10:  # header extension: profile, length in 32-bit words
+        if len(data) < start + 4:
+            raise ValueError("truncated RTP header extension")
+        start += 4 + 4 * struct.unpack_from("!H", data, start + 2)[0]
+    end = len(data)
+    if b0 & 0x20:  # padding, its length in the last byte
+        end -= data[-1]
+    if start > end or (b0 & 0x20 and not data[-1]):
+        raise ValueError("bad RTP header length or padding")
+    payload = memoryview(data)[start:end]
+    return RtpPacket(bool(b1 & 0x80), b1 & 0x7F, seq, timestamp, ssrc, csrcs, payload)
+
+
+class RtpReceiver:
+    def __init__(self, clock_rate: int = DEFAULT_CLOCK_RATE):
+        self.clock_rate = clock_rate
+        self.ssrc = None
+        self.ssrc_changes = 0
+        self.malformed = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the stream state, as for a new sender."""
+        self.base_seq = None  # extended seq of the first packet
+        self.max_seq = None  # extended seq of the newest accepted packet
+        self.received = 0  # distinct sequence numbers seen
+        self.accepted = 0
+        self.duplicates = 0
+        self.stale = 0
+        self.jitter = 0.0  # timestamp units
+        self.gap = 0  # sequence numbers skipped just before the last accepted packet
+        self._seen = 0  # bit i: max_seq - i was seen
+        self._bad_seq = None
+        self._transit = None
+
+    @property
+    def expected(self) -> int:
+        return 0 if self.max_seq is None else self.max_seq - self.base_seq + 1
+
+    @property
+    def lost(self) -> int:
+        return self.expected - self.received
+
+    @property
+    def loss_rate(self) -> float:
+        expected = self.expected
+        return self.lost / expected if expected else 0.0
+
+    @property
+    def jitter_ms(self) -> float:
+        return self.jitter * 1000 / self.clock_rate
+
+    def receive(self, data, arrival_ms: float):
+        """Account for one packet; returns it if it is the newest, else None."""
+        try:
+            pkt = parse_rtp(data)
+        except ValueError:
+            self.malformed += 1
+            return None
+        if pkt.ssrc != self.ssrc:
+            if self.ssrc is not None:
+                self.ssrc_changes += 1
+            self.ssrc = pkt.ssrc
+            self.reset()
+        self.gap = 0
+        if self.max_seq is None:
+            self._start(pkt.seq)
+        else:
+            delta = (pkt.seq - self.max_seq) % RTP_SEQ_MOD
+            if delta == 0 or delta >= RTP_SEQ_MOD - MAX_MISORDER:
+                return self._old(self.max_seq - ((RTP_SEQ_MOD - delta) % RTP_SEQ_MOD))
+            if delta >= MAX_DROPOUT:
+                if pkt.seq != self._bad_seq:
+                    self._bad_seq = (pkt.seq + 1) % RTP_SEQ_MOD
+                    return None
+                self.reset()  # two in a row: the sender restarted
+                self._start(pkt.seq)
+            else:
+                self._seen = ((self._seen << delta) | 1) & ((1 << HISTORY) - 1)
+                self.max_seq += delta
+                self.gap = delta - 1
+        self._bad_seq = None
+        self.received += 1
+        self.accepted += 1
+        self._update_jitter(pkt.timestamp, arrival_ms)
+        return pkt
+
+    def _start(self, seq: int) -> None:
+        self.base_seq = self.max_seq = seq
+        self._seen = 1
+
+    def _old(self, ext_seq: int):
+        age = self.max_seq - ext_seq
+        if age >= HISTORY:
+            self.stale += 1  # cannot tell if it is a duplicate: not received
+        elif self._seen >> age & 1:
+            self.duplicates += 1
+        else:
+            self._seen |= 1 << age
+            if ext_seq >= self.base_seq:
+                self.received += 1
+            self.stale += 1
+        return None
+
+    def _update_jitter(self, timestamp: int, arrival_ms: float) -> None:
+        arrival = arrival_ms * self.clock_rate / 1000
+        transit = (arrival - timestamp) % (1 << 32)
+        if self._transit is not None:
+            d = (transit - self._transit) % (1 << 32)
+            if d > 1 << 31:
+                d -= 1 << 32
+            self.jitter += (abs(d) - self.jitter) / 16
+        self._transit = transit
+
+    def snapshot(self) -> dict:
+        return {
+            "ssrc": self.ssrc,
+            "expected": self.expected,
+            "received": self.received,
+            "accepted": self.accepted,
+            "lost": self.lost,
+            "loss_rate": self.loss_rate,
+            "duplicates": self.duplicates,
+            "stale": self.stale,
+            "malformed": self.malformed,
+            "ssrc_changes": self.ssrc_changes,
+            "jitter_ms": self.jitter_ms,
+        }
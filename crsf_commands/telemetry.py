@@ -0,0 +1,344 @@
+"""CRSF telemetry downlink: drone-side encoder and schedule, pult-side series.
+
+The drone sends CRSF telemetry frames in their own RTP stream (payload type
+``TELEMETRY_PT``, own SSRC and sequence numbers) over the same transport as
+the RC packets. The pult tells the two streams apart by payload type.
+Payloads are big-endian, as in the CRSF spec:
+
+    LINK_STATISTICS 0x14 (10)  uplink RSSI ant. 1/2 (-dBm), LQ (%), SNR (dB),
+                               antenna, RF mode, TX power, downlink RSSI
+                               (-dBm), LQ (%), SNR (dB)
+    BATTERY_SENSOR  0x08  (8)  voltage (dV), current (dA), capacity used
+                               (mAh, 24 bit), remaining (%)
+    ATTITUDE        0x1E  (6)  pitch, roll, yaw (100 µrad, signed)
+    GPS             0x02 (15)  latitude, longitude (deg * 1e7), ground speed
+                               (km/h * 10), heading (cdeg), altitude
+                               (m + 1000), satellites
+
+``TelemetrySchedule`` says which kinds are due on each tick of the send
+loop, from per-kind rates such as ``attitude=50,link=20``. With ``batch``
+on, ``TelemetryEncoder`` puts every frame due on a tick into one datagram
+behind one RTP header, so the drone pays one send per tick rather than one
+per frame.
+
+On the pult, ``TelemetryReceiver`` checks each frame's CRC and appends its
+values, in the units of ``TelemetryKind.fields``, to that kind's
+``Series``: fixed-size ring buffers, one ``array('d')`` per column. Queries
+return memoryviews of those arrays, so a display or logger reads samples
+without copying them. The views alias live storage; read them before the
+next append, or copy them.
+"""
+
+import random
+import struct
+from array import array
+
+from crsf_commands.rc_encoder import CRC8_TABLE, CRSF_SYNC, RTP_HEADER_SIZE
+from crsf_commands.rtp_receiver import RtpReceiver
+
+GPS = 0x02
+BATTERY_SENSOR = 0x08
+LINK_STATISTICS = 0x14
+ATTITUDE = 0x1E
+TELEMETRY_PT = 97
+DEFAULT_CAPACITY = 1024  # samples per kind
+DEFAULT_SCHEDULE = "attitude=50,link=20,gps=20,battery=10"  # Hz; 100 frames/s
+
+# struct code -> (lowest, highest) raw value
+_LIMITS = {
+    "b": (-0x80, 0x7F),
+    "B": (0, 0xFF),
+    "h": (-0x8000, 0x7FFF),
+    "H": (0, 0xFFFF),
+    "i": (-0x80000000, 0x7FFFFFFF),
+    "I": (0, 0xFFFFFFFF),
+}
+_RTP_HEADER = struct.Struct("!BBHII")
+_SEQ_TS = struct.Struct("!HI")
+
+
+class TelemetryKind:
+    """One CRSF telemetry frame type: payload layout and field scaling.
+
+    A field's value is ``raw * scale + offset``; values outside what the
+    field can hold are sent as its lowest or highest raw value. BATTERY_SENSOR's
+    24-bit capacity has no ``struct`` code, so its format packs capacity and
+    remaining together as one 32-bit integer, split in ``unpack_from``, and
+    the kind gives their ``limits`` itself.
+    """
+
+    def __init__(
+        self, name, frame_type, fmt, fields, scales=None, offsets=None, limits=None
+    ):
+        self.name = name
+        self.frame_type = frame_type
+        self.struct = struct.Struct(fmt)
+        self.fields = fields
+        self.scales = scales or (1,) * len(fields)
+        self.offsets = offsets or (0,) * len(fields)
+        self.limits = limits or tuple(_LIMITS[code] for code in fmt.lstrip("<>!="))
+        self.frame_size = self.struct.size + 4  # sync, length, type, CRC
+
+    def pack_into(self, buf, offset: int, values) -> None:
+        raw = [
+            min(max(round((v - o) / s), lo), hi)
+            for v, s, o, (lo, hi) in zip(
+                values, self.scales, self.offsets, self.limits
+            )
+        ]
+        if self.frame_type == BATTERY_SENSOR:
+            raw[2:] = [(raw[2] & 0xFFFFFF) << 8 | raw[3]]
+        self.struct.pack_into(buf, offset, *raw)
+
+    def unpack_from(self, buf, offset: int) -> tuple:
+        raw = self.struct.unpack_from(buf, offset)
+        if self.frame_type == BATTERY_SENSOR:
+            raw = raw[:2] + (raw[2] >> 8, raw[2] & 0xFF)
+        return tuple(r * s + o for r, s, o in zip(raw, self.scales, self.offsets))
+
+
+KINDS = {
+    kind.name: kind
+    for kind in (
+        TelemetryKind(
+            "link",
+            LINK_STATISTICS,
+            ">BBBbBBBBBb",
+            (
+                "uplink_rssi_1",
+                "uplink_rssi_2",
+                "uplink_lq",
+                "uplink_snr",
+                "antenna",
+                "rf_mode",
+                "tx_power",
+                "downlink_rssi",
+                "downlink_lq",
+                "downlink_snr",
+            ),
+            scales=(-1, -1, 1, 1, 1, 1, 1, -1, 1, 1),
+        ),
+        TelemetryKind(
+            "battery",
+            BATTERY_SENSOR,
+            ">HHI",
+            ("voltage", "current", "capacity", "remaining"),
+            scales=(0.1, 0.1, 1, 1),
+            limits=((0, 0xFFFF), (0, 0xFFFF), (0, 0xFFFFFF), (0, 0xFF)),
+        ),
+        TelemetryKind(
+            "attitude",
+            ATTITUDE,
+            ">hhh",
+            ("pitch", "roll", "yaw"),
+            scales=(1e-4, 1e-4, 1e-4),
+        ),
+        TelemetryKind(
+            "gps",
+            GPS,
+            ">iiHHHB",
+            ("latitude", "longitude", "ground_speed", "heading", "altitude", "sats"),
+            scales=(1e-7, 1e-7, 0.1, 0.01, 1, 1),
+            offsets=(0, 0, 0, 0, -1000, 0),
+        ),
+    )
+}
+_BY_TYPE = {kind.frame_type: kind for kind in KINDS.values()}
+
+
+def parse_schedule(spec: str) -> dict:
+    """``"attitude=50,link=20"`` -> ``{"attitude": 50.0, "link": 20.0}``."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        if name not in KINDS:
+            raise ValueError(f"unknown telemetry kind {name!r}, not in {list(KINDS)}")
+        rates[name] = float(rate)
+        if rates[name] <= 0:
+            raise ValueError(f"telemetry rate must be positive, got {item!r}")
+    return rates
+
+
+class TelemetrySchedule:
+    """Which kinds are due, for a send loop ticking at ``tick_rate``.
+
+    Each kind has its own deadline, ``1 / rate`` apart. ``due(now)`` returns
+    the kinds whose deadline has passed and moves it on by one period, or
+    past ``now`` if the loop fell behind, so a stalled drone sends the
+    newest values once instead of a burst of old ones.
+    """
+
+    def __init__(self, rates: dict):
+        if not rates:
+            raise ValueError("empty telemetry schedule")
+        self.rates = dict(rates)
+        self.tick_rate = max(self.rates.values())
+        self._periods = {name: 1.0 / rate for name, rate in self.rates.items()}
+        self._next = None
+
+    def due(self, now: float) -> list:
+        if self._next is None:
+            self._next = dict.fromkeys(self.rates, now)
+        due = []
+        # half a tick of slack, or rates that divide tick_rate would skip ticks
+        slack = 0.5 / self.tick_rate
+        for name, deadline in self._next.items():
+            if now + slack >= deadline:
+                due.append(name)
+                period = self._periods[name]
+                deadline += period
+                if deadline <= now:
+                    deadline = now + period
+                self._next[name] = deadline
+        return due
+
+
+class TelemetryEncoder:
+    """Builds telemetry datagrams of one RTP stream in a reused buffer.
+
+    ``encode`` writes an RTP header and the given frames back to back and
+    returns a view of the buffer, valid until the next call. The buffer
+    holds one frame of every kind, the most a tick of the schedule needs.
+    """
+
+    def __init__(self, ssrc: int = None, payload_type: int = TELEMETRY_PT, seq=0):
+        self.ssrc = random.getrandbits(32) if ssrc is None else ssrc
+        self.seq = seq & 0xFFFF
+        size = RTP_HEADER_SIZE + sum(kind.frame_size for kind in KINDS.values())
+        self.buffer = bytearray(size)
+        _RTP_HEADER.pack_into(self.buffer, 0, 0x80, payload_type, 0, 0, self.ssrc)
+        self._view = memoryview(self.buffer)
+
+    def encode(self, frames, ts_ms: int) -> memoryview:
+        """Encode ``(kind name, values)`` pairs into the next datagram."""
+        buf = self.buffer
+        _SEQ_TS.pack_into(buf, 2, self.seq, ts_ms & 0xFFFFFFFF)
+        self.seq = (self.seq + 1) & 0xFFFF
+        offset = RTP_HEADER_SIZE
+        table = CRC8_TABLE
+        for name, values in frames:
+            kind = KINDS[name]
+            end = offset + kind.frame_size
+            buf[offset] = CRSF_SYNC
+            buf[offset + 1] = kind.frame_size - 2
+            buf[offset + 2] = kind.frame_type
+            kind.pack_into(buf, offset + 3, values)
+            crc = 0
+            for b in self._view[offset + 2 : end - 1]:
+                crc = table[crc ^ b]
+            buf[end - 1] = crc
+            offset = end
+        return self._view[:offset]
+
+
+class Series:
+    """Fixed-size ring buffer of timestamped samples, one array per column.
+
+    ``time`` holds the arrival time (ms, pult clock) of each sample.
+    ``count`` is the number of samples ever appended; the newest
+    ``capacity`` of them are kept.
+    """
+
+    def __init__(self, fields, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, got {capacity}")
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.count = 0
+        self._columns = {
+            name: array("d", bytes(8 * capacity)) for name in ("time",) + self.fields
+        }
+        self._order = tuple(self._columns.values())
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def append(self, t: float, values) -> None:
+        i = self.count % self.capacity
+        columns = self._order
+        columns[0][i] = t
+        for column, value in zip(columns[1:], values):
+            column[i] = value
+        self.count += 1
+
+    def latest(self) -> dict:
+        """The newest sample as ``{"time": ..., field: ...}``, or None."""
+        if not self.count:
+            return None
+        i = (self.count - 1) % self.capacity
+        return {name: column[i] for name, column in self._columns.items()}
+
+    def segments(self, field: str = "time", n: int = None) -> tuple:
+        """Views of the newest ``n`` (default all kept) values of ``field``.
+
+        Returns one or two memoryviews, oldest first: two when the window
+        wraps around the end of the ring.
+        """
+        size = len(self)
+        n = size if n is None else max(0, min(n, size))
+        view = memoryview(self._columns[field])
+        end = self.count % self.capacity or (self.capacity if self.count else 0)
+        start = end - n
+        if start >= 0:
+            return (view[start:end],)
+        return (view[start + self.capacity :], view[:end])
+
+
+class TelemetryReceiver:
+    """Decodes the drone's telemetry stream into one ``Series`` per kind."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.rtp = RtpReceiver()
+        self.series = {
+            name: Series(kind.fields, capacity) for name, kind in KINDS.items()
+        }
+        self.frames = 0
+        self.bad_frames = 0  # bad sync, length or CRC; ends the packet
+        self.unknown = 0  # valid frames of other types
+
+    def receive(self, data, arrival_ms: float):
+        """Decode one datagram; returns the RtpPacket if it was accepted, else None."""
+        pkt = self.rtp.receive(data, arrival_ms)
+        if pkt is None:
+            return None
+        payload = pkt.payload
+        size = len(payload)
+        offset = 0
+        table = CRC8_TABLE
+        while offset + 4 <= size:
+            end = offset + 2 + payload[offset + 1]
+            if payload[offset] != CRSF_SYNC or end > size:
+                self.bad_frames += 1
+                break
+            crc = 0
+            for b in payload[offset + 2 : end - 1]:
+                crc = table[crc ^ b]
+            if crc != payload[end - 1]:
+                self.bad_frames += 1
+                break
+            kind = _BY_TYPE.get(payload[offset + 2])
+            if kind is None or end - offset != kind.frame_size:
+                self.unknown += 1
+            else:
+                values = kind.unpack_from(payload, offset + 3)
+                self.series[kind.name].append(arrival_ms, values)
+                self.frames += 1
+            offset = end
+        return pkt
+
+    def summary(self) -> str:
+        rtp = self.rtp
+        parts = [
+            f"TLM {rtp.accepted}/{rtp.expected} packets, lost {rtp.lost}, "
+            f"{self.frames} frames ({self.bad_frames} bad, {self.unknown} unknown)"
+        ]
+        link = self.series["link"].latest()
+        if link:
+            parts.append(
+                f"LQ {link['uplink_lq']:.0f}/{link['downlink_lq']:.0f}% "
+                f"RSSI {link['uplink_rssi_1']:.0f} dBm"
+            )
+        battery = self.series["battery"].latest()
+        if battery:
+            parts.append(f"bat {battery['voltage']:.1f} V {battery['remaining']:.0f}%")
+        return ", ".join(parts)
@@ -0,0 +1,110 @@
+"""Fixed-rate transmit scheduling against absolute deadlines.
+
+``TxScheduler.run()`` calls ``send()`` at ``rate_hz``. Tick ``n`` is due at
+``start + n / rate_hz`` on the event loop clock, so a late wake-up delays
+that one packet and not every packet after it, and the rate does not drift.
+
+The lateness of every send (wake-up time minus deadline) is recorded in a
+Histogram as send jitter. If a tick is so late that one or more later
+deadlines have passed too, those ticks are counted as missed and skipped,
+not sent in a burst: an RC frame is a snapshot of the sticks, and a stale
+one is worth nothing. An exception from ``send()`` fails that tick only: it
+is counted in ``errors``, the first of each report interval is passed to
+``emit``, and the next tick goes out on time. Every ``report_interval``
+seconds a one-line summary (rate, sent, missed, errors, jitter percentiles)
+goes to ``emit``, so nothing is logged per packet.
+
+Jitter is bounded below by the event loop's timer resolution (about 1 ms
+with the default selector loop), which is fine up to 500 Hz.
+"""
+
+import asyncio
+
+from common.latency_stats import Histogram
+
+REPORT_INTERVAL = 5.0
+
+
+class TxScheduler:
+    def __init__(
+        self,
+        rate_hz: float,
+        send,
+        report_interval: float = REPORT_INTERVAL,
+        emit=print,
+        prefix: str = "",
+    ):
+        if rate_hz <= 0:
+            raise ValueError(f"rate must be positive, got {rate_hz}")
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+        self.send = send
+        self.report_interval = report_interval
+        self.emit = emit
+        self.prefix = prefix
+        self.jitter = Histogram()  # ms late, current report interval
+        self.sent = 0
+        self.missed = 0
+        self.errors = 0
+        self._interval_sent = 0
+        self._interval_missed = 0
+        self._interval_errors = 0
+
+    async def run(self, active=lambda: True) -> None:
+        """Send until ``active()`` turns false (checked before every tick)."""
+        loop = asyncio.get_running_loop()
+        period = self.period
+        start = loop.time()
+        tick = 0
+        report_at = start + self.report_interval
+        while active():
+            deadline = start + tick * period
+            now = loop.time()
+            if deadline > now:
+                await asyncio.sleep(deadline - now)
+                now = loop.time()
+            late = now - deadline
+            if late >= period:
+                skipped = int(late / period)
+                tick += skipped
+                self.missed += skipped
+                self._interval_missed += skipped
+                late -= skipped * period
+            tick += 1
+            self.jitter.record(late * 1000)
+            try:
+                self.send()
+            except Exception as e:
+                if not self._interval_errors:
+                    self.emit(f"{self.prefix}TX send failed: {e!r}")
+                self.errors += 1
+                self._interval_errors += 1
+            else:
+                self.sent += 1
+                self._interval_sent += 1
+            if now >= report_at:
+                self.report(now - report_at + self.report_interval)
+                report_at = now + self.report_interval
+
+    def report(self, elapsed: float) -> dict:
+        """Emit and return the summary of the interval just ended, then reset it."""
+        snap = self.jitter.snapshot()
+        summary = {
+            "rate": self._interval_sent / elapsed if elapsed > 0 else 0.0,
+            "sent": self._interval_sent,
+            "missed": self._interval_missed,
+            "errors": self._interval_errors,
+            "jitter": snap,
+        }
+        self.emit(
+            f"{self.prefix}TX {summary['rate']:.1f}/{self.rate_hz:g} Hz: "
+            f"sent={summary['sent']} missed={summary['missed']} "
+            f"errors={summary['errors']} "
+            f"jitter p50={snap['p50']:.2f} p99={snap['p99']:.2f} "
+            f"max={snap['max']:.2f} ms"
+        )
+        self.jitter = Histogram()
+        self._interval_sent = 0
+        self._interval_missed = 0
+        self._interval_errors = 0
+        return summary
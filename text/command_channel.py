@@ -0,0 +1,307 @@
+"""Acknowledged commands over TextRoom messages, with RTT and delivery latency.
+
+The pult sends each command as the ``text`` of a TextRoom message, and the
+drone answers every copy it gets, to the sender only:
+
+    C <session> <id> <attempt> <sent_ms> <command>
+    A <session> <id> <attempt>
+
+``session`` is random per ``CommandSender``, so ids counting up from 1 after
+a pult restart are not taken for duplicates. ``sent_ms`` is the wall-clock
+time of the first attempt. A command without an ack after ``timeout_ms`` is
+sent again with the next ``attempt`` number, up to ``max_attempts`` sends,
+then given up. This also carries commands across a Janus reconnect, when
+sends fail for a while. The drone delivers each id once and acknowledges
+duplicates without delivering them again.
+
+The drone remembers, per sender session, the highest id below which every
+id was delivered and the delivered ids above it. An id missing for longer
+than the retry window (by the sender's ``sent_ms`` of newer commands) was
+given up on, so the drone stops waiting for it; at most ``MAX_AHEAD`` ids
+are kept above it either way. A session that sends nothing for
+``INBOX_IDLE`` retry windows is forgotten.
+
+Metrics:
+
+* ``CommandSender.rtt``: ms from an attempt to its ack, for commands whose
+  latest attempt was the one acknowledged;
+* ``CommandSender.completion``: ms from the first attempt to the ack,
+  retransmit waits included;
+* ``CommandReceiver.delivery``: ms from the first attempt to delivery on
+  the drone. It compares the two hosts' wall clocks, so it is only as good
+  as their sync.
+
+Both sides parse the text with one ``split()``; the TextRoom envelope is
+the only JSON.
+"""
+
+import asyncio
+import random
+import time
+
+from common.latency_stats import Histogram
+
+COMMAND = "C"
+ACK = "A"
+DEFAULT_TIMEOUT_MS = 1000.0
+DEFAULT_ATTEMPTS = 5
+# how long a sender with the defaults keeps retrying one command
+RETRY_WINDOW_MS = DEFAULT_TIMEOUT_MS * DEFAULT_ATTEMPTS
+MAX_AHEAD = 1024  # delivered ids kept above a missing one, per session
+INBOX_IDLE = 2  # retry windows of silence before a session is forgotten
+
+
+def _wall_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class _Pending:
+    __slots__ = ("command", "sent_ms", "first", "last", "attempts")
+
+    def __init__(self, command: str, sent_ms: int, now: float):
+        self.command = command
+        self.sent_ms = sent_ms
+        self.first = now
+        self.last = now
+        self.attempts = 0
+
+
+class _Inbox:
+    __slots__ = ("contiguous", "above", "newest_ms", "active_ms")
+
+    def __init__(self, now_ms: float):
+        self.contiguous = 0  # every id up to this one is done with
+        self.above = {}  # delivered id above ``contiguous`` -> its sent_ms
+        self.newest_ms = 0  # newest sent_ms seen, sender's clock
+        self.active_ms = now_ms  # last command, receiver's clock
+
+    def seen(self, msg_id: int) -> bool:
+        return msg_id <= self.contiguous or msg_id in self.above
+
+    def add(self, msg_id: int, sent_ms: int, retry_window_ms: float) -> None:
+        above = self.above
+        above[msg_id] = sent_ms
+        self.newest_ms = max(self.newest_ms, sent_ms)
+        while above:
+            if self.contiguous + 1 in above:
+                self.contiguous += 1
+                del above[self.contiguous]
+                continue
+            # the ids missing below the lowest one were sent before it
+            lowest = min(above)
+            given_up = self.newest_ms - above[lowest] > retry_window_ms
+            if not given_up and len(above) <= MAX_AHEAD:
+                break
+            self.contiguous = lowest - 1
+
+
+class CommandSender:
+    """Pult side: numbers commands, matches acks, retransmits.
+
+    ``send(text)`` puts one message text on the channel; a send that fails
+    is retried by the timeout like a lost one. ``on_result(id, command,
+    completion_ms)`` is called once per command, with ``completion_ms``
+    None if it was given up.
+    """
+
+    def __init__(
+        self,
+        send,
+        timeout_ms: float = DEFAULT_TIMEOUT_MS,
+        max_attempts: int = DEFAULT_ATTEMPTS,
+        on_result=None,
+        clock=time.monotonic,
+    ):
+        if timeout_ms <= 0:
+            raise ValueError(f"timeout must be positive, got {timeout_ms}")
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, got {max_attempts}")
+        self.send = send
+        self.timeout_ms = timeout_ms
+        self.max_attempts = max_attempts
+        self.on_result = on_result
+        self.clock = clock
+        self.session = f"{random.getrandbits(32):08x}"
+        self.rtt = Histogram()
+        self.completion = Histogram()
+        self.submitted = 0
+        self.acked = 0
+        self.failed = 0  # given up after max_attempts
+        self.retransmits = 0
+        self.stray_acks = 0  # for commands already acked or given up
+        self._next_id = 1
+        self._pending = {}
+        self._wakeup = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def submit(self, command: str) -> int:
+        """Send ``command`` and track it until acked; returns its id."""
+        now = self.clock()
+        msg_id = self._next_id
+        self._next_id += 1
+        pending = self._pending[msg_id] = _Pending(command, _wall_ms(), now)
+        self.submitted += 1
+        self._attempt(msg_id, pending, now)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return msg_id
+
+    def _attempt(self, msg_id: int, pending: _Pending, now: float) -> None:
+        pending.attempts += 1
+        pending.last = now
+        self.send(
+            f"{COMMAND} {self.session} {msg_id} {pending.attempts} "
+            f"{pending.sent_ms} {pending.command}"
+        )
+
+    def receive(self, text: str) -> bool:
+        """Take one incoming message text; returns whether it was an ack."""
+        parts = text.split(" ")
+        if len(parts) != 4 or parts[0] != ACK:
+            return False
+        if parts[1] != self.session:
+            return True
+        try:
+            msg_id, attempt = int(parts[2]), int(parts[3])
+        except ValueError:
+            return True
+        pending = self._pending.pop(msg_id, None)
+        if pending is None:
+            self.stray_acks += 1
+            return True
+        now = self.clock()
+        # an ack for an earlier attempt: its send time is no longer known
+        if attempt == pending.attempts:
+            self.rtt.record((now - pending.last) * 1000)
+        completion_ms = (now - pending.first) * 1000
+        self.completion.record(completion_ms)
+        self.acked += 1
+        if self.on_result is not None:
+            self.on_result(msg_id, pending.command, completion_ms)
+        return True
+
+    def check(self, now: float = None) -> float:
+        """Retransmit or give up what timed out; returns s to the next deadline."""
+        if now is None:
+            now = self.clock()
+        timeout = self.timeout_ms / 1000
+        next_due = None
+        for msg_id, pending in list(self._pending.items()):
+            due = pending.last + timeout
+            if due <= now:
+                if pending.attempts >= self.max_attempts:
+                    del self._pending[msg_id]
+                    self.failed += 1
+                    if self.on_result is not None:
+                        self.on_result(msg_id, pending.command, None)
+                    continue
+                self.retransmits += 1
+                self._attempt(msg_id, pending, now)
+                due = now + timeout
+            if next_due is None or due < next_due:
+                next_due = due
+        return None if next_due is None else next_due - now
+
+    async def run(self) -> None:
+        """Retransmit until cancelled; idle while nothing is pending."""
+        self._wakeup = asyncio.Event()
+        while True:
+            delay = self.check()
+            self._wakeup.clear()
+            if delay is None:
+                await self._wakeup.wait()
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    def summary(self) -> str:
+        rtt = self.rtt.snapshot()
+        done = self.completion.snapshot()
+        return (
+            f"Commands: {self.submitted} sent, {self.acked} acked, "
+            f"{self.failed} failed, {self.pending} pending, "
+            f"{self.retransmits} retransmits | "
+            f"rtt p50={rtt['p50']:.1f} p99={rtt['p99']:.1f} max={rtt['max']:.1f} ms, "
+            f"completion p99={done['p99']:.1f} max={done['max']:.1f} ms"
+        )
+
+
+class CommandReceiver:
+    """Drone side: acks every command copy, delivers each id once.
+
+    ``reply(sender, text)`` sends one message text to ``sender`` only;
+    ``on_command(sender, command, delivery_ms)`` gets each new command.
+    ``retry_window_ms`` must cover the senders' ``timeout_ms * max_attempts``.
+    """
+
+    def __init__(self, reply, on_command=None, retry_window_ms=RETRY_WINDOW_MS):
+        self.reply = reply
+        self.on_command = on_command
+        self.retry_window_ms = retry_window_ms
+        self.delivery = Histogram()
+        self.received = 0
+        self.delivered = 0
+        self.duplicates = 0
+        self.bad = 0
+        self._inboxes = {}  # (sender, session) -> _Inbox
+        self._swept_ms = None
+
+    def receive(self, sender: str, text: str, now_ms: float = None) -> bool:
+        """Take one incoming message text; returns whether it was a command."""
+        if not text.startswith(COMMAND + " "):
+            return False
+        parts = text.split(" ", 5)
+        try:
+            session, msg_id, attempt, sent_ms = (
+                parts[1],
+                int(parts[2]),
+                int(parts[3]),
+                int(parts[4]),
+            )
+            command = parts[5]
+        except (IndexError, ValueError):
+            self.bad += 1
+            return True
+        self.received += 1
+        self.reply(sender, f"{ACK} {session} {msg_id} {attempt}")
+        if now_ms is None:
+            now_ms = time.time() * 1000
+        self._sweep(now_ms)
+        inbox = self._inboxes.get((sender, session))
+        if inbox is None:
+            inbox = self._inboxes[(sender, session)] = _Inbox(now_ms)
+        inbox.active_ms = now_ms
+        if inbox.seen(msg_id):
+            self.duplicates += 1
+            return True
+        inbox.add(msg_id, sent_ms, self.retry_window_ms)
+        delivery_ms = now_ms - sent_ms
+        self.delivery.record(delivery_ms)
+        self.delivered += 1
+        if self.on_command is not None:
+            self.on_command(sender, command, delivery_ms)
+        return True
+
+    def _sweep(self, now_ms: float) -> None:
+        """Forget idle sessions, at most once per retry window."""
+        swept_ms = self._swept_ms
+        if swept_ms is not None and now_ms - swept_ms < self.retry_window_ms:
+            return
+        self._swept_ms = now_ms
+        idle_ms = INBOX_IDLE * self.retry_window_ms
+        for key, inbox in list(self._inboxes.items()):
+            if now_ms - inbox.active_ms > idle_ms:
+                del self._inboxes[key]
+
+    def summary(self) -> str:
+        snap = self.delivery.snapshot()
+        return (
+            f"Commands: {self.delivered} delivered, {self.duplicates} duplicates, "
+            f"{self.bad} malformed | delivery p50={snap['p50']:.1f} "
+            f"p99={snap['p99']:.1f} max={snap['max']:.1f} ms"
+        )
@@ -1,104 +1,126 @@
 import asyncio
 import json
+import os
+import sys
 import uuid
-import websockets
-from aiortc import RTCPeerConnection, RTCSessionDescription
+from aiortc import RTCPeerConnection
 from aiortc.exceptions import InvalidStateError
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.janus_supervisor import JanusSupervisor
+from common.textroom import negotiate_textroom
+from text.command_channel import CommandSender
+from text.presence import PresenceRegistry
+
 JANUS_WS = "ws://localhost:8188"
 ROOM_ID = 1234
 USERNAME = "pult"
+DRONE_PREFIX = "drone"  # usernames of drones in the room
+DRONE_TIMEOUT = 10.0  # s to wait for a drone after joining
+REPORT_INTERVAL = 10.0  # s between command summaries, when there was traffic
 
 
 async def connect_to_janus():
+    pc = handle = channel = joining = None
 
-    async with websockets.connect(JANUS_WS, subprotocols=["janus-protocol"]) as ws:
-        print("[PULT] Connected to Janus WebSocket")
-
-        await ws.send(json.dumps({"janus": "create", "transaction": str(uuid.uuid4())}))
-        session_id = json.loads(await ws.recv())["data"]["id"]
-        print(f"[PULT] Session created: {session_id}")
-
-        transaction_id = str(uuid.uuid4())
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "attach",
-                    "plugin": "janus.plugin.textroom",
-                    "session_id": session_id,
-                    "transaction": transaction_id,
-                }
-            )
-        )
+    def send_text(text):
+        payload = {
+            "textroom": "message",
+            "transaction": str(uuid.uuid4()),
+            "room": ROOM_ID,
+            "text": text,
+            "ack": False,
+        }
+        try:
+            channel.send(json.dumps(payload))
+        except (AttributeError, InvalidStateError):
+            print("[ERROR] DataChannel not ready")
+
+    def on_result(msg_id, command, completion_ms):
+        if completion_ms is None:
+            print(f"[PULT] #{msg_id} not acknowledged, gave up: {command}")
+        else:
+            print(f"[PULT] #{msg_id} acknowledged in {completion_ms:.1f} ms")
 
-        handle_id = json.loads(await ws.recv())["data"]["id"]
-        print(f"[PULT] Plugin attached: {handle_id}")
-
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "message",
-                    "body": {"request": "setup"},
-                    "session_id": session_id,
-                    "handle_id": handle_id,
-                    "transaction": str(uuid.uuid4()),
-                }
+    commands = CommandSender(send_text, on_result=on_result)
+
+    def on_presence(participant, online):
+        if online:
+            print(
+                f"[PULT] {participant.username} online "
+                f"(after {participant.online_ms:.0f} ms)"
             )
-        )
+        else:
+            print(f"[PULT] {participant.username} left the room")
 
-        jsep = None
-        while True:
-            msg = json.loads(await ws.recv())
-            if "jsep" in msg:
-                jsep = msg["jsep"]
-                break
+    presence = PresenceRegistry(on_presence)
 
+    async def setup(janus):
+        nonlocal pc, handle, channel, joining
+        if pc is not None:
+            await pc.close()
         pc = RTCPeerConnection()
         data_channel = pc.createDataChannel("JanusDataChannel")
-        data_channel.last_participants = []
+        opened = asyncio.get_running_loop().create_future()
+
+        @pc.on("connectionstatechange")
+        def on_state():
+            if pc.connectionState == "failed":
+                supervisor.fail()
 
         @data_channel.on("open")
         def on_open():
             print("[PULT] DataChannel opened")
-            asyncio.create_task(join_and_wait_for_drone(data_channel))
+            nonlocal joining
+            joining = asyncio.create_task(
+                join_and_wait_for_drone(data_channel, presence)
+            )
+            opened.set_result(None)
 
         @data_channel.on("message")
         def on_message(msg):
             try:
                 data = json.loads(msg)
-                print(data)
-                if data.get("textroom") == "message":
-                    print(f"[{data['from']}]: {data['text']}")
-
-                elif data.get("textroom") == "success":
-                    print("[PULT] Successfully joined the room")
-                    if "participants" in data:
-                        data_channel.last_participants = data["participants"]
-            except Exception:
+            except ValueError:
                 print(f"[PULT][MSG] {msg}")
-
-        await pc.setRemoteDescription(RTCSessionDescription(jsep["sdp"], jsep["type"]))
-        answer = await pc.createAnswer()
-        await pc.setLocalDescription(answer)
-
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "message",
-                    "body": {},
-                    "jsep": {"type": "answer", "sdp": pc.localDescription.sdp},
-                    "session_id": session_id,
-                    "handle_id": handle_id,
-                    "transaction": str(uuid.uuid4()),
-                }
-            )
-        )
-
-        while True:
-            await asyncio.sleep(1)
-
-
-async def join_and_wait_for_drone(channel):
+                return
+            kind = data.get("textroom")
+            if kind == "message":
+                if not commands.receive(data.get("text", "")):
+                    print(f"[{data.get('from')}]: {data.get('text')}")
+            elif presence.handle(data, ROOM_ID):
+                if kind == "success":
+                    print("[PULT] Successfully joined the room")
+            elif kind == "error":
+                code, error = data.get("error_code"), data.get("error")
+                print(f"[PULT] TextRoom error {code}: {error}")
+
+        handle = await negotiate_textroom(janus, pc, handle)
+        print(f"[PULT] Plugin attached: {handle.id}")
+        await opened
+        channel = data_channel
+
+    supervisor = JanusSupervisor(JANUS_WS, setup, "[PULT] ")
+    supervised = asyncio.create_task(supervisor.run())
+    retransmitting = asyncio.create_task(commands.run())
+    reporting = asyncio.create_task(report_loop(commands))
+    try:
+        await supervisor.ready.wait()
+        await joining
+        # one stdin reader for the whole run; commands go on the current channel
+        await read_and_send(commands)
+    finally:
+        print(f"[PULT] {commands.summary()}")
+        supervised.cancel()
+        retransmitting.cancel()
+        reporting.cancel()
+        await supervisor.close()
+        if pc is not None:
+            await pc.close()
+
+
+async def join_and_wait_for_drone(channel, presence):
 
     join_msg = {
         "textroom": "join",
@@ -111,34 +133,42 @@ async def join_and_wait_for_drone(channel):
 
     print("[PULT] Sent JOIN, waiting for drone...")
 
-    for _ in range(10):
-        await asyncio.sleep(1)
-        if any(p.get("username") == "drone" for p in channel.last_participants):
-            print("[PULT] Drone has joined the room!")
-            break
-    else:
+    try:
+        drone = await presence.wait_for(
+            lambda p: p.username.startswith(DRONE_PREFIX), ROOM_ID, DRONE_TIMEOUT
+        )
+    except asyncio.TimeoutError:
         print("[PULT] ⚠️ Drone did not join in time")
-
-    asyncio.create_task(read_and_send(channel))
+        return
+    drones = [
+        p.username
+        for p in presence.participants(ROOM_ID)
+        if p.username.startswith(DRONE_PREFIX)
+    ]
+    print(f"[PULT] Drone has joined the room! ({drone.username}; online: {drones})")
 
 
-async def read_and_send(channel):
+async def read_and_send(commands):
     while True:
-        msg = await asyncio.get_event_loop().run_in_executor(None, input, "")
+        try:
+            msg = await asyncio.get_event_loop().run_in_executor(None, input, "")
+        except EOFError:
+            return
         if not msg.strip():
             continue
+        msg_id = commands.submit(msg)
+        print(f"[PULT] Sent #{msg_id}: {msg}")
 
-        payload = {
-            "textroom": "message",
-            "transaction": str(uuid.uuid4()),
-            "room": ROOM_ID,
-            "text": msg,
-        }
-        try:
-            channel.send(json.dumps(payload))
-            print(f"[PULT] Sent: {msg}")
-        except InvalidStateError:
-            print("[ERROR] DataChannel not ready")
+
+async def report_loop(commands):
+    reported = None
+    while True:
+        await asyncio.sleep(REPORT_INTERVAL)
+        state = (commands.submitted, commands.acked, commands.failed)
+        if state != reported:
+            print(f"[PULT] {commands.summary()}")
+            reported = state
 
 
-asyncio.run(connect_to_janus())
+if __name__ == "__main__":
+    asyncio.run(connect_to_janus())
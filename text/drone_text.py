@@ -1,65 +1,56 @@
 import asyncio
 import json
+import os
+import sys
 import uuid
-import websockets
-import time  
-from datetime import datetime 
-from aiortc import RTCPeerConnection, RTCSessionDescription
+from aiortc import RTCPeerConnection
+from aiortc.exceptions import InvalidStateError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.janus_supervisor import JanusSupervisor
+from common.textroom import negotiate_textroom
+from text.command_channel import CommandReceiver
 
 JANUS_WS = "ws://localhost:8188"
 ROOM_ID = 1234
 USERNAME = "drone"
+REPORT_INTERVAL = 10.0  # s between command summaries, when there was traffic
 
 
 async def connect_to_janus():
-    async with websockets.connect(JANUS_WS, subprotocols=["janus-protocol"]) as ws:
-        print("[DRONE] Connected to Janus WebSocket")
-
-        create_tx = str(uuid.uuid4())
-        await ws.send(json.dumps({"janus": "create", "transaction": create_tx}))
-        response = json.loads(await ws.recv())
-        session_id = response["data"]["id"]
-        print(f"[DRONE] Session created: {session_id}")
-
-        attach_tx = str(uuid.uuid4())
-
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "attach",
-                    "plugin": "janus.plugin.textroom",
-                    "session_id": session_id,
-                    "transaction": attach_tx,
-                }
-            )
-        )
-
-        response = json.loads(await ws.recv())
-        handle_id = response["data"]["id"]
-        print(f"[DRONE] Plugin attached: {handle_id}")
-
-        setup_tx = str(uuid.uuid4())
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "message",
-                    "body": {"request": "setup"},
-                    "session_id": session_id,
-                    "handle_id": handle_id,
-                    "transaction": setup_tx,
-                }
-            )
-        )
+    pc = handle = channel = None
+
+    def reply(sender, text):
+        payload = {
+            "textroom": "message",
+            "room": ROOM_ID,
+            "text": text,
+            "to": sender,
+            "ack": False,
+            "transaction": str(uuid.uuid4()),
+        }
+        try:
+            channel.send(json.dumps(payload))
+        except (AttributeError, InvalidStateError):
+            pass  # the pult retransmits
 
-        jsep = None
-        while True:
-            msg = json.loads(await ws.recv())
-            if msg.get("janus") == "event" and "jsep" in msg:
-                jsep = msg["jsep"]
-                break
+    def on_command(sender, command, delivery_ms):
+        print(f"[DRONE] Command from [{sender}]: {command}  | {delivery_ms:.1f} ms")
 
+    commands = CommandReceiver(reply, on_command)
+
+    async def setup(janus):
+        nonlocal pc, handle, channel
+        if pc is not None:
+            await pc.close()
         pc = RTCPeerConnection()
-        data_channel = pc.createDataChannel("JanusDataChannel")
+        data_channel = channel = pc.createDataChannel("JanusDataChannel")
+
+        @pc.on("connectionstatechange")
+        def on_state():
+            if pc.connectionState == "failed":
+                supervisor.fail()
 
         joined = asyncio.Event()
 
@@ -78,57 +69,28 @@ async def connect_to_janus():
 
         @data_channel.on("message")
         def on_message(raw_msg):
-            # Print raw message
             try:
                 data = json.loads(raw_msg)
-                pretty = json.dumps(data, ensure_ascii=False, indent=3)
-                print("[DRONE] Received via DataChannel:", pretty)
-            except json.JSONDecodeError:
+            except ValueError:
                 print(f"[DRONE] Received via DataChannel: {raw_msg}")
                 return
 
-            if data.get("textroom") == "message":
-                sender = data.get("from")
-                text = data.get("text")
-
-                date_str = data.get("date")
-                latency_info = ""
-                if date_str:
-                    if date_str[-5] in ["+", "-"] and ":" not in date_str[-5:]:
-                        date_str = date_str[:-5] + date_str[-5:-2] + ":" + date_str[-2:]
-                    dt = datetime.fromisoformat(date_str)
-                    sent_ms = dt.timestamp() * 1000
-                    now_ms = time.time() * 1000
-                    latency_ms = now_ms - sent_ms
-                    latency_info = f"  | latency {latency_ms:.2f} ms"
-
-                print(f"[DRONE] Message from [{sender}]: {text}{latency_info}")
-
-            elif data.get("textroom") == "success" and "participants" in data:
-                print(
-                    f"[DRONE] Successfully joined, current participants: {data['participants']}"
-                )
+            kind = data.get("textroom")
+            if kind == "message":
+                sender, text = data.get("from"), data.get("text", "")
+                if not commands.receive(sender, text):
+                    print(f"[DRONE] Message from [{sender}]: {text}")
+            elif kind == "success" and "participants" in data:
+                names = [p.get("username") for p in data["participants"]]
+                print(f"[DRONE] Successfully joined, current participants: {names}")
                 joined.set()
-            elif data.get("textroom") == "event" and data.get("error_code"):
+            elif kind == "event" and data.get("error_code"):
                 print(f"[DRONE] TextRoom error {data['error_code']}: {data['error']}")
-            elif data.get("textroom") == "leave":
+            elif kind == "leave":
                 print(f"[DRONE] Participant left the room: {data.get('username')}")
 
-        await pc.setRemoteDescription(RTCSessionDescription(jsep["sdp"], jsep["type"]))
-        answer = await pc.createAnswer()
-        await pc.setLocalDescription(answer)
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "message",
-                    "body": {},
-                    "jsep": {"type": "answer", "sdp": pc.localDescription.sdp},
-                    "session_id": session_id,
-                    "handle_id": handle_id,
-                    "transaction": str(uuid.uuid4()),
-                }
-            )
-        )
+        handle = await negotiate_textroom(janus, pc, handle)
+        print(f"[DRONE] Plugin attached: {handle.id}")
         print("[DRONE] WebRTC answer sent, awaiting join confirmation...")
 
         try:
@@ -150,8 +112,27 @@ async def connect_to_janus():
                 "[DRONE] Join confirmation not received in time, cancelling auto response"
             )
 
-        while True:
-            await asyncio.sleep(1)
-
-
-asyncio.run(connect_to_janus())
+    supervisor = JanusSupervisor(JANUS_WS, setup, "[DRONE] ")
+    reporting = asyncio.create_task(report_loop(commands))
+    try:
+        await supervisor.run()
+    finally:
+        reporting.cancel()
+        print(f"[DRONE] {commands.summary()}")
+        await supervisor.close()
+        if pc is not None:
+            await pc.close()
+
+
+async def report_loop(commands):
+    reported = None
+    while True:
+        await asyncio.sleep(REPORT_INTERVAL)
+        state = (commands.received, commands.bad)
+        if state != reported:
+            print(f"[DRONE] {commands.summary()}")
+            reported = state
+
+
+if __name__ == "__main__":
+    asyncio.run(connect_to_janus())
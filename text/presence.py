@@ -0,0 +1,144 @@
+"""Who is in which TextRoom room, kept from the plugin's own events.
+
+``PresenceRegistry.handle()`` takes every parsed message from the TextRoom
+data channel. Presence changes come from three of them:
+
+* ``success`` with ``participants``: the answer to our own join, listing
+  everyone already in the room. It replaces what was known about that room,
+  so after a reconnect and rejoin anyone missing from the list has left;
+* ``join`` and ``leave`` events for other participants;
+* ``destroyed``: the room is gone, and so is everyone in it.
+
+Janus does not name the room in a join's ``success``, so ``handle()`` takes
+the room we joined as ``room``.
+
+``wait_for()`` resolves as soon as a matching participant is online (at
+once if one already is), from inside ``handle()``; nothing polls. Each
+``Participant`` records ``online_ms``: how long it took to show up, counted
+from the registry's creation for its first appearance and from its last
+``leave`` for later ones. ``online_time`` collects the same values.
+"""
+
+import asyncio
+import time
+
+from common.latency_stats import Histogram
+
+
+class Participant:
+    __slots__ = ("room", "username", "display", "since", "online_ms", "joins")
+
+    def __init__(self, room, username: str, display, since: float, online_ms):
+        self.room = room
+        self.username = username
+        self.display = display
+        self.since = since  # clock() when last seen joining
+        self.online_ms = online_ms
+        self.joins = 1
+
+
+def _matcher(match):
+    if callable(match):
+        return match
+    return lambda participant: participant.username == match
+
+
+class PresenceRegistry:
+    """Participants per room; ``on_change(participant, online)`` on each change.
+
+    ``match`` arguments are a username or a predicate on ``Participant``.
+    """
+
+    def __init__(self, on_change=None, clock=time.monotonic):
+        self.on_change = on_change
+        self.clock = clock
+        self.started = clock()
+        self.online_time = Histogram()
+        self._rooms = {}  # room -> {username: Participant}
+        self._left = {}  # (room, username) -> (clock() at leave, Participant)
+        self._waiters = []  # (room or None, match, future)
+
+    def participants(self, room=None) -> list:
+        """Online participants of ``room``, or of every room."""
+        if room is not None:
+            return list(self._rooms.get(room, {}).values())
+        return [p for members in self._rooms.values() for p in members.values()]
+
+    def find(self, match, room=None):
+        """The first online participant matching ``match``, or None."""
+        match = _matcher(match)
+        return next((p for p in self.participants(room) if match(p)), None)
+
+    async def wait_for(self, match, room=None, timeout: float = None) -> Participant:
+        """Wait until a participant matching ``match`` is online and return it.
+
+        Raises ``asyncio.TimeoutError`` after ``timeout`` seconds.
+        """
+        found = self.find(match, room)
+        if found is not None:
+            return found
+        future = asyncio.get_running_loop().create_future()
+        waiter = (room, _matcher(match), future)
+        self._waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def handle(self, data: dict, room=None) -> bool:
+        """Take one TextRoom message; returns whether it was about presence."""
+        kind = data.get("textroom")
+        room = data.get("room", room)
+        if kind == "join":
+            self._online(room, data.get("username"), data.get("display"))
+        elif kind == "leave":
+            self._offline(room, data.get("username"))
+        elif kind == "success" and "participants" in data:
+            listed = {p.get("username"): p for p in data["participants"]}
+            for username in list(self._rooms.get(room, {})):
+                if username not in listed:
+                    self._offline(room, username)
+            for username, p in listed.items():
+                self._online(room, username, p.get("display"))
+        elif kind == "destroyed":
+            for username in list(self._rooms.get(room, {})):
+                self._offline(room, username)
+        else:
+            return False
+        return True
+
+    def _online(self, room, username, display) -> None:
+        members = self._rooms.setdefault(room, {})
+        if username is None or username in members:
+            return
+        now = self.clock()
+        left = self._left.pop((room, username), None)
+        if left is None:
+            participant = Participant(
+                room, username, display, now, (now - self.started) * 1000
+            )
+        else:
+            left_at, participant = left
+            participant.display = display
+            participant.since = now
+            participant.online_ms = (now - left_at) * 1000
+            participant.joins += 1
+        members[username] = participant
+        self.online_time.record(participant.online_ms)
+        if self.on_change is not None:
+            self.on_change(participant, True)
+        for waiter in list(self._waiters):
+            waiter_room, match, future = waiter
+            if waiter_room in (None, room) and match(participant):
+                self._waiters.remove(waiter)
+                if not future.done():
+                    future.set_result(participant)
+
+    def _offline(self, room, username) -> None:
+        participant = self._rooms.get(room, {}).pop(username, None)
+        if participant is None:
+            return
+        self._left[(room, username)] = (self.clock(), participant)
+        if self.on_change is not None:
+            self.on_change(participant, False)
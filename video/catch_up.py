@@ -0,0 +1,144 @@
+"""Latency-bounded playback: jump the pult's video back to live.
+
+Each decoded frame's lag is how much later it arrived than the stream's
+own timing says it should have:
+
+    lag = (arrival - pts) - min(arrival - pts seen so far)
+
+so the best-placed frame since the stream (re)started defines live, and the
+two hosts' clocks never get compared. Once a frame's lag passes
+``budget_ms``, the receiver jumps: it stops spending conversion and
+rendering on the backlog.
+
+* ``NEWEST``: every decoded frame already queued on the track is taken off
+  it at once and only the newest one goes on to the pipeline, whose own
+  queued frames are discarded too; with nothing queued, the late frame
+  itself is the newest and is shown. For one more ``budget_ms`` after the
+  jump, frames still over budget are skipped while they are catching up,
+  i.e. each lags less than the one before: they are the rest of the backlog,
+  coming out of aiortc's decoder faster than real time. A late frame that
+  is not catching up is shown;
+* ``KEYFRAME``: frames are skipped until the next keyframe, which is shown.
+  Useful when a burst left the picture smeared and the next clean frame is
+  worth waiting for.
+
+A frame still over budget when the skipping ends, ``budget_ms`` or more
+after the jump, means the link itself got slower, not that frames queued
+up. That frame becomes the new live reference and is shown, so a lasting
+latency change costs one jump, not a frozen picture. Decoding
+happens in aiortc before frames reach the receiver and cannot be skipped
+here.
+
+``catch_ups`` counts the jumps and ``skipped`` the frames not shown;
+``lag`` holds the lag that triggered each jump.
+"""
+
+import asyncio
+
+from common.latency_stats import Histogram
+
+NEWEST = "newest"
+KEYFRAME = "keyframe"
+CATCH_UP_MODES = (NEWEST, KEYFRAME)
+DEFAULT_BUDGET_MS = 250.0
+CATCHING_UP_MS = 1.0  # less lag than the frame before, beyond clock noise
+
+
+def drain_track(track) -> list:
+    """Take every frame already queued on an aiortc remote track, oldest first."""
+    frames = []
+    queue = getattr(track, "_queue", None)
+    if queue is None:
+        return frames
+    while True:
+        try:
+            frame = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return frames
+        if frame is None:  # end of stream: leave it for recv()
+            queue.put_nowait(None)
+            return frames
+        frames.append(frame)
+
+
+class CatchUp:
+    def __init__(self, budget_ms: float = DEFAULT_BUDGET_MS, mode: str = NEWEST):
+        if mode not in CATCH_UP_MODES:
+            raise ValueError(f"unknown catch-up mode {mode!r}")
+        if budget_ms <= 0:
+            raise ValueError(f"lag budget must be positive, got {budget_ms}")
+        self.budget_ms = budget_ms
+        self.mode = mode
+        self.catch_ups = 0
+        self.skipped = 0
+        self.lag = Histogram()
+        self._offset = None  # lowest arrival - pts, s
+        self._awaiting_key = False
+        self._jumped_at = None  # arrival time of the frame that triggered the jump
+        self._prev_lag = 0.0  # ms, of the frame before
+
+    def reset(self) -> None:
+        """Forget the live reference, e.g. for a new peer connection."""
+        self._offset = None
+        self._awaiting_key = False
+        self._jumped_at = None
+        self._prev_lag = 0.0
+
+    def lag_ms(self, arrival: float, pts_seconds: float) -> float:
+        offset = arrival - pts_seconds
+        if self._offset is None or offset < self._offset:
+            self._offset = offset
+        return (offset - self._offset) * 1000
+
+    def _resume(self, frame, late: bool, arrival: float, pts_seconds: float):
+        if late and (arrival - self._jumped_at) * 1000 >= self.budget_ms:
+            self._offset = arrival - pts_seconds
+        self._jumped_at = None
+        return frame
+
+    def select(self, frame, arrival: float, pts_seconds: float, track=None):
+        """The frame to show in place of ``frame``, or None to show nothing.
+
+        ``track`` is drained of its queued frames on a ``NEWEST`` jump.
+        """
+        lag_ms = self.lag_ms(arrival, pts_seconds)
+        late = lag_ms > self.budget_ms
+        catching_up = lag_ms < self._prev_lag - CATCHING_UP_MS
+        self._prev_lag = lag_ms
+        if self._awaiting_key:
+            if not frame.key_frame:
+                self.skipped += 1
+                return None
+            self._awaiting_key = False
+            return self._resume(frame, late, arrival, pts_seconds)
+        if self._jumped_at is not None:
+            if late and (arrival - self._jumped_at) * 1000 < self.budget_ms:
+                if not catching_up:
+                    return frame
+                self.skipped += 1
+                return None
+            return self._resume(frame, late, arrival, pts_seconds)
+        if not late:
+            return frame
+        self.catch_ups += 1
+        self.lag.record(lag_ms)
+        self._jumped_at = arrival
+        if self.mode == KEYFRAME:
+            if frame.key_frame:
+                return self._resume(frame, late, arrival, pts_seconds)
+            self._awaiting_key = True
+            self.skipped += 1
+            return None
+        queued = drain_track(track) if track is not None else []
+        if not queued:  # nothing behind it: this late frame is the newest
+            return frame
+        self.skipped += len(queued)  # the frame in hand and all but the newest
+        return queued[-1]
+
+    def summary(self) -> str:
+        snap = self.lag.snapshot()
+        return (
+            f"Catch-up ({self.mode}, {self.budget_ms:g} ms): {self.catch_ups} "
+            f"jumps, {self.skipped} frames skipped, lag at jump "
+            f"p50={snap['p50']:.1f} max={snap['max']:.1f} ms"
+        )
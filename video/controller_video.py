@@ -1,8 +1,7 @@
 #!/usr/bin/env python3
 import asyncio
-import json
-import uuid
-import websockets
+import dataclasses
+import aiohttp
 from aiortc import RTCPeerConnection, RTCSessionDescription
 import time
 
@@ -19,192 +18,543 @@ except ImportError:
             pass
 
 
-import pygame
-import cv2
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import phase_timer
+from common.janus_client import JanusClient, JanusError, JanusHandle
+from common.janus_supervisor import JanusSupervisor
+from common.latency_stats import Histogram, LatencyStats, StatsReporter
+from crsf_commands.crsf_receiver import CrsfReceiver
+from video.catch_up import DEFAULT_BUDGET_MS, NEWEST, CatchUp
+from video.frame_pipeline import FramePipeline
+from video.osd import OSD_INTERVAL, Osd, stream_lines
+from video.passthrough_recorder import PassthroughRecorder, tap_receiver
+from video.rate_control import ReceiverReport
+from video.tiled_display import TiledDisplay
 
 JANUS_WS = "ws://127.0.0.1:8188"
 STREAM_ID = 1001  
-KEEPALIVE_INTERVAL = 30  
-
-
-async def run_pult(video_filename: str) -> None:
-    """Connect to Janus and receive video with latency measurement."""
-
-    stream_start = None
-    first_frame = True
-
-    async with websockets.connect(JANUS_WS, subprotocols=["janus-protocol"]) as ws:
-        print("[PULT] Connected to Janus WebSocket")
-
+RECORD_PASSTHROUGH = "passthrough"
+RECORD_REENCODE = "reencode"
+STATS_INTERVAL = 5
+# drone_video's control API; receiver reports drive its rate controller
+DRONE_CONTROL_URL = "http://127.0.0.1:8090"
+FEEDBACK_INTERVAL = 1.0
+VIDEO_STATS = ("latency", "jitter", "decode", "render")
+# Planning limit for run_multi_pult at 720p30 H.264; over it only warns.
+# bench/stream_cost.py measures per frame on one core: ~3.4 ms decode,
+# ~0.6 ms YUV->BGR, ~0.5 ms scaling into a 640x360 tile; with ~1 ms of
+# RTP/SRTP handling in aiortc (an estimate, not measured) that is ~5.5 ms,
+# ~16% of a core per stream. Four streams keep one core under ~75% with
+# headroom for the event loop; at 1080p30 (~11 ms/frame) halve it.
+MAX_STREAMS_PER_CORE = 4
+
+
+async def watch_stream(janus: JanusClient, stream_id):
+    """Attach a streaming handle and watch ``stream_id``; returns (handle, offer)."""
+    handle = await janus.attach("janus.plugin.streaming")
+    print(f"[PULT] Streaming plugin attached: {handle.id}")
+
+    event = await handle.call({"request": "watch", "id": stream_id})
+    print(f"[PULT] Received JSEP offer for stream {stream_id}")
+    return handle, event["jsep"]
+
+
+async def start_stream(handle: JanusHandle, answer) -> None:
+    await handle.call({"request": "start"}, jsep=answer)
+
+
+async def open_stream(janus: JanusClient, receiver: "StreamReceiver") -> None:
+    """Watch and negotiate ``receiver``'s mountpoint; returns on the first frame."""
+    old = receiver.handle
+    if old is not None and old.id in janus.handles:
+        try:
+            await old.detach()
+        except JanusError:
+            pass
+    receiver.handle, jsep_offer = await watch_stream(janus, receiver.stream_id)
+    await start_stream(receiver.handle, await receiver.answer(jsep_offer))
+    phase_timer.mark("sdp")
+    await receiver.first_frame
 
-        transaction = str(uuid.uuid4())
-        await ws.send(json.dumps({"janus": "create", "transaction": transaction}))
-        reply = json.loads(await ws.recv())
-        if reply.get("janus") != "success" or reply.get("transaction") != transaction:
-            raise RuntimeError(f"Failed to create session: {reply}")
-        session_id = reply["data"]["id"]
 
-        print(f"[PULT] Session created: {session_id}")
+def stream_setup(receivers):
+    """JanusSupervisor setup that (re)opens every receiver not currently connected."""
 
+    async def setup(janus: JanusClient) -> None:
+        await asyncio.gather(
+            *(open_stream(janus, r) for r in receivers if not r.connected)
+        )
 
-        transaction = str(uuid.uuid4())
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "attach",
-                    "session_id": session_id,
-                    "plugin": "janus.plugin.streaming",
-                    "transaction": transaction,
-                }
-            )
+    return setup
+
+
+class StreamReceiver:
+    """Receives, measures, shows and records one mountpoint's video.
+
+    Owns the peer connection, latency stats, recorder and frame pipeline for
+    a single stream; ``display`` lets several receivers share one window.
+    With a ``feedback_url`` it posts a ReceiverReport (p95 latency, loss,
+    jitter, fps) there every FEEDBACK_INTERVAL for the drone's rate control.
+    CRSF packets the drone sends to the mountpoint's data port arrive on the
+    same peer connection's data channel and are decoded by ``control``, drone
+    telemetry into ``control.telemetry``. With ``catch_up`` (a
+    ``video.catch_up`` mode, or None to show every frame) the receiver jumps
+    back to live when a frame lags more than ``lag_budget_ms`` with a
+    backlog behind it. With ``osd`` the window (or tile) shows an overlay of
+    fps, latency, loss and the latest telemetry, refreshed every
+    OSD_INTERVAL.
+
+    ``start()`` brings up the long-lived parts once; each ``answer()``
+    negotiates a fresh peer connection, so a stream can be reopened after a
+    reconnect without closing its window, stats or recording. ``on_failed``
+    is called if the peer connection fails.
+    """
+
+    def __init__(
+        self,
+        stream_id,
+        video_filename,
+        record_mode=RECORD_PASSTHROUGH,
+        stats_path=None,
+        stats_interval=STATS_INTERVAL,
+        on_quit=None,
+        display=None,
+        prefix="[PULT] ",
+        feedback_url=None,
+        catch_up=NEWEST,
+        lag_budget_ms=DEFAULT_BUDGET_MS,
+        osd=True,
+    ):
+        self.stream_id = stream_id
+        self.prefix = prefix
+        self.feedback_url = feedback_url
+        self._feedback_task = None
+        self._control_task = None
+        self._osd_task = None
+        self.control = CrsfReceiver()
+        self.osd = Osd() if osd else None
+        self._osd_latency = Histogram()
+        self.catch_up = None
+        if catch_up is not None:
+            self.catch_up = CatchUp(lag_budget_ms, catch_up)
+        self.stats_interval = stats_interval
+        self._feedback_latency = Histogram()
+        self._frames = 0
+        self.frames_total = 0
+        self._received_bytes = 0
+        self.pc = None
+        self.handle = None
+        self.first_frame = None
+        self.on_failed = None
+        self.stats = LatencyStats(VIDEO_STATS)
+        self.reporter = StatsReporter(
+            self.stats, stats_interval, stats_path, prefix=prefix
         )
-        reply = json.loads(await ws.recv())
-        if reply.get("janus") != "success" or reply.get("transaction") != transaction:
-            raise RuntimeError(f"Failed to attach to plugin: {reply}")
-        handle_id = reply["data"]["id"]
-
-        print(f"[PULT] Streaming plugin attached: {handle_id}")
-
-        transaction = str(uuid.uuid4())
-
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "message",
-                    "session_id": session_id,
-                    "handle_id": handle_id,
-                    "body": {"request": "watch", "id": STREAM_ID},
-                    "transaction": transaction,
-                }
-            )
+        self.recorder = None
+        if display is not None:
+            display = display.input(len(display.inputs), self.stats, self.osd)
+        if record_mode == RECORD_PASSTHROUGH:
+            self.recorder = PassthroughRecorder(video_filename)
+            video_filename = None
+        self.pipeline = FramePipeline(
+            video_filename,
+            on_quit=on_quit,
+            stats=self.stats,
+            display=display,
+            osd=self.osd,
+        )
+        self.stream_start = None
+        # pts -> time the encoded frame was handed to the decoder
+        self._encoded_at = {}
+
+    @property
+    def connected(self) -> bool:
+        return (
+            self.handle is not None
+            and self.handle.id in self.handle.client.handles
+            and self.pc.connectionState not in ("failed", "closed")
         )
 
-        jsep_offer = None
-
-        while jsep_offer is None:
-            msg = json.loads(await ws.recv())
-            if msg.get("sender") == handle_id and "jsep" in msg:
-                jsep_offer = msg["jsep"]
-
-            elif msg.get("janus") == "keepalive":
-                continue
-            else:
-                print(f"[PULT] ↳ Other message: {msg}")
-        print("[PULT] Received JSEP offer from server")
-
-        pc = RTCPeerConnection()
-        pygame.init()
-        screen = None
-        video_writer = None
-
-        @pc.on("track")
-        def on_track(track):
-            nonlocal screen, video_writer, first_frame, stream_start
-
-            if track.kind != "video":
-                return
-
-            async def recv_video():
-                nonlocal screen, video_writer, first_frame, stream_start
-
-                while True:
-                    try:
-                        frame = await track.recv()
-                    except MediaStreamError:
-                        break
-
-                    pts_seconds = frame.pts * frame.time_base
-
-                    if first_frame:
-                        stream_start = time.time() - pts_seconds
-                        first_frame = False
-
-                        img = frame.to_ndarray(format="bgr24")
-                        surf = pygame.surfarray.make_surface(
-                            cv2.cvtColor(img, cv2.COLOR_BGR2RGB).swapaxes(0, 1)
-                        )
-                        screen = pygame.display.set_mode(surf.get_size())
-                        pygame.display.set_caption("Drone Video")
-                        h, w, _ = img.shape
-
-                        video_writer = cv2.VideoWriter(
-                            video_filename,
-                            cv2.VideoWriter_fourcc(*"mp4v"),
-                            15,
-                            (w, h),
-                        )
-                        print(f"[PULT] Recording video to file: {video_filename}")
-
-                    recv_time = time.time()
-                    latency_ms = (recv_time - (stream_start + pts_seconds)) * 1000
-                    print(f"[PULT] Video latency: {latency_ms:.2f} ms")
-
-                    img = frame.to_ndarray(format="bgr24")
-
-                    surf = pygame.surfarray.make_surface(
-                        cv2.cvtColor(img, cv2.COLOR_BGR2RGB).swapaxes(0, 1)
-                    )
-                    for event in pygame.event.get():
-                        if event.type == pygame.QUIT:
-                            pygame.quit()
-                            return
+    def start(self) -> None:
+        if self.recorder is not None:
+            self.recorder.start()
+        self.pipeline.start()
+        self.reporter.start()
+        if self.feedback_url is not None:
+            self._feedback_task = asyncio.create_task(self._feedback_loop())
+        self._control_task = asyncio.create_task(self._report_loop())
+        if self.osd is not None:
+            self._osd_task = asyncio.create_task(self._osd_loop())
+
+    async def answer(self, jsep_offer):
+        if self.pc is not None:
+            await self.pc.close()
+        self.pc = RTCPeerConnection()
+        self.pc.on("track", self._on_track)
+        self.pc.on("datachannel", self._on_datachannel)
+        self.pc.on("connectionstatechange", self._on_connection_state)
+        self.first_frame = asyncio.get_running_loop().create_future()
+        if self.catch_up is not None:
+            self.catch_up.reset()
+        if self.recorder is not None:
+            # the new connection's RTP timestamps start from a new base
+            self.recorder.rebase()
+
+        await self.pc.setRemoteDescription(
+            RTCSessionDescription(sdp=jsep_offer["sdp"], type=jsep_offer["type"])
+        )
+        answer = await self.pc.createAnswer()
+        await self.pc.setLocalDescription(answer)
+        return answer
+
+    async def close(self) -> None:
+        if self._feedback_task is not None:
+            self._feedback_task.cancel()
+        if self._control_task is not None:
+            self._control_task.cancel()
+        if self._osd_task is not None:
+            self._osd_task.cancel()
+        if self.pc is not None:
+            await self.pc.close()
+        await asyncio.to_thread(self.pipeline.stop)
+        await asyncio.to_thread(self.reporter.stop)
+        if self.recorder is not None:
+            await asyncio.to_thread(self.recorder.stop)
+
+    def _on_connection_state(self) -> None:
+        if self.pc.connectionState == "connected":
+            phase_timer.mark("ice")
+        if self.pc.connectionState == "failed" and self.on_failed is not None:
+            self.on_failed(f"Stream {self.stream_id}: peer connection failed")
+
+    def _on_encoded(self, data, pts) -> None:
+        phase_timer.mark("first_packet")
+        self._received_bytes += len(data)
+        if len(self._encoded_at) > 256:
+            self._encoded_at.clear()
+        self._encoded_at[pts] = time.perf_counter()
+
+    def _on_datachannel(self, channel) -> None:
+        @channel.on("message")
+        def on_message(msg):
+            if isinstance(msg, (bytes, bytearray)):
+                self.control.receive(msg, time.time() * 1000)
+
+    async def _report_loop(self) -> None:
+        reported = telemetry = catch_ups = 0
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            if self.catch_up is not None and self.catch_up.catch_ups != catch_ups:
+                catch_ups = self.catch_up.catch_ups
+                print(f"{self.prefix}{self.catch_up.summary()}")
+            if self.control.rtp.accepted != reported:
+                reported = self.control.rtp.accepted
+                print(f"{self.prefix}Control {self.control.summary()}")
+            if self.control.telemetry.frames != telemetry:
+                telemetry = self.control.telemetry.frames
+                print(f"{self.prefix}Control {self.control.telemetry.summary()}")
+
+    def _on_track(self, track) -> None:
+        if track.kind != "video":
+            return
+
+        for transceiver in self.pc.getTransceivers():
+            if transceiver.receiver.track is track:
+                tap_receiver(transceiver.receiver, self._on_encoded)
+                if self.recorder is not None:
+                    self.recorder.attach(transceiver.receiver)
+
+        asyncio.create_task(self._recv_video(track))
+
+    async def _recv_video(self, track) -> None:
+        stats = self.stats
+        last_arrival = last_pts = None
+
+        while True:
+            try:
+                frame = await track.recv()
+            except MediaStreamError:
+                break
+
+            decoded = time.perf_counter()
+            recv_time = time.time()
+            if not self.first_frame.done():
+                self.first_frame.set_result(None)
+            pts_seconds = float(frame.pts * frame.time_base)
+
+            if self.stream_start is None:
+                self.stream_start = recv_time - pts_seconds
+
+            latency_ms = (recv_time - (self.stream_start + pts_seconds)) * 1000
+            stats.record("latency", latency_ms)
+            self._feedback_latency.record(latency_ms)
+            self._osd_latency.record(latency_ms)
+            self._frames += 1
+            self.frames_total += 1
+            if last_arrival is not None:
+                transit = (recv_time - last_arrival) - (pts_seconds - last_pts)
+                stats.record("jitter", abs(transit) * 1000)
+            last_arrival, last_pts = recv_time, pts_seconds
+
+            queued = self._encoded_at.pop(frame.pts, None)
+            if queued is not None:
+                stats.record("decode", (decoded - queued) * 1000)
+
+            if self.catch_up is not None:
+                jumps, skipped = self.catch_up.catch_ups, self.catch_up.skipped
+                shown = self.catch_up.select(frame, recv_time, pts_seconds, track)
+                if self.catch_up.catch_ups != jumps:
+                    self.pipeline.flush()
+                if shown is None:
+                    continue
+                if shown is not frame:
+                    # the frames jumped over came off the track's queue
+                    drained = self.catch_up.skipped - skipped
+                    self._frames += drained
+                    self.frames_total += drained
+                    frame = shown
+
+            self.pipeline.submit(frame)
+
+    async def _video_loss(self, prev):
+        """Video packet loss since ``prev`` ([received, lost], updated in place)
+        and the current jitter in ms."""
+        received = lost = 0
+        jitter_ms = 0.0
+        stats = await self.pc.getStats() if self.pc is not None else {}
+        for s in stats.values():
+            if s.type == "inbound-rtp" and s.kind == "video":
+                received += s.packetsReceived
+                lost += s.packetsLost
+                jitter_ms = max(jitter_ms, s.jitter / 90.0)  # 90 kHz clock
+
+        if received < prev[0]:  # new peer connection after a reconnect
+            prev[:] = [0, 0]
+        delta_received = received - prev[0]
+        delta_lost = lost - prev[1]
+        total = delta_received + delta_lost
+        prev[:] = [received, lost]
+        return delta_lost / total if total > 0 else 0.0, jitter_ms
+
+    async def _receiver_report(self, prev, elapsed) -> ReceiverReport:
+        loss, jitter_ms = await self._video_loss(prev)
+        latency, self._feedback_latency = self._feedback_latency, Histogram()
+        frames, self._frames = self._frames, 0
+        received_bytes, self._received_bytes = self._received_bytes, 0
+        return ReceiverReport(
+            latency_ms=latency.percentile(95),
+            loss=loss,
+            jitter_ms=jitter_ms,
+            fps=frames / elapsed,
+            received_kbps=received_bytes * 8 / 1000 / elapsed,
+        )
 
-                    screen.blit(surf, (0, 0))
-                    pygame.display.flip()
+    async def _feedback_loop(self) -> None:
+        prev = [0, 0]
+        failing = False
+        async with aiohttp.ClientSession() as session:
+            while True:
+                await asyncio.sleep(FEEDBACK_INTERVAL)
+                report = await self._receiver_report(prev, FEEDBACK_INTERVAL)
+                if not report.fps:
+                    continue
+                try:
+                    async with session.post(
+                        self.feedback_url, json=dataclasses.asdict(report)
+                    ) as r:
+                        r.raise_for_status()
+                    failing = False
+                except aiohttp.ClientError as e:
+                    if not failing:
+                        print(f"{self.prefix}Feedback to drone failed: {e}")
+                    failing = True
+
+    async def _osd_loop(self) -> None:
+        prev = [0, 0]
+        frames = self.frames_total
+        loop = asyncio.get_running_loop()
+        last = loop.time()
+        while True:
+            await asyncio.sleep(OSD_INTERVAL)
+            loss = None
+            if self.pc is not None:
+                loss, _ = await self._video_loss(prev)
+            now = loop.time()
+            fps = (self.frames_total - frames) / (now - last)
+            frames, last = self.frames_total, now
+            latency, self._osd_latency = self._osd_latency, Histogram()
+            self.osd.update(
+                stream_lines(fps, latency, loss, self.control, self.catch_up)
+            )
 
-                    video_writer.write(img)
 
-            asyncio.create_task(recv_video())
+def _quit_future():
+    loop = asyncio.get_running_loop()
+    stopped = loop.create_future()
+
+    def on_quit():
+        loop.call_soon_threadsafe(lambda: stopped.done() or stopped.set_result(None))
+
+    return stopped, on_quit
+
+
+async def run_pult(
+    video_filename: str,
+    record_mode: str = RECORD_PASSTHROUGH,
+    stats_path=None,
+    stats_interval: float = STATS_INTERVAL,
+    stream_id: int = STREAM_ID,
+    control_url=DRONE_CONTROL_URL,
+    catch_up=NEWEST,
+    lag_budget_ms: float = DEFAULT_BUDGET_MS,
+    osd: bool = True,
+) -> None:
+    """Connect to Janus and receive video with latency measurement.
+
+    ``record_mode`` is either ``RECORD_PASSTHROUGH`` (mux the received H.264
+    as-is, keeping the stream's own timing) or ``RECORD_REENCODE`` (write the
+    decoded frames through ``cv2.VideoWriter``). Latency, jitter, decode and
+    render percentiles are reported every ``stats_interval`` seconds to
+    ``stats_path`` (``.csv`` or ``.jsonl``), or printed if it is None.
+    Receiver reports go to the drone's control API at ``control_url``
+    (None disables adaptive bitrate). ``catch_up`` and ``lag_budget_ms``
+    bound how far the display may fall behind live (see ``video.catch_up``);
+    ``osd`` overlays latency, link and telemetry on the video.
+    A JanusSupervisor keeps the session up: lost connections are resumed or
+    the stream is watched again.
+    """
+
+    stopped, on_quit = _quit_future()
+    receiver = StreamReceiver(
+        stream_id,
+        video_filename,
+        record_mode,
+        stats_path,
+        stats_interval,
+        on_quit=on_quit,
+        feedback_url=control_url and f"{control_url}/feedback",
+        catch_up=catch_up,
+        lag_budget_ms=lag_budget_ms,
+        osd=osd,
+    )
+    supervisor = JanusSupervisor(JANUS_WS, stream_setup([receiver]), "[PULT] ")
+    receiver.on_failed = supervisor.fail
+    receiver.start()
+    supervised = asyncio.create_task(supervisor.run())
 
-        await pc.setRemoteDescription(
-            RTCSessionDescription(sdp=jsep_offer["sdp"], type=jsep_offer["type"])
+    try:
+        await asyncio.wait((stopped, supervised), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        supervised.cancel()
+        await supervisor.close()
+        await receiver.close()
+        print("[PULT] Terminated")
+
+
+async def run_multi_pult(
+    stream_ids,
+    record_dir: str,
+    record_mode: str = RECORD_PASSTHROUGH,
+    stats_dir=None,
+    stats_interval: float = STATS_INTERVAL,
+    catch_up=NEWEST,
+    lag_budget_ms: float = DEFAULT_BUDGET_MS,
+    osd: bool = True,
+) -> None:
+    """Watch several mountpoints over one Janus session and one event loop.
+
+    Streams are shown as tiles of a single window; each keeps its own
+    recording (``<record_dir>/stream_<id>.mp4``), latency stats (printed,
+    or ``<stats_dir>/stream_<id>.jsonl``), catch-up and OSD. See
+    ``MAX_STREAMS_PER_CORE``.
+    """
+    if len(stream_ids) > MAX_STREAMS_PER_CORE * (os.cpu_count() or 1):
+        print(
+            f"[PULT] ⚠️ {len(stream_ids)} streams exceed the planning limit of "
+            f"{MAX_STREAMS_PER_CORE} per core"
         )
-        answer = await pc.createAnswer()
-        await pc.setLocalDescription(answer)
-
-        transaction = str(uuid.uuid4())
-
-        await ws.send(
-            json.dumps(
-                {
-                    "janus": "message",
-                    "session_id": session_id,
-                    "handle_id": handle_id,
-                    "body": {"request": "start"},
-                    "jsep": {"type": answer.type, "sdp": answer.sdp},
-                    "transaction": transaction,
-                }
+    os.makedirs(record_dir, exist_ok=True)
+    if stats_dir is not None:
+        os.makedirs(stats_dir, exist_ok=True)
+
+    stopped, on_quit = _quit_future()
+    tiles = TiledDisplay(len(stream_ids), on_quit=on_quit)
+    receivers = []
+    for stream_id in stream_ids:
+        stats_path = None
+        if stats_dir is not None:
+            stats_path = os.path.join(stats_dir, f"stream_{stream_id}.jsonl")
+        receivers.append(
+            StreamReceiver(
+                stream_id,
+                os.path.join(record_dir, f"stream_{stream_id}.mp4"),
+                record_mode,
+                stats_path,
+                stats_interval,
+                display=tiles,
+                prefix=f"[PULT {stream_id}] ",
+                catch_up=catch_up,
+                lag_budget_ms=lag_budget_ms,
+                osd=osd,
             )
         )
+    # one session for all streams; their watch/start round trips overlap
+    supervisor = JanusSupervisor(JANUS_WS, stream_setup(receivers), "[PULT] ")
+    for receiver in receivers:
+        receiver.on_failed = supervisor.fail
+        receiver.start()
+    tiles.start()
+    supervised = asyncio.create_task(supervisor.run())
 
-        async def keepalive():
-            while True:
-                await asyncio.sleep(KEEPALIVE_INTERVAL)
-                await ws.send(
-                    json.dumps({"janus": "keepalive", "session_id": session_id})
-                )
-
-        asyncio.create_task(keepalive())
-
-        try:
-            await asyncio.Future()
-        finally:
-            await pc.close()
-            if video_writer:
-                video_writer.release()
-            pygame.quit()
-            print("[PULT] Terminated")
+    try:
+        await asyncio.wait((stopped, supervised), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        supervised.cancel()
+        await supervisor.close()
+        for receiver in receivers:
+            await receiver.close()
+        await asyncio.to_thread(tiles.stop)
+        print("[PULT] Terminated")
 
 
 if __name__ == "__main__":
+    phase_timer.mark("import")
     try:
-        filename = input("Enter filename to save video (e.g., drone1.mp4): ").strip()
-        if not filename:
-            filename = "drone_record.mp4"
-        if not os.path.splitext(filename)[1]:
-            filename += ".mp4"
-
-        asyncio.run(run_pult(filename))
+        ids = input(f"Enter stream IDs, comma-separated [{STREAM_ID}]: ").strip()
+        stream_ids = [int(i) for i in ids.split(",")] if ids else [STREAM_ID]
+        mode = input("Recording mode, passthrough or reencode [passthrough]: ")
+        mode = mode.strip().lower() or RECORD_PASSTHROUGH
+        if mode not in (RECORD_PASSTHROUGH, RECORD_REENCODE):
+            raise SystemExit(f"Unknown recording mode: {mode}")
+        budget = input(
+            f"Max lag behind live, ms (0: show every frame) [{DEFAULT_BUDGET_MS:g}]: "
+        ).strip()
+        try:
+            budget = float(budget) if budget else DEFAULT_BUDGET_MS
+        except ValueError:
+            raise SystemExit(f"Invalid lag budget: {budget}")
+        if not budget >= 0:  # also rejects nan
+            raise SystemExit(f"Lag budget must be 0 or more ms: {budget:g}")
+        live = {"catch_up": NEWEST if budget > 0 else None, "lag_budget_ms": budget}
+
+        if len(stream_ids) > 1:
+            record_dir = input("Enter directory for recordings [records]: ").strip()
+            asyncio.run(
+                run_multi_pult(stream_ids, record_dir or "records", mode, **live)
+            )
+        else:
+            filename = input(
+                "Enter filename to save video (e.g., drone1.mp4): "
+            ).strip()
+            if not filename:
+                filename = "drone_record.mp4"
+            if not os.path.splitext(filename)[1]:
+                filename += ".mp4"
+
+            asyncio.run(run_pult(filename, mode, stream_id=stream_ids[0], **live))
     except KeyboardInterrupt:
         print("\n[PULT] Stopped by user")
@@ -0,0 +1,178 @@
+"""In-process GStreamer H.264 pipeline for the drone video stream.
+
+Replaces the ``gst-launch-1.0`` subprocess so that bitrate, GOP length,
+resolution and frame rate can be changed while streaming, without touching
+the Janus mountpoint:
+
+* bitrate is reconfigured live by x264enc;
+* resolution and frame rate are changed through the capsfilter in front of
+  the encoder, which renegotiates and restarts the encoder on new caps;
+* GOP and thread count are not mutable in PLAYING, so the encoder alone is
+  briefly restarted behind a blocked queue while the source, payloader and
+  udpsink keep running (RTP sequence numbers and SSRC are preserved).
+
+Requires PyGObject with GStreamer 1.x and the x264enc plugin.
+"""
+
+import dataclasses
+import logging
+import threading
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gst  # noqa: E402
+
+SOURCE_V4L2 = "v4l2"
+SOURCE_TEST = "test"
+
+_ENCODER_RESTART_PROPS = {"gop": "key-int-max", "threads": "threads"}
+
+
+@dataclasses.dataclass
+class EncoderSettings:
+    bitrate: int = 2000  # kbit/s
+    width: int = 1280
+    height: int = 720
+    fps: int = 30
+    gop: int = 30  # frames between keyframes
+    threads: int = 0  # 0 = x264 picks
+    speed_preset: str = "ultrafast"
+    tune: str = "zerolatency"
+    sliced_threads: bool = False
+
+
+def build_pipeline_description(settings: EncoderSettings, source: str, sink: str) -> str:
+    if source == SOURCE_TEST:
+        src = "videotestsrc is-live=true pattern=ball"
+    elif source == SOURCE_V4L2:
+        src = "v4l2src device=/dev/video0"
+    else:
+        src = source
+    return (
+        f"{src} ! videoconvert ! videoscale ! videorate "
+        f"! capsfilter name=caps caps={caps_string(settings)} "
+        f"! queue name=encq max-size-buffers=2 leaky=downstream "
+        f"! x264enc name=enc tune={settings.tune} "
+        f"speed-preset={settings.speed_preset} bitrate={settings.bitrate} "
+        f"key-int-max={settings.gop} threads={settings.threads} "
+        f"sliced-threads={str(settings.sliced_threads).lower()} "
+        f"! {sink}"
+    )
+
+
+def caps_string(settings: EncoderSettings) -> str:
+    return (
+        f"video/x-raw,format=I420,width={settings.width},"
+        f"height={settings.height},framerate={settings.fps}/1"
+    )
+
+
+class EncoderPipeline:
+    """Source -> scale/rate -> x264enc -> RTP/UDP, adjustable while playing."""
+
+    def __init__(
+        self,
+        settings: EncoderSettings,
+        host: str,
+        port: int,
+        source: str = SOURCE_V4L2,
+        sink=None,
+    ):
+        Gst.init(None)
+        if sink is None:
+            sink = (
+                "rtph264pay config-interval=1 pt=96 "
+                f"! udpsink host={host} port={port} sync=false async=false"
+            )
+        self.settings = dataclasses.replace(settings)
+        self.pipeline = Gst.parse_launch(
+            build_pipeline_description(settings, source, sink)
+        )
+        self.caps = self.pipeline.get_by_name("caps")
+        self.enc = self.pipeline.get_by_name("enc")
+        self.queue = self.pipeline.get_by_name("encq")
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self.pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+            raise RuntimeError("Failed to start the GStreamer pipeline")
+
+    def stop(self) -> None:
+        self.pipeline.set_state(Gst.State.NULL)
+
+    def poll_bus(self):
+        """Return an error string if the pipeline failed or ended, else None."""
+        bus = self.pipeline.get_bus()
+        while True:
+            msg = bus.pop_filtered(
+                Gst.MessageType.ERROR | Gst.MessageType.EOS | Gst.MessageType.WARNING
+            )
+            if msg is None:
+                return None
+            if msg.type == Gst.MessageType.WARNING:
+                warning, _ = msg.parse_warning()
+                logging.warning(f"[GStreamer warning] {warning.message}")
+                continue
+            if msg.type == Gst.MessageType.EOS:
+                return "end of stream"
+            error, _ = msg.parse_error()
+            return error.message
+
+    def apply(self, **changes) -> EncoderSettings:
+        """Change any EncoderSettings fields while playing; returns the new settings."""
+        with self._lock:
+            unknown = set(changes) - {f.name for f in dataclasses.fields(EncoderSettings)}
+            if unknown:
+                raise ValueError(f"Unknown encoder settings: {sorted(unknown)}")
+            old = self.settings
+            new = dataclasses.replace(old, **changes)
+
+            if new.bitrate != old.bitrate:
+                self.enc.set_property("bitrate", int(new.bitrate))
+            if (new.width, new.height, new.fps) != (old.width, old.height, old.fps):
+                self.caps.set_property("caps", Gst.Caps.from_string(caps_string(new)))
+            restart = {
+                prop: int(getattr(new, field))
+                for field, prop in _ENCODER_RESTART_PROPS.items()
+                if getattr(new, field) != getattr(old, field)
+            }
+            if restart:
+                self._restart_encoder(restart)
+
+            self.settings = new
+            logging.info(f"[Encoder settings] {new}")
+            return new
+
+    def set_bitrate(self, kbps: int) -> EncoderSettings:
+        return self.apply(bitrate=kbps)
+
+    def set_gop(self, frames: int) -> EncoderSettings:
+        return self.apply(gop=frames)
+
+    def set_resolution(self, width: int, height: int) -> EncoderSettings:
+        return self.apply(width=width, height=height)
+
+    def set_framerate(self, fps: int) -> EncoderSettings:
+        return self.apply(fps=fps)
+
+    def _restart_encoder(self, props: dict) -> None:
+        """Restart only x264enc with new properties behind a blocked queue."""
+        queue_src = self.queue.get_static_pad("src")
+        enc_sink = self.enc.get_static_pad("sink")
+        done = threading.Event()
+
+        def blocked(pad, info):
+            pad.unlink(enc_sink)
+            self.enc.set_state(Gst.State.NULL)
+            for prop, value in props.items():
+                self.enc.set_property(prop, value)
+            self.enc.sync_state_with_parent()
+            # relinking re-sends the sticky caps/segment events to the encoder
+            pad.link(enc_sink)
+            done.set()
+            return Gst.PadProbeReturn.REMOVE
+
+        queue_src.add_probe(Gst.PadProbeType.BLOCK_DOWNSTREAM, blocked)
+        if not done.wait(2.0):
+            logging.warning("[Encoder restart] no buffer reached the encoder in time")
@@ -1,117 +1,176 @@
+import argparse
 import asyncio
-import aiohttp
-import subprocess
-import uuid
+import dataclasses
+import os
+import sys
+from aiohttp import web
 import logging
 
-JANUS_URL = "http://127.0.0.1:8088/janus"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.janus_supervisor import JanusSupervisor
+from video.drone_encoder import (
+    SOURCE_TEST,
+    SOURCE_V4L2,
+    EncoderPipeline,
+    EncoderSettings,
+)
+from video.mountpoint import ensure_mountpoint
+from video.rate_control import RateController, ReceiverReport
+
+JANUS_WS = "ws://127.0.0.1:8188"
 JANUS_HOST = "127.0.0.1"
 VIDEO_PORT = 8004
 DATA_PORT = 8006
 STREAM_ID = 1001
+# the control API has no authentication: keep it off the network unless the
+# pult runs elsewhere, and then only on a trusted link
+CONTROL_HOST = "127.0.0.1"
+CONTROL_PORT = 8090
 
 logging.basicConfig(filename="drone_video.log", level=logging.INFO)
 
 
-async def main():
-    async with aiohttp.ClientSession() as session:
-        base = JANUS_URL
-        try:
-            r = await session.post(
-                base, json={"janus": "create", "transaction": str(uuid.uuid4())}
-            )
-            data = await r.json()
-            session_id = data["data"]["id"]
-            base = f"{base}/{session_id}"
-        except Exception as e:
-            logging.error(f"[Session creation error] {e}")
-            return
+def make_control_app(encoder: EncoderPipeline, rate=None) -> web.Application:
+    """HTTP API for the encoder.
 
-        try:
-            r = await session.post(
-                base,
-                json={
-                    "janus": "attach",
-                    "plugin": "janus.plugin.streaming",
-                    "transaction": str(uuid.uuid4()),
-                },
-            )
-            data = await r.json()
-            handle_id = data["data"]["id"]
-            handle_url = f"{base}/{handle_id}"
-        except Exception as e:
-            logging.error(f"[Error attaching to streaming plugin] {e}")
-            return
-
-        mountpoint_config = {
-            "request": "create",
-            "type": "rtp",
-            "id": STREAM_ID,
-            "description": "Drone video stream",
-            "video": True,
-            "videoport": VIDEO_PORT,
-            "videopt": 96,
-            "videortpmap": "H264/90000",
-            "data": True,
-            "dataport": DATA_PORT,
-            "datatype": "binary",
-        }
+    GET /encoder returns the settings and POST /encoder changes them; POST
+    /feedback takes a ReceiverReport from the pult and, if ``rate`` is a
+    RateController, applies the bitrate/fps it decides on. There is no
+    authentication: anyone who can reach the API can reconfigure the encoder.
+    """
 
-        try:
-            r = await session.post(
-                handle_url,
-                json={
-                    "janus": "message",
-                    "body": mountpoint_config,
-                    "transaction": str(uuid.uuid4()),
-                },
-            )
-            data = await r.json()
-            if data.get("janus") == "success":
-                print(f"Mountpoint {STREAM_ID} created successfully")
-            else:
-                print("Failed to create mountpoint:", data)
-                return
-        except Exception as e:
-            logging.error(f"[Mountpoint creation error] {e}")
-            return
-
-        gst = [
-            "gst-launch-1.0",
-            "v4l2src",
-            "device=/dev/video0",
-            "!",
-            "videoconvert",
-            "!",
-            "x264enc",
-            "tune=zerolatency",
-            "speed-preset=ultrafast",
-            "!",
-            "rtph264pay",
-            "config-interval=1",
-            "pt=96",
-            "!",
-            "udpsink",
-            f"host={JANUS_HOST}",
-            f"port={VIDEO_PORT}",
-        ]
+    async def get_settings(request):
+        return web.json_response(dataclasses.asdict(encoder.settings))
 
+    async def post_settings(request):
         try:
-            gst_process = subprocess.Popen(gst)
-            print("Video stream started")
-        except Exception as e:
-            logging.error(f"[GStreamer launch error] {e}")
-            return
+            changes = await request.json()
+            settings = await asyncio.to_thread(encoder.apply, **changes)
+        except (ValueError, TypeError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+        return web.json_response(dataclasses.asdict(settings))
 
+    async def post_feedback(request):
         try:
-            while True:
-                await asyncio.sleep(1)
-        except asyncio.CancelledError:
-            pass
-        finally:
-            gst_process.terminate()
-            await asyncio.to_thread(gst_process.wait)
+            report = ReceiverReport(**(await request.json()))
+        except (ValueError, TypeError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+        changes = rate.update(report) if rate is not None else None
+        if changes:
+            logging.info(f"[Rate control] {report} -> {changes}")
+            await asyncio.to_thread(encoder.apply, **changes)
+        return web.json_response(changes or {})
+
+    app = web.Application()
+    app.router.add_get("/encoder", get_settings)
+    app.router.add_post("/encoder", post_settings)
+    app.router.add_post("/feedback", post_feedback)
+    return app
+
+
+async def main(
+    source: str = SOURCE_V4L2,
+    settings: EncoderSettings = None,
+    rate: RateController = None,
+    control_host: str = CONTROL_HOST,
+    control_port: int = CONTROL_PORT,
+):
+    settings = settings or EncoderSettings()
+    # The mountpoint outlives our Janus session; the supervisor only has to
+    # recreate it after a Janus restart, while the encoder keeps sending.
+    supervisor = JanusSupervisor(
+        JANUS_WS,
+        lambda janus: ensure_mountpoint(janus, STREAM_ID, VIDEO_PORT, DATA_PORT),
+        emit=logging.info,
+    )
+    supervised = asyncio.create_task(supervisor.run())
+
+    try:
+        encoder = await asyncio.to_thread(
+            EncoderPipeline, settings, JANUS_HOST, VIDEO_PORT, source
+        )
+        encoder.start()
+    except Exception as e:
+        logging.error(f"[GStreamer launch error] {e}")
+        supervised.cancel()
+        await supervisor.close()
+        return
+    print("Video stream started")
+
+    runner = web.AppRunner(make_control_app(encoder, rate))
+    await runner.setup()
+    await web.TCPSite(runner, control_host, control_port).start()
+    print(f"Encoder control API on {control_host}:{control_port}")
+
+    try:
+        while True:
+            await asyncio.sleep(1)
+            error = encoder.poll_bus()
+            if error:
+                logging.error(f"[GStreamer error] {error}")
+                break
+    except asyncio.CancelledError:
+        pass
+    finally:
+        supervised.cancel()
+        await runner.cleanup()
+        encoder.stop()
+        await supervisor.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Drone H.264 video streamer")
+    parser.add_argument(
+        "--source",
+        default=SOURCE_V4L2,
+        help=f"'{SOURCE_V4L2}' (/dev/video0), '{SOURCE_TEST}' (videotestsrc) "
+        "or any GStreamer source description",
+    )
+    defaults = EncoderSettings()
+    parser.add_argument("--bitrate", type=int, default=defaults.bitrate, help="kbit/s")
+    parser.add_argument("--width", type=int, default=defaults.width)
+    parser.add_argument("--height", type=int, default=defaults.height)
+    parser.add_argument("--fps", type=int, default=defaults.fps)
+    parser.add_argument("--gop", type=int, default=defaults.gop)
+    parser.add_argument(
+        "--max-bitrate", type=int, default=4000, help="rate control ceiling, kbit/s"
+    )
+    parser.add_argument(
+        "--target-latency", type=float, default=150.0, help="rate control target, ms"
+    )
+    parser.add_argument(
+        "--no-rate-control", action="store_true", help="ignore pult feedback"
+    )
+    parser.add_argument(
+        "--control-host",
+        default=CONTROL_HOST,
+        help="address of the encoder control API (unauthenticated; 0.0.0.0 "
+        "exposes it to the network)",
+    )
+    parser.add_argument("--control-port", type=int, default=CONTROL_PORT)
+    args = parser.parse_args()
+
+    rate = None
+    if not args.no_rate_control:
+        rate = RateController(
+            args.bitrate,
+            args.fps,
+            max_bitrate=max(args.max_bitrate, args.bitrate),
+            target_latency_ms=args.target_latency,
+        )
+    asyncio.run(
+        main(
+            args.source,
+            EncoderSettings(
+                bitrate=args.bitrate,
+                width=args.width,
+                height=args.height,
+                fps=args.fps,
+                gop=args.gop,
+            ),
+            rate,
+            args.control_host,
+            args.control_port,
+        )
+    )
@@ -0,0 +1,107 @@
+"""Reusable frame buffers for the pult video viewer.
+
+Every decoded frame is converted exactly once, straight from its YUV planes
+into a preallocated BGR array. That array is what ``cv2.VideoWriter`` wants,
+and a pygame Surface created with ``frombuffer`` shares its memory, so the
+display stage can blit it without any further copy. Buffers are only rebuilt
+when the stream resolution changes.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+import pygame
+
+PREALLOCATE = 3
+_I420_FORMATS = ("yuv420p", "yuvj420p")
+
+
+class FrameBuffer:
+    """One BGR image plus its I420 staging area and a zero-copy surface."""
+
+    def __init__(self, pool, width: int, height: int):
+        self.pool = pool
+        self.size = (width, height)
+        self.refs = 0
+        self.pts = None
+        self.time_base = None
+
+        self.yuv = np.empty((height * 3 // 2, width), dtype=np.uint8)
+        self.bgr = np.empty((height, width, 3), dtype=np.uint8)
+        self.surface = pygame.image.frombuffer(self.bgr, self.size, "BGR")
+
+        flat = self.yuv.reshape(-1)
+        luma = width * height
+        chroma = luma // 4
+        self._planes = (
+            self.yuv[:height],
+            flat[luma : luma + chroma].reshape(height // 2, width // 2),
+            flat[luma + chroma :].reshape(height // 2, width // 2),
+        )
+
+    def fill(self, frame) -> None:
+        """Convert a decoded ``av.VideoFrame`` into ``bgr`` in place."""
+        self.pts = frame.pts
+        self.time_base = frame.time_base
+        width, height = self.size
+
+        if frame.format.name in _I420_FORMATS and width % 2 == 0 and height % 2 == 0:
+            for plane, dst in zip(frame.planes, self._planes):
+                rows, cols = dst.shape
+                src = np.frombuffer(plane, dtype=np.uint8).reshape(-1, plane.line_size)
+                np.copyto(dst, src[:rows, :cols])
+            cv2.cvtColor(self.yuv, cv2.COLOR_YUV2BGR_I420, dst=self.bgr)
+        else:
+            np.copyto(self.bgr, frame.to_ndarray(format="bgr24"))
+
+    def release(self) -> None:
+        self.pool.release(self)
+
+
+class FrameBufferPool:
+    """Hands out FrameBuffers for the current resolution and takes them back.
+
+    A buffer is shared by reference between the display and record stages;
+    it returns to the pool once every consumer has released it.
+    """
+
+    def __init__(self, max_buffers: int):
+        self.max_buffers = max_buffers
+        self.rebuilds = 0
+        self.exhausted = 0
+        self._size = None
+        self._free = []
+        self._allocated = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, width: int, height: int, refs: int = 1):
+        """Return a free buffer for this resolution, or None if all are in use."""
+        with self._lock:
+            if self._size != (width, height):
+                self._rebuild(width, height)
+            if self._free:
+                buf = self._free.pop()
+            elif self._allocated < self.max_buffers:
+                buf = FrameBuffer(self, width, height)
+                self._allocated += 1
+            else:
+                self.exhausted += 1
+                return None
+            buf.refs = refs
+            return buf
+
+    def release(self, buf: FrameBuffer) -> None:
+        with self._lock:
+            buf.refs -= 1
+            if buf.refs == 0 and buf.size == self._size:
+                self._free.append(buf)
+
+    def _rebuild(self, width: int, height: int) -> None:
+        # Buffers of the old resolution still in flight are simply not
+        # returned to the free list when released.
+        self._size = (width, height)
+        count = min(PREALLOCATE, self.max_buffers)
+        self._free = [FrameBuffer(self, width, height) for _ in range(count)]
+        self._allocated = count
+        self.rebuilds += 1
@@ -0,0 +1,258 @@
+"""Staged frame pipeline for the pult video viewer.
+
+The asyncio loop only receives decoded frames from aiortc and hands them to
+the pipeline; conversion, display and recording each run on their own worker
+thread behind a bounded queue, so a slow disk write or a slow flip never
+stalls ``track.recv()``.
+"""
+
+import queue
+import threading
+import time
+
+import cv2
+import pygame
+
+from common import phase_timer
+from video.frame_buffers import FrameBuffer, FrameBufferPool
+
+LATEST = "latest"  # keep only the newest item, replacing whatever is queued
+BOUNDED = "bounded"  # keep every item until the queue is full, then drop new ones
+
+CONVERT_QUEUE = 4
+RECORD_QUEUE = 30
+RECORD_FPS = 15
+# record queue + the frame each of display/record/convert may hold + one queued
+# for display
+POOL_BUFFERS = RECORD_QUEUE + 4
+
+_STOP = object()
+
+
+class Stage:
+    """A worker thread fed through a bounded queue with its own drop policy."""
+
+    def __init__(
+        self,
+        name,
+        handler,
+        maxsize=1,
+        policy=LATEST,
+        on_idle=None,
+        on_stop=None,
+        on_drop=None,
+        idle_interval=0.05,
+    ):
+        if policy not in (LATEST, BOUNDED):
+            raise ValueError(f"Unknown drop policy: {policy}")
+        self.name = name
+        self.handler = handler
+        self.policy = policy
+        self.on_idle = on_idle
+        self.on_stop = on_stop
+        self.on_drop = on_drop
+        self.idle_interval = idle_interval
+        self.outputs = []
+        self.processed = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=1 if policy == LATEST else maxsize)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def put(self, item) -> bool:
+        """Queue an item without blocking; returns False if it was dropped."""
+        if self.policy == BOUNDED:
+            try:
+                self._queue.put_nowait(item)
+                return True
+            except queue.Full:
+                self._drop(item)
+                return False
+
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return True
+            except queue.Full:
+                try:
+                    self._drop(self._queue.get_nowait())
+                except queue.Empty:
+                    pass
+
+    def clear(self) -> int:
+        """Drop everything queued; returns how many items that was."""
+        cleared = 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return cleared
+            if item is _STOP:  # stopping: leave the marker for the worker
+                self._queue.put_nowait(item)
+                return cleared
+            self._drop(item)
+            cleared += 1
+
+    def stop(self, timeout=None) -> None:
+        """Stop the worker; a bounded stage drains what is already queued."""
+        if not self._thread.is_alive():
+            return
+        if self.policy == BOUNDED:
+            self._queue.put(_STOP)
+        else:
+            self.put(_STOP)
+        self._thread.join(timeout)
+
+    def _drop(self, item) -> None:
+        self.dropped += 1
+        if self.on_drop is not None and item is not _STOP:
+            self.on_drop(item)
+
+    def _run(self) -> None:
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.idle_interval)
+                except queue.Empty:
+                    if self.on_idle is not None:
+                        self.on_idle()
+                    continue
+                if item is _STOP:
+                    break
+                try:
+                    result = self.handler(item)
+                except Exception as e:
+                    print(f"[PULT] {self.name} stage error: {e}")
+                    continue
+                self.processed += 1
+                if result is not None:
+                    for output in self.outputs:
+                        output.put(result)
+        finally:
+            if self.on_stop is not None:
+                self.on_stop()
+
+
+class FramePipeline:
+    """Convert -> (display, record) stages fed from the receive loop.
+
+    Pass ``video_filename=None`` to run without the re-encoding record stage,
+    e.g. when the stream is recorded by H.264 passthrough instead. Pass a
+    shared ``display`` (e.g. a tile of a TiledDisplay) to show frames there
+    instead of in a window of the pipeline's own. An ``osd`` (``video.osd``)
+    is drawn over every frame the pipeline's own window shows.
+    """
+
+    def __init__(
+        self, video_filename=None, on_quit=None, stats=None, display=None, osd=None
+    ):
+        self.video_filename = video_filename
+        self.on_quit = on_quit
+        self.stats = stats
+        self.osd = osd
+        self.screen = None
+        self.video_writer = None
+        self.pool = FrameBufferPool(POOL_BUFFERS)
+
+        self.convert = Stage("convert", self._convert, CONVERT_QUEUE, BOUNDED)
+        self.display = display
+        if display is None:
+            self.display = Stage(
+                "display",
+                self._display,
+                policy=LATEST,
+                on_idle=self._pump_events,
+                on_stop=pygame.quit,
+                on_drop=FrameBuffer.release,
+            )
+        self.record = None
+        if video_filename is not None:
+            self.record = Stage(
+                "record",
+                self._record,
+                RECORD_QUEUE,
+                BOUNDED,
+                on_stop=self._close_writer,
+                on_drop=FrameBuffer.release,
+            )
+        self.convert.outputs = [s for s in (self.display, self.record) if s]
+        self.stages = [self.convert] + [
+            s for s in self.convert.outputs if isinstance(s, Stage)
+        ]
+
+    def start(self) -> None:
+        for stage in reversed(self.stages):
+            stage.start()
+
+    def submit(self, frame) -> bool:
+        """Hand a decoded frame over from the receive loop; never blocks."""
+        return self.convert.put(frame)
+
+    def flush(self) -> int:
+        """Drop the frames waiting for conversion, e.g. to jump to live."""
+        return self.convert.clear()
+
+    def stop(self) -> None:
+        for stage in self.stages:
+            stage.stop()
+        dropped = " ".join(f"{s.name}={s.dropped}" for s in self.stages)
+        print(f"[PULT] Frames dropped: {dropped} pool={self.pool.exhausted}")
+
+    def _convert(self, frame):
+        buf = self.pool.acquire(frame.width, frame.height, len(self.convert.outputs))
+        if buf is None:
+            return None
+        try:
+            buf.fill(frame)
+        except Exception:
+            for _ in self.convert.outputs:
+                buf.release()
+            raise
+        return buf
+
+    def _display(self, buf) -> None:
+        try:
+            if self.screen is None or self.screen.get_size() != buf.size:
+                pygame.init()
+                self.screen = pygame.display.set_mode(buf.size)
+                pygame.display.set_caption("Drone Video")
+
+            start = time.perf_counter()
+            self.screen.blit(buf.surface, (0, 0))
+            if self.osd is not None:
+                self.osd.draw(self.screen)
+            pygame.display.flip()
+            phase_timer.mark("first_frame")
+            if self.stats is not None:
+                self.stats.record("render", (time.perf_counter() - start) * 1000)
+        finally:
+            buf.release()
+        self._pump_events()
+
+    def _pump_events(self) -> None:
+        if self.screen is None:
+            return
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT and self.on_quit is not None:
+                self.on_quit()
+
+    def _record(self, buf) -> None:
+        try:
+            if self.video_writer is None:
+                self.video_writer = cv2.VideoWriter(
+                    self.video_filename,
+                    cv2.VideoWriter_fourcc(*"mp4v"),
+                    RECORD_FPS,
+                    buf.size,
+                )
+                print(f"[PULT] Recording video to file: {self.video_filename}")
+            self.video_writer.write(buf.bgr)
+        finally:
+            buf.release()
+
+    def _close_writer(self) -> None:
+        if self.video_writer is not None:
+            self.video_writer.release()
+            self.video_writer = None
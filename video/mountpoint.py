@@ -0,0 +1,54 @@
+"""Streaming plugin mountpoint for the drone's RTP video and data.
+
+``mountpoint_config`` mirrors ``camera-stream`` in
+janus_conf/janus.plugin.streaming.jcfg: H.264 on the video port and a
+binary data port, whose datagrams (the drone's CRSF RTP packets) Janus
+relays unchanged to every viewer's data channel. The jcfg's ``datapt`` is
+not set here: the pult tells RC from telemetry by the payload type inside
+each packet, not by anything Janus adds.
+"""
+
+from common.janus_client import JanusClient, JanusError
+
+ERROR_NO_SUCH_MOUNTPOINT = 455  # JANUS_STREAMING_ERROR_NO_SUCH_MOUNTPOINT
+
+
+def mountpoint_config(stream_id: int, video_port: int, data_port: int) -> dict:
+    return {
+        "request": "create",
+        "type": "rtp",
+        "id": stream_id,
+        "description": "Drone video stream",
+        "video": True,
+        "videoport": video_port,
+        "videopt": 96,
+        "videortpmap": "H264/90000",
+        "data": True,
+        "dataport": data_port,
+        "datatype": "binary",
+    }
+
+
+async def ensure_mountpoint(
+    janus: JanusClient, stream_id: int, video_port: int, data_port: int
+) -> bool:
+    """Reuse mountpoint ``stream_id`` if Janus still has it, otherwise create it.
+
+    Mountpoints outlive the session that created them, so after a reconnect
+    only a Janus restart makes this create one again. Returns True if created.
+    """
+    handle = await janus.attach("janus.plugin.streaming")
+    try:
+        try:
+            await handle.call({"request": "info", "id": stream_id})
+            print(f"Reusing mountpoint {stream_id}")
+            return False
+        except JanusError as e:
+            if e.code != ERROR_NO_SUCH_MOUNTPOINT:
+                raise
+
+        await handle.call(mountpoint_config(stream_id, video_port, data_port))
+        print(f"Mountpoint {stream_id} created successfully")
+        return True
+    finally:
+        await handle.detach()
@@ -0,0 +1,164 @@
+"""On-screen display for the pult window: latency, link health, telemetry.
+
+``StreamReceiver`` formats the overlay's lines about every ``OSD_INTERVAL``
+on the event loop and hands them to ``Osd.update()``. Values are formatted
+to the precision shown, so most updates change no text at all; those are
+ignored. The display thread calls ``Osd.draw()`` after blitting each frame:
+
+* a line's text surface is rendered only when its text changed;
+* the lines and their translucent panel are composited into one overlay
+  surface only when some line changed, and that surface is reallocated only
+  when the text outgrows it;
+* every other frame costs a single blit of the cached overlay, with nothing
+  rendered or allocated (``bench/osd_cost.py`` measures it at 1080p).
+"""
+
+import math
+import time
+
+import pygame
+
+OSD_INTERVAL = 0.5  # s between line updates
+FONT_SIZE = 24
+MARGIN = 8  # px from the corner of the video, and around the text
+COLOR = (255, 255, 255)
+PANEL = (0, 0, 0, 140)
+LINES = ("video", "control", "link", "battery", "attitude", "gps")
+STALE_MS = 2000.0  # telemetry older than this is shown with its age
+_GROW = 64  # px; the overlay is allocated in steps of this size
+
+
+class Osd:
+    def __init__(self, font_size: int = FONT_SIZE, lines=LINES):
+        self.font_size = font_size
+        self.lines = tuple(lines)
+        self.renders = 0  # text surfaces rendered
+        self.composites = 0  # overlays rebuilt
+        self._texts = {}  # replaced as a whole by update(), read by draw()
+        self._version = 0
+        self._drawn = -1  # version the overlay was composited for
+        self._font = None
+        self._rendered = {}  # line -> (text, surface)
+        self._overlay = None
+        self._area = pygame.Rect(0, 0, 0, 0)  # used part of the overlay
+
+    def update(self, texts: dict) -> bool:
+        """Set the text of each line (None or missing hides it).
+
+        Returns whether anything changed. Safe to call from another thread
+        than ``draw()``.
+        """
+        texts = {name: texts[name] for name in self.lines if texts.get(name)}
+        if texts == self._texts:
+            return False
+        self._texts = texts
+        self._version += 1
+        return True
+
+    def draw(self, screen, origin=(0, 0)) -> None:
+        """Blit the overlay onto ``screen`` at ``origin`` plus the margin."""
+        if self._drawn != self._version:
+            self._composite()
+        if self._area.width:
+            screen.blit(
+                self._overlay, (origin[0] + MARGIN, origin[1] + MARGIN), self._area
+            )
+
+    def _render(self, name: str, text: str):
+        cached = self._rendered.get(name)
+        if cached is not None and cached[0] == text:
+            return cached[1]
+        surface = self._font.render(text, True, COLOR)
+        self._rendered[name] = (text, surface)
+        self.renders += 1
+        return surface
+
+    def _composite(self) -> None:
+        if self._font is None:
+            pygame.font.init()
+            self._font = pygame.font.Font(None, self.font_size)
+        self._drawn = self._version
+        texts = self._texts
+        surfaces = [self._render(n, texts[n]) for n in self.lines if n in texts]
+        if not surfaces:
+            self._area.size = (0, 0)
+            return
+        width = max(s.get_width() for s in surfaces) + 2 * MARGIN
+        height = sum(s.get_height() for s in surfaces) + 2 * MARGIN
+        if (
+            self._overlay is None
+            or self._overlay.get_width() < width
+            or self._overlay.get_height() < height
+        ):
+            size = (
+                _GROW * math.ceil(width / _GROW),
+                _GROW * math.ceil(height / _GROW),
+            )
+            self._overlay = pygame.Surface(size, pygame.SRCALPHA)
+        self._area.size = (width, height)
+        self._overlay.fill(PANEL, self._area)
+        y = MARGIN
+        for surface in surfaces:
+            self._overlay.blit(surface, (MARGIN, y))
+            y += surface.get_height()
+        self.composites += 1
+
+
+def _age(sample: dict, now_ms: float) -> str:
+    age_ms = now_ms - sample["time"]
+    return f"  ({age_ms / 1000:.0f} s old)" if age_ms > STALE_MS else ""
+
+
+def stream_lines(
+    fps: float, latency, video_loss, control, catch_up=None, now_ms: float = None
+) -> dict:
+    """The OSD lines of one stream.
+
+    ``latency`` is a Histogram of frame latency, ``video_loss`` a fraction
+    (None if unknown), ``control`` the stream's ``CrsfReceiver`` and
+    ``catch_up`` its ``CatchUp``, if any. Telemetry lines of samples older
+    than ``STALE_MS`` at ``now_ms`` (wall clock) say how old they are.
+    """
+    if now_ms is None:
+        now_ms = time.time() * 1000
+    video = f"{fps:.0f} fps  latency {latency.percentile(50):.0f}"
+    video += f"/{latency.percentile(99):.0f} ms"
+    if video_loss is not None:
+        video += f"  loss {video_loss * 100:.1f}%"
+    if catch_up is not None and catch_up.catch_ups:
+        video += f"  jumps {catch_up.catch_ups}"
+    lines = {"video": video}
+    rtp = control.rtp
+    if rtp.accepted:
+        lines["control"] = (
+            f"RC loss {rtp.loss_rate * 100:.1f}%  jitter {rtp.jitter_ms:.0f} ms"
+        )
+    series = control.telemetry.series
+    link = series["link"].latest()
+    if link:
+        lines["link"] = (
+            f"LQ {link['uplink_lq']:.0f}/{link['downlink_lq']:.0f}%  "
+            f"RSSI {link['uplink_rssi_1']:.0f} dBm  SNR {link['uplink_snr']:.0f} dB"
+            + _age(link, now_ms)
+        )
+    battery = series["battery"].latest()
+    if battery:
+        lines["battery"] = (
+            f"BAT {battery['voltage']:.1f} V  {battery['current']:.1f} A  "
+            f"{battery['remaining']:.0f}%" + _age(battery, now_ms)
+        )
+    attitude = series["attitude"].latest()
+    if attitude:
+        lines["attitude"] = (
+            f"P {math.degrees(attitude['pitch']):+.0f}  "
+            f"R {math.degrees(attitude['roll']):+.0f}  "
+            f"Y {math.degrees(attitude['yaw']):.0f}" + _age(attitude, now_ms)
+        )
+    gps = series["gps"].latest()
+    if gps:
+        lines["gps"] = (
+            f"{gps['latitude']:.5f} {gps['longitude']:.5f}  "
+            f"alt {gps['altitude']:.0f} m  {gps['ground_speed']:.0f} km/h  "
+            f"{gps['sats']:.0f} sats" + _age(gps, now_ms)
+        )
+    return lines
@@ -0,0 +1,182 @@
+"""H.264 passthrough recording for the pult.
+
+Instead of re-encoding decoded frames, the recorder taps the access units
+that aiortc has already reassembled from RTP and muxes them as-is into an
+MP4 or MKV container, keeping the original RTP timestamps as pts. The tap
+only queues bytes on the receive path; muxing runs on its own thread.
+
+RTP timestamps are 32 bits and wrap after about 13 hours at 90 kHz, so each
+one is unwrapped against the last written frame into a 64-bit pts. A jump of
+more than ``MAX_JUMP`` either way is a discontinuity, not time passing: the
+frame is written one frame interval after the last one and the timeline
+carries on from there (counted in ``rebased``). Frames at or before the last
+written one are dropped.
+
+A new peer connection after a reconnect starts its own RTP timestamps from
+a random base. ``rebase()``, called before it delivers frames, makes its
+first keyframe continue the timeline the same way; frames before that
+keyframe are dropped, as they cannot be decoded without it.
+"""
+
+import fractions
+import queue
+import threading
+
+import av
+
+RECORD_QUEUE = 300
+VIDEO_TIME_BASE = fractions.Fraction(1, 90000)
+RTP_TS_MOD = 1 << 32
+MAX_JUMP = 10 * 90000  # 10 s in RTP ticks
+FRAME_STEP = 3000  # one frame at 30 fps, until the stream shows its own
+MAX_STEP = 90000  # longer intervals are stalls, not the frame rate
+
+_NAL_IDR = 5
+_NAL_SPS = 7
+_STOP = object()
+
+
+def is_keyframe(data: bytes) -> bool:
+    """True if an Annex B access unit carries SPS or an IDR slice."""
+    start = data.find(b"\x00\x00\x01")
+    while start != -1 and start + 3 < len(data):
+        nal_type = data[start + 3] & 0x1F
+        if nal_type in (_NAL_IDR, _NAL_SPS):
+            return True
+        start = data.find(b"\x00\x00\x01", start + 3)
+    return False
+
+
+class _TapQueue(queue.Queue):
+    """Decoder input queue that also hands every encoded frame to its taps."""
+
+    def __init__(self):
+        super().__init__()
+        self.taps = []
+
+    def put(self, item, block=True, timeout=None):
+        if item is not None:
+            _codec, encoded_frame = item
+            for tap in self.taps:
+                tap(encoded_frame.data, encoded_frame.timestamp)
+        super().put(item, block, timeout)
+
+
+def tap_receiver(receiver, tap) -> None:
+    """Install ``tap(data, pts)`` on an RTCRtpReceiver before it starts.
+
+    Must be called from the ``track`` event, i.e. before the receiver's
+    decoder thread picks up its input queue. Several taps may be installed.
+    """
+    decoder_queue = receiver._RTCRtpReceiver__decoder_queue
+    if not isinstance(decoder_queue, _TapQueue):
+        decoder_queue = _TapQueue()
+        receiver._RTCRtpReceiver__decoder_queue = decoder_queue
+    decoder_queue.taps.append(tap)
+
+
+class PassthroughRecorder:
+    """Muxes received H.264 access units into a file without decoding."""
+
+    def __init__(self, filename: str, max_queue: int = RECORD_QUEUE):
+        self.filename = filename
+        self.written = 0
+        self.dropped = 0
+        self.rebased = 0
+        self._last_ts = None  # RTP timestamp of the last written frame
+        self._last_pts = None  # its pts in the file
+        self._step = FRAME_STEP  # last frame interval, ticks
+        self._epoch = 0  # bumped by rebase(); pushed frames carry it
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(
+            target=self._run, name="passthrough-record", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def attach(self, receiver) -> None:
+        tap_receiver(receiver, self.push)
+
+    def rebase(self) -> None:
+        """Start a new timestamp base with the next frame pushed, e.g. a new PC."""
+        self._epoch += 1
+
+    def push(self, data: bytes, pts: int) -> None:
+        """Queue one access unit; called on the receive path, never blocks."""
+        try:
+            self._queue.put_nowait((data, pts, self._epoch))
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _file_pts(self, ts: int, new_base: bool = False):
+        """The file pts of a frame with RTP timestamp ``ts``, or None to drop it."""
+        if self._last_ts is None:
+            self._last_ts = self._last_pts = ts
+            return ts
+        delta = (ts - self._last_ts + RTP_TS_MOD // 2) % RTP_TS_MOD - RTP_TS_MOD // 2
+        if new_base or not -MAX_JUMP <= delta <= MAX_JUMP:
+            self.rebased += 1
+            delta = self._step
+        elif delta <= 0:
+            return None
+        elif delta < MAX_STEP:
+            self._step = delta
+        self._last_ts = ts
+        self._last_pts += delta
+        return self._last_pts
+
+    def _run(self) -> None:
+        container = None
+        stream = None
+        epoch = 0
+        new_base = False
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                data, pts, frame_epoch = item
+                if frame_epoch != epoch:
+                    epoch = frame_epoch
+                    new_base = True
+                if (new_base or container is None) and not is_keyframe(data):
+                    # A decodable file, and each new stream in it, has to
+                    # start on a keyframe.
+                    if container is not None:
+                        self.dropped += 1
+                    continue
+
+                if container is None:
+                    container = av.open(self.filename, "w")
+                    stream = container.add_stream("h264")
+                    stream.time_base = VIDEO_TIME_BASE
+                    print(f"[PULT] Recording H.264 passthrough to: {self.filename}")
+
+                pts = self._file_pts(pts, new_base)
+                new_base = False
+                if pts is None:
+                    self.dropped += 1
+                    continue
+
+                packet = av.Packet(data)
+                packet.pts = packet.dts = pts
+                packet.time_base = VIDEO_TIME_BASE
+                packet.stream = stream
+                try:
+                    container.mux(packet)
+                    self.written += 1
+                except av.FFmpegError as e:
+                    print(f"[PULT] Passthrough mux error: {e}")
+        finally:
+            if container is not None:
+                container.close()
+            print(
+                f"[PULT] Passthrough recording closed: written={self.written} "
+                f"dropped={self.dropped} rebased={self.rebased}"
+            )
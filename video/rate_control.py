@@ -0,0 +1,106 @@
+"""Closed-loop rate control between the pult's receiver stats and the encoder.
+
+The pult posts a ``ReceiverReport`` to the drone's control API about once a
+second; ``RateController`` turns the stream of reports into encoder bitrate
+and frame-rate changes that keep the measured latency under a target:
+
+* congestion (loss above ``LOSS_HIGH``, or latency above target and not
+  already draining) sets the bitrate just under the rate the pult actually
+  received, or cuts it by ``DECREASE_FACTOR`` if that is unknown; once the
+  bitrate floor is reached the frame rate is stepped down too;
+* latency above target that is already falling is left to drain;
+* after ``INCREASE_HOLD`` consecutive healthy reports the frame rate is
+  restored first, then the bitrate grows by ``INCREASE_FACTOR``, never to
+  more than ``PROBE_LIMIT`` times the received rate.
+"""
+
+import dataclasses
+
+TARGET_LATENCY_MS = 150.0
+LOSS_HIGH = 0.02
+LOSS_LOW = 0.005
+DECREASE_FACTOR = 0.8
+RECEIVED_FACTOR = 0.85  # of the received rate after congestion
+DRAINING = 0.9  # latency below previous * DRAINING counts as draining
+INCREASE_FACTOR = 1.08
+PROBE_LIMIT = 1.5
+INCREASE_HOLD = 2
+HEADROOM = 0.7  # latency below target * HEADROOM counts as healthy
+FPS_STEP = 5
+
+
+@dataclasses.dataclass
+class ReceiverReport:
+    latency_ms: float  # p95 frame latency over the report interval
+    loss: float  # fraction of packets lost over the report interval
+    jitter_ms: float = 0.0
+    fps: float = 0.0
+    received_kbps: float = 0.0  # media bitrate that reached the pult
+
+
+class RateController:
+    """AIMD controller for (bitrate, fps) driven by ReceiverReports."""
+
+    def __init__(
+        self,
+        bitrate: int,
+        fps: int,
+        min_bitrate: int = 300,
+        max_bitrate: int = 4000,
+        min_fps: int = 10,
+        target_latency_ms: float = TARGET_LATENCY_MS,
+    ):
+        self.bitrate = bitrate
+        self.fps = fps
+        self.max_fps = fps
+        self.min_bitrate = min_bitrate
+        self.max_bitrate = max_bitrate
+        self.min_fps = min_fps
+        self.target_latency_ms = target_latency_ms
+        self._healthy = 0
+        self._last_latency = None
+
+    def update(self, report: ReceiverReport):
+        """Feed one report; returns the changed settings as a dict, or None."""
+        bitrate, fps = self.bitrate, self.fps
+        last_latency, self._last_latency = self._last_latency, report.latency_ms
+        draining = (
+            last_latency is not None and report.latency_ms < last_latency * DRAINING
+        )
+
+        if report.loss > LOSS_HIGH or (
+            report.latency_ms > self.target_latency_ms and not draining
+        ):
+            self._healthy = 0
+            if bitrate > self.min_bitrate:
+                cut = int(bitrate * DECREASE_FACTOR)
+                if report.received_kbps > 0:
+                    cut = min(cut, int(report.received_kbps * RECEIVED_FACTOR))
+                bitrate = max(self.min_bitrate, cut)
+            else:
+                fps = max(self.min_fps, fps - FPS_STEP)
+        elif report.latency_ms > self.target_latency_ms:
+            self._healthy = 0
+        elif (
+            report.latency_ms < self.target_latency_ms * HEADROOM
+            and report.loss < LOSS_LOW
+        ):
+            self._healthy += 1
+            if self._healthy >= INCREASE_HOLD:
+                self._healthy = 0
+                if fps < self.max_fps:
+                    fps = min(self.max_fps, fps + FPS_STEP)
+                else:
+                    bitrate = int(bitrate * INCREASE_FACTOR)
+                    if report.received_kbps > 0:
+                        bitrate = min(bitrate, int(report.received_kbps * PROBE_LIMIT))
+                    bitrate = max(self.bitrate, min(self.max_bitrate, bitrate))
+        else:
+            self._healthy = 0
+
+        changes = {}
+        if bitrate != self.bitrate:
+            changes["bitrate"] = self.bitrate = bitrate
+        if fps != self.fps:
+            changes["fps"] = self.fps = fps
+        return changes or None
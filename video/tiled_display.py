@@ -0,0 +1,136 @@
+"""Tiled pygame window for watching several drone streams in one process.
+
+Each stream's convert stage hands its newest FrameBuffer to a TileInput;
+a single display thread scales every pending frame into its tile with
+``cv2.resize`` into a preallocated array, blits it and flips once per pass.
+Like the single-stream display stage, each tile keeps only its newest frame,
+and a tile whose input has an ``osd`` gets it drawn over its corner.
+"""
+
+import math
+import threading
+import time
+
+import cv2
+import numpy as np
+import pygame
+
+from common import phase_timer
+
+TILE_SIZE = (640, 360)
+
+
+class TileInput:
+    """Display-stage stand-in for one stream; keeps only its newest frame."""
+
+    def __init__(self, display, index: int, stats=None, osd=None):
+        self.display = display
+        self.index = index
+        self.stats = stats
+        self.osd = osd
+        self.dropped = 0
+
+    def put(self, buf) -> bool:
+        self.display._submit(self, buf)
+        return True
+
+
+class TiledDisplay:
+    """One window showing ``count`` streams in a grid of ``tile_size`` tiles."""
+
+    def __init__(self, count: int, tile_size=TILE_SIZE, on_quit=None):
+        self.tile_size = tile_size
+        self.on_quit = on_quit
+        self.cols = math.ceil(math.sqrt(count))
+        self.rows = math.ceil(count / self.cols)
+        self.inputs = []
+        self._pending = [None] * count
+        self._tiles = []
+        for index in range(count):
+            tile = np.zeros((tile_size[1], tile_size[0], 3), dtype=np.uint8)
+            self._tiles.append((tile, pygame.image.frombuffer(tile, tile_size, "BGR")))
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tiles", daemon=True)
+
+    def input(self, index: int, stats=None, osd=None) -> TileInput:
+        tile_input = TileInput(self, index, stats, osd)
+        self.inputs.append(tile_input)
+        return tile_input
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join()
+
+    def _submit(self, tile_input: TileInput, buf) -> None:
+        with self._lock:
+            old = self._pending[tile_input.index]
+            self._pending[tile_input.index] = (tile_input, buf)
+        if old is not None:
+            tile_input.dropped += 1
+            old[1].release()
+        self._wake.set()
+
+    def _position(self, index: int):
+        return (
+            (index % self.cols) * self.tile_size[0],
+            (index // self.cols) * self.tile_size[1],
+        )
+
+    def _run(self) -> None:
+        pygame.init()
+        width, height = self.tile_size
+        screen = pygame.display.set_mode((self.cols * width, self.rows * height))
+        pygame.display.set_caption("Drone Video")
+        try:
+            while not self._stopped.is_set():
+                self._wake.wait(0.05)
+                self._wake.clear()
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT and self.on_quit is not None:
+                        self.on_quit()
+
+                with self._lock:
+                    pending = [p for p in self._pending if p is not None]
+                    self._pending = [None] * len(self._pending)
+                if not pending:
+                    continue
+
+                start = time.perf_counter()
+                for tile_input, buf in pending:
+                    try:
+                        if buf.size == self.tile_size:
+                            surface = buf.surface
+                        else:
+                            tile, surface = self._tiles[tile_input.index]
+                            cv2.resize(
+                                buf.bgr,
+                                self.tile_size,
+                                dst=tile,
+                                interpolation=cv2.INTER_LINEAR,
+                            )
+                        position = self._position(tile_input.index)
+                        screen.blit(surface, position)
+                        if tile_input.osd is not None:
+                            tile_input.osd.draw(screen, position)
+                    finally:
+                        buf.release()
+                pygame.display.flip()
+                phase_timer.mark("first_frame")
+
+                render_ms = (time.perf_counter() - start) * 1000
+                for tile_input, _ in pending:
+                    if tile_input.stats is not None:
+                        tile_input.stats.record("render", render_ms)
+        finally:
+            with self._lock:
+                leftover = [p for p in self._pending if p is not None]
+                self._pending = [None] * len(self._pending)
+            for _, buf in leftover:
+                buf.release()
+            pygame.quit()